@@ -0,0 +1,29 @@
+from scripts.benchmark import generate_book, run_benchmarks, INPUT_HEADER
+from scripts.runner_methods import parse_options
+import platform
+import json
+import time
+import csv
+import sys
+
+# python3 benchmark.py results.json [rows] [--seed=N] [--unsolvable=fraction] [--repeats=N] [--book=book.csv]
+options = parse_options(sys.argv)
+arguments = [argument for argument in sys.argv if not argument.startswith('--')]
+if len(arguments) not in [2, 3]:
+    raise ValueError("wrong number of system arguments")
+rows = int(arguments[2]) if len(arguments) == 3 else 10000
+book = generate_book(rows, int(options.get('seed', 0)), float(options.get('unsolvable', 0.05)))
+if 'book' in options:
+    with open(options['book'], 'w') as book_file:
+        book_writer = csv.writer(book_file, delimiter=',')
+        book_writer.writerow(INPUT_HEADER)
+        book_writer.writerows(book.rows)
+results = run_benchmarks(book, repeats=int(options.get('repeats', 1)))
+results['date'] = time.strftime('%Y-%m-%d %H:%M:%S')
+results['python'] = platform.python_version()
+with open(arguments[1], 'w') as results_file:
+    json.dump(results, results_file, indent=2)
+for result in results['results']:
+    print('%s %s: %.0f rows/s, %s pricings per solve, max error %s' % (
+        result['engine'], result['solver'] or '', result['rows per second'], result['pricings per solve'],
+        result['accuracy']['max error']))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# a python api for solving trades held in memory (numpy arrays, or the columns of a pandas DataFrame), for code that embeds the
+# calculation rather than running it over csv files - the trades are put in a TradeColumns store (see trade_store.py) without
+# copying the numeric arrays where they are already float64, passed through the no-arbitrage pre-filter (see price_bounds.py),
+# and solved by either engine - the scalar engine builds the same BlackScholes / Bachelier trade objects as a run of the application
+# nothing is printed, and pandas is not needed (a DataFrame is only read by column name)
+from scripts.trade_classes import TradeData, SOLVERS
+from scripts.trade_store import TradeColumns
+from scripts.batch_engine import implied_volatility_accepted
+from scripts.price_bounds import arbitrage_rejections, solved_reasons, ACCEPTED
+from scripts import runner_methods
+import numpy as np
+
+# the columns read from a DataFrame (or any mapping of column name -> values), named as in the input file
+FRAME_COLUMNS = ['Underlying', 'Strike', 'Risk-Free Rate', 'Days To Expiry', 'Market Price',
+                 'Underlying Type', 'Option Type', 'Model Type']
+
+
+# the implied volatility of each trade, as an array (nan for the trades that have none)
+# S, K, r, t (in years) and price are arrays of the same length (or single values, given to every trade), and each of
+# underlying_type, option_type and model_type is either a single name or an array of names
+# engine is one of runner_methods.ENGINES, solver (for the scalar engine) one of SOLVERS, or None for TradeData.solver, and a
+# SolveCache (see solve_cache.py) can be given to reuse solutions between calls
+# with reasons, the reason code (see price_bounds.py) of each trade is returned as a second array
+def implied_volatility(S, K, r, t, price, underlying_type='Stock', option_type='Call', model_type='BlackScholes',
+                       engine='scalar', solver=None, cache=None, reasons=False):
+    if engine not in runner_methods.ENGINES:
+        raise ValueError("invalid engine: %s" % engine)
+    if solver is not None and solver not in SOLVERS:
+        raise ValueError("invalid solver: %s" % solver)
+    store = TradeColumns.from_arrays(S, K, r, t, price, underlying_type, option_type, model_type)
+    rejections = arbitrage_rejections(store)
+    if engine == 'batch':
+        imp_vol = implied_volatility_accepted(store, rejections)
+    else:
+        imp_vol = solve_accepted(store, rejections, solver, cache)
+    if reasons:
+        return imp_vol, solved_reasons(rejections, imp_vol)
+    return imp_vol
+
+
+# implied_volatility of the trades in a DataFrame, or any mapping of column name -> values, with the columns of the input file
+def implied_volatility_frame(frame, engine='scalar', solver=None, cache=None, reasons=False):
+    S, K, r, days, price = (np.asarray(frame[column], dtype=np.float64) for column in FRAME_COLUMNS[:5])
+    underlying_type, option_type, model_type = (frame[column] for column in FRAME_COLUMNS[5:])
+    return implied_volatility(S, K, r, days / 365.0, price, underlying_type, option_type, model_type, engine, solver, cache, reasons)
+
+
+# solves the accepted trades one trade object at a time with the given solver, as solve_accepted_trades does for a run
+def solve_accepted(store, rejections, solver=None, cache=None):
+    imp_vol = np.full(len(store), np.nan)
+    previous_solver = TradeData.solver
+    if solver is not None:
+        TradeData.solver = solver
+    try:
+        for i in np.flatnonzero(rejections == ACCEPTED).tolist():
+            trade = runner_methods.create_instance_of_trade_object(store.row(i))
+            if cache is None:
+                trade.calc_implied_volatility()
+            else:
+                runner_methods.solve_with_cache(trade, cache)
+            imp_vol[i] = trade.imp_vol
+    finally:
+        TradeData.solver = previous_solver
+    return imp_vol
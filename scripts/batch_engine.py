@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# a vectorised alternative to building one trade object per row and solving each one in turn (see polymorphic_solve)
+# every row of the input is held as a set of numpy column arrays (a TradeColumns store, see trade_store.py), and all rows are bracketed and solved together,
+# such that each pricing evaluation prices the whole book at once
+import numpy as np
+from math import ceil, log2
+from scripts.trade_classes import VOLATILITY_BOUNDS
+from scripts.normal_dist import numpy_cdf, numpy_pdf
+from scripts.chandrupatla import chandrupatla
+from scripts.price_bounds import ACCEPTED
+from scripts.trade_store import TradeColumns, columns_subset, with_prices, BACHELIER, STOCK, FUTURE, CALL, PUT
+
+
+# the value of every trade for an array of volatilities (sigma), mirroring the kernels in pricing_kernels.py
+# rows with an unrecognised underlying or option type are priced as nan
+def price(columns, sigma):
+    S, K, r, t = columns.S, columns.K, columns.r, columns.t
+    is_stock, is_future = columns.underlying == STOCK, columns.underlying == FUTURE
+    is_call, is_put = columns.option == CALL, columns.option == PUT
+
+    # sqrt(t) and exp(-rt) are computed once for each distinct (t, r) pair of the store, not on every pricing (see trade_store.py)
+    sqrt_t, exp_rt, _ = columns.row_factors()
+
+    with np.errstate(all='ignore'):
+        sigma_sqrt_t = sigma * sqrt_t
+
+        # black-scholes: stock and future share call = A*N(d1) - B*N(d2), put = B*N(-d2) - A*N(-d1)
+        # where for a stock A = S, B = Kexp(-rt) and for a future A = Sexp(-rt), B = Kexp(-rt) (black-76)
+        drift = np.where(is_stock, r, 0.0)
+        d1 = (np.log(S / K) + (drift + sigma ** 2 / 2.0) * t) / sigma_sqrt_t
+        d2 = d1 - sigma_sqrt_t
+        A = np.where(is_stock, S, S * exp_rt)
+        B = K * exp_rt
+        bs_value = np.where(is_call, A * numpy_cdf(d1) - B * numpy_cdf(d2),
+                            B * numpy_cdf(-d2) - A * numpy_cdf(-d1))
+
+        # bachelier: stock and future share call = D*((X - Y)N(d) + Y*sigma*sqrt(t)*n(d)), put = call + D*(Y - X)
+        # where d = (X - Y) / (Y*sigma*sqrt(t)), for a stock X = S, Y = Kexp(-rt), D = 1 and for a future X = S, Y = K, D = exp(-rt)
+        Y = np.where(is_stock, K * exp_rt, K)
+        D = np.where(is_stock, 1.0, exp_rt)
+        d = (S - Y) / (Y * sigma_sqrt_t)
+        n_d = numpy_pdf(d)
+        bac_call = D * ((S - Y) * numpy_cdf(d) + Y * sigma_sqrt_t * n_d)
+        bac_value = np.where(is_call, bac_call, bac_call + D * (Y - S))
+
+        value = np.where(columns.model == BACHELIER, bac_value, bs_value)
+
+    valid = (is_stock | is_future) & (is_call | is_put)
+    return np.where(valid, value, np.nan)
+
+
+# the (delta, gamma, vega, theta) arrays of every trade at its (solved) volatility, mirroring greeks() of the kernels in
+# pricing_kernels.py - rows with an unrecognised underlying or option type, or a nan volatility, are given nan
+def greeks(columns, sigma):
+    S, K, r, t = columns.S, columns.K, columns.r, columns.t
+    is_stock, is_future = columns.underlying == STOCK, columns.underlying == FUTURE
+    is_call, is_put = columns.option == CALL, columns.option == PUT
+    value = price(columns, sigma)
+
+    sqrt_t, exp_rt, _ = columns.row_factors()
+
+    with np.errstate(all='ignore'):
+        sigma_sqrt_t = sigma * sqrt_t
+
+        # black-scholes, with A and B as in price(), and dA/dS = 1 for a stock and exp(-rt) for a future
+        drift = np.where(is_stock, r, 0.0)
+        d1 = (np.log(S / K) + (drift + sigma ** 2 / 2.0) * t) / sigma_sqrt_t
+        d2 = d1 - sigma_sqrt_t
+        dA_dS = np.where(is_stock, 1.0, exp_rt)
+        A = dA_dS * S
+        B = K * exp_rt
+        n_d1 = numpy_pdf(d1)
+        bs_delta = np.where(is_call, dA_dS * numpy_cdf(d1), -dA_dS * numpy_cdf(-d1))
+        bs_gamma = dA_dS * n_d1 / (S * sigma_sqrt_t)
+        bs_vega = A * n_d1 * sqrt_t
+        bs_theta = -A * n_d1 * sigma / (2.0 * sqrt_t) + np.where(
+            is_stock, np.where(is_call, -r * B * numpy_cdf(d2), r * B * numpy_cdf(-d2)), r * value)
+
+        # bachelier, with D and Y as in price()
+        Y = np.where(is_stock, K * exp_rt, K)
+        D = np.where(is_stock, 1.0, exp_rt)
+        d = (S - Y) / (Y * sigma_sqrt_t)
+        n_d, N_d = numpy_pdf(d), numpy_cdf(d)
+        bac_delta = np.where(is_call, D * N_d, D * (N_d - 1.0))
+        bac_gamma = D * n_d / (Y * sigma_sqrt_t)
+        bac_vega = D * Y * sqrt_t * n_d
+        bac_stock_theta = -r * Y * N_d - Y * sigma * n_d * (1.0 / (2.0 * sqrt_t) - r * sqrt_t) + np.where(is_call, 0.0, r * Y)
+        bac_theta = np.where(is_stock, bac_stock_theta, r * value - D * Y * sigma * n_d / (2.0 * sqrt_t))
+
+    is_bachelier = columns.model == BACHELIER
+    valid = (is_stock | is_future) & (is_call | is_put) & ~np.isnan(sigma)
+    return tuple(np.where(valid, np.where(is_bachelier, bachelier_greek, bs_greek), np.nan)
+                 for bs_greek, bachelier_greek in [(bs_delta, bac_delta), (bs_gamma, bac_gamma), (bs_vega, bac_vega),
+                                                   (bs_theta, bac_theta)])
+
+
+# the vectorised equivalent of bd_var_bounds over every row at once
+# the rows are first bracketed by walking up the bounds ladder, exactly as in bd_var_bounds (nan if no rung brackets the root),
+# then the brackets are solved together to within 'tolerance', by 'chandrupatla' (see chandrupatla.py), where each row drops out
+# as it converges, or by 'bisection', where every bracket is bisected the number of times the widest one needs
+def implied_volatility_batch(columns, bounds=VOLATILITY_BOUNDS, tolerance=1e-12, method='chandrupatla'):
+    n = len(columns)
+
+    def f(sigma): return price(columns, sigma) - columns.V0
+
+    lower, upper = np.full(n, np.nan), np.full(n, np.nan)
+    f_lower, f_upper = np.full(n, np.nan), np.full(n, np.nan)
+    f_a = f(np.full(n, float(bounds[0])))
+    unbracketed = ~(f_a > 0)  # if even the lowest bound lies above the root, the row is nan
+    for i in range(len(bounds) - 1):
+        f_b = f(np.full(n, float(bounds[i+1])))
+        # f_a * f_b <= 0, without the product (which can underflow to zero for tiny prices)
+        bracketed = unbracketed & (((f_a <= 0) & (f_b >= 0)) | ((f_a >= 0) & (f_b <= 0)))
+        lower[bracketed], upper[bracketed] = bounds[i], bounds[i+1]
+        f_lower[bracketed], f_upper[bracketed] = f_a[bracketed], f_b[bracketed]
+        unbracketed &= ~bracketed
+        f_a = f_b
+
+    solvable = ~np.isnan(lower)
+    lower, upper = lower[solvable], upper[solvable]
+    solvable_columns = columns_subset(columns, solvable)
+
+    imp_vol = np.full(n, np.nan)
+    if len(lower) == 0:
+        return imp_vol
+    if method == 'chandrupatla':
+        def f_of_rows(sigma, rows):
+            trades = rows_of(solvable_columns, rows)
+            return price(trades, sigma) - trades.V0
+        imp_vol[solvable], _ = chandrupatla(f_of_rows, lower, upper, f_lower[solvable], f_upper[solvable], tolerance / 2.0)
+    elif method == 'bisection':
+        steps = max(0, ceil(log2(max(upper - lower) / tolerance)))
+        for _ in range(steps):
+            mid = (lower + upper) / 2.0
+            above = (price(solvable_columns, mid) - solvable_columns.V0) >= 0
+            upper = np.where(above, mid, upper)
+            lower = np.where(above, lower, mid)
+        imp_vol[solvable] = (lower + upper) / 2.0
+    else:
+        raise ValueError("invalid batch method: %s" % method)
+    return imp_vol
+
+
+# the implied volatilities of the rows at other market prices V0 (e.g. the bids, when the columns hold the mids), seeded by their
+# solutions at the prices of the columns - as the price of a trade increases with its volatility, the root at V0 lies on the
+# same side of the seed as V0 does of the seed's price, so each row is bracketed between its seed and the nearest rung of the
+# ladder on that side that brackets the root (the walk usually ends at the first rung), then solved as implied_volatility_batch
+# rows without a seed are solved from the bottom of the ladder
+def implied_volatility_seeded(columns, V0, seed, bounds=VOLATILITY_BOUNDS, tolerance=1e-12):
+    n = len(columns)
+    trades = with_prices(columns, V0)
+    imp_vol = np.full(n, np.nan)
+    seeded = ~np.isnan(seed) & ~np.isnan(V0)
+    unseeded = np.isnan(seed) & ~np.isnan(V0)
+    if unseeded.any():
+        imp_vol[unseeded] = implied_volatility_batch(columns_subset(trades, unseeded), bounds, tolerance)
+    if not seeded.any():
+        return imp_vol
+
+    def f(sigma, rows):
+        rows_trades = rows_of(trades, rows)
+        return price(rows_trades, sigma) - rows_trades.V0
+
+    rows = np.flatnonzero(seeded)
+    seed, f_seed = seed[rows], f(seed[rows], rows)
+    imp_vol[rows[f_seed == 0]] = seed[f_seed == 0]
+    # the seed is the upper end of the bracket if above the root, otherwise the lower end
+    lower, upper = np.where(f_seed < 0, seed, np.nan), np.where(f_seed > 0, seed, np.nan)
+    f_lower, f_upper = np.where(f_seed < 0, f_seed, np.nan), np.where(f_seed > 0, f_seed, np.nan)
+    for rung in bounds:
+        searching = np.flatnonzero(np.isnan(upper) & (f_seed < 0) & (rung > seed))
+        if len(searching) > 0:
+            f_rung = f(np.full(len(searching), float(rung)), rows[searching])
+            found = searching[f_rung >= 0]
+            upper[found], f_upper[found] = rung, f_rung[f_rung >= 0]
+    for rung in reversed(bounds):
+        searching = np.flatnonzero(np.isnan(lower) & (f_seed > 0) & (rung < seed))
+        if len(searching) > 0:
+            f_rung = f(np.full(len(searching), float(rung)), rows[searching])
+            found = searching[f_rung <= 0]
+            lower[found], f_lower[found] = rung, f_rung[f_rung <= 0]
+
+    bracketed = ~np.isnan(lower) & ~np.isnan(upper)
+    if bracketed.any():
+        bracketed_rows = rows[bracketed]
+        imp_vol[bracketed_rows], _ = chandrupatla(lambda sigma, lanes: f(sigma, bracketed_rows[lanes]), lower[bracketed],
+                                                  upper[bracketed], f_lower[bracketed], f_upper[bracketed], tolerance / 2.0)
+    return imp_vol
+
+
+# the given rows (an array of indices) of a store, with only the fields needed to price them (see price)
+def rows_of(columns, rows):
+    factors, group = columns.expiry_factors()
+    return TradeColumns(rows, columns.S[rows], columns.K[rows], columns.r[rows], columns.t[rows], columns.V0[rows],
+                        columns.underlying[rows], columns.option[rows], columns.model[rows], expiry=(factors, group[rows]))
+
+
+# solves only the rows accepted by the no-arbitrage pre-filter (see price_bounds.py), the rest are nan
+def implied_volatility_accepted(columns, rejections):
+    accepted = rejections == ACCEPTED
+    imp_vol = np.full(len(columns), np.nan)
+    if accepted.any():
+        imp_vol[accepted] = implied_volatility_batch(columns_subset(columns, accepted))
+    return imp_vol
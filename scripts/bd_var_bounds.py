@@ -7,72 +7,210 @@
 # or if a solution is found with a tolerance of 'tolerance'
 
 
-def bd_var_bounds(f, bounds, max_iter=50, tolerance=1e-8):
+# each point is evaluated (priced) exactly once - the function values are carried between iterations in a BrentDekkerState
+# bd_var_bounds_solve also returns a SolveStats recording the work done, bd_var_bounds returns only the root
 
-    if f(bounds[0]) > 0:  # if even the lowest bound lies above the root, return nan
-        return float('nan')
 
-    for i in range(len(bounds) - 1):
-        a, b = bounds[i], bounds[i+1]  # (a, b) are the pair of bounds
-        if (f(a) * f(b)) <= 0:  # if (a, b) lie either side of the root, the algorithm continues
-            break
-        # if even the two largest bounds lie below the root, the algorithm returns nan
-        if i == len(bounds) - 2:
-            return float('nan')
+def bd_var_bounds(f, bounds, max_iter=50, tolerance=1e-8, initial_guess=None, guess_width=None):
+    root, _ = bd_var_bounds_solve(f, bounds, max_iter, tolerance, initial_guess, guess_width)
+    return root
 
-    # if |f(a)| < |f(b)| then swap 'a' and 'b'
-    # i.e. b should represent the 'best' guess
-    if abs(f(a)) < abs(f(b)):
-        a, b = b, a
 
-    c = a  # throughout the algorithm, point 'c' will replace 'b' at the end of an iteration, however, it is initialised as equal to 'a'
-    d = 0  # d is assigned here arbitrarily as it will not be used before the second iteration
+# with an initial_guess (lying within the bounds), the root is bracketed by stepping out from the guess, rather than
+# by walking up the bounds - either way the root is only searched for between the lowest and highest bounds
+# guess_width is the relative half width of the first bracket around the guess (GUESS_BRACKET_WIDTH by default), narrower for a better guess
+def bd_var_bounds_solve(f, bounds, max_iter=50, tolerance=1e-8, initial_guess=None, guess_width=None):
+    stats = SolveStats()
+    f = stats.counted(f)
 
-    prev_iter_used_bi = True  # used to track whether the previous iteration used bisection
-    steps_taken = 0
+    if initial_guess is not None and bounds[0] < initial_guess < bounds[-1]:
+        bracket = bracket_around_guess(f, initial_guess, bounds, guess_width or GUESS_BRACKET_WIDTH)
+    else:
+        bracket = bracket_on_ladder(f, bounds)
+        stats.rung = None if bracket is None else bounds.index(bracket[0])
+    if bracket is None:
+        stats.termination = unbracketed_termination(stats.last_value)
+        return float('nan'), stats
+
+    state = BrentDekkerState(*bracket)
 
     # iterates until solution criteria are met
-    while steps_taken < max_iter and abs(b - a) > tolerance and f(b) != 0.0 and f(c) != 0.0:
-        a, b, c, d, prev_iter_used_bi = brent_dekker_iterative_converge(
-            f, a, b, c, d, prev_iter_used_bi, tolerance)
-        steps_taken += 1
+    while stats.iterations < max_iter and abs(state.b - state.a) > tolerance and not state.has_exact_root():
+        brent_dekker_iterative_converge(f, state, tolerance)
+        stats.iterations += 1
+
+    if state.has_exact_root():
+        stats.termination = EXACT_ROOT
+    elif abs(state.b - state.a) <= tolerance:
+        stats.termination = CONVERGED
+    else:
+        stats.termination = MAX_ITERATIONS
+    stats.bracket_width = abs(state.b - state.a)
+    root = state.best_guess()
+    stats.residual = state.f_a if root == state.a else state.f_b
+    return root, stats
 
-    return b
 
+# walks up the bounds until a pair lies either side of the root, returning (a, b, f(a), f(b)), or None if no pair does
+def bracket_on_ladder(f, bounds):
+    f_a = f(bounds[0])
+    if f_a > 0:  # if even the lowest bound lies above the root, return None
+        return None
 
-def brent_dekker_iterative_converge(f, a, b, c, d, mflag, tolerance):
-    f_a = f(a)
-    f_b = f(b)
-    f_c = f(c)
+    for i in range(len(bounds) - 1):
+        a, b = bounds[i], bounds[i+1]  # (a, b) are the pair of bounds
+        f_b = f(b)
+        if either_side_of_root(f_a, f_b):  # if (a, b) lie either side of the root, the algorithm continues
+            return a, b, f_a, f_b
+        f_a = f_b
+
+    # even the two largest bounds lie below the root
+    return None
+
+
+# true if f_a and f_b have opposite signs (or either is zero), i.e. f_a * f_b <= 0 - compared directly, as for tiny
+# function values (e.g. far out of the money prices) the product can underflow to zero
+def either_side_of_root(f_a, f_b):
+    return (f_a <= 0 <= f_b) or (f_b <= 0 <= f_a)
+
+
+# the relative half width of the first bracket placed around an initial guess
+GUESS_BRACKET_WIDTH = 0.1
+
+
+# brackets the root starting from (guess(1 - width), guess(1 + width)), moving the bracket down (or up), doubling its width each
+# time, while it lies above (or below) the root - returns (a, b, f(a), f(b)), or None if the root is not within the bounds
+def bracket_around_guess(f, guess, bounds, width=GUESS_BRACKET_WIDTH):
+    a, b = max(guess * (1.0 - width), bounds[0]), min(guess * (1.0 + width), bounds[-1])
+    f_a, f_b = f(a), f(b)
+    step = b - a
+    while True:
+        if f_a > 0:  # the root lies below 'a'
+            if a == bounds[0]:
+                return None
+            step *= 2.0
+            b, f_b = a, f_a
+            a = max(a - step, bounds[0])
+            f_a = f(a)
+        elif f_b < 0:  # the root lies above 'b'
+            if b == bounds[-1]:
+                return None
+            step *= 2.0
+            a, f_a = b, f_b
+            b = min(b + step, bounds[-1])
+            f_b = f(b)
+        elif f_a <= 0 <= f_b:
+            return a, b, f_a, f_b
+        else:  # f is nan
+            return None
+
+
+# the points used by the algorithm, alongside their function values
+class BrentDekkerState:
+
+    def __init__(self, a, b, f_a, f_b):
+        # if |f(a)| < |f(b)| then swap 'a' and 'b'
+        # i.e. b should represent the 'best' guess
+        if abs(f_a) < abs(f_b):
+            a, b, f_a, f_b = b, a, f_b, f_a
+        self.a, self.f_a = a, f_a
+        self.b, self.f_b = b, f_b
+        # throughout the algorithm, point 'c' will replace 'b' at the end of an iteration, however, it is initialised as equal to 'a'
+        self.c, self.f_c = a, f_a
+        self.d = 0  # d is assigned here arbitrarily as it will not be used before the second iteration
+        self.mflag = True  # used to track whether the previous iteration used bisection
+
+    # 'b' is kept as the best guess using |f| from before the last update, so 'a' can end up the closer of the two
+    def best_guess(self):
+        return self.a if abs(self.f_a) < abs(self.f_b) else self.b
+
+    # true if a point has landed exactly on the root - it is kept as 'b', but the swap at the end of an iteration can move it to 'a'
+    def has_exact_root(self):
+        return self.f_a == 0.0 or self.f_b == 0.0
+
+
+# why a solve stopped (SolveStats.termination)
+CONVERGED = 'converged'  # the bracket (or, for newton_halley, the step) is narrower than 'tolerance'
+EXACT_ROOT = 'exact root'  # f was exactly zero
+MAX_ITERATIONS = 'max iterations'  # stopped after 'max_iter' iterations, without converging
+BELOW_LOWEST_BOUND = 'below lowest bound'  # f is positive even at the lowest bound, so the root lies below the bounds (nan)
+ABOVE_HIGHEST_BOUND = 'above highest bound'  # f is negative even at the highest bound, so the root lies above the bounds (nan)
+UNDEFINED_VALUE = 'undefined value'  # f was nan, so the root could not be bracketed (nan)
+
+
+# the termination of a solve that could not bracket the root, from the last value of f evaluated
+def unbracketed_termination(last_value):
+    if last_value > 0:
+        return BELOW_LOWEST_BOUND
+    if last_value < 0:
+        return ABOVE_HIGHEST_BOUND
+    return UNDEFINED_VALUE
+
+
+# the work done by a single solve, and how it ended - recorded as the solve goes, for the diagnostics output (see runner_methods.py)
+class SolveStats:
+
+    def __init__(self):
+        self.evaluations = 0  # number of times f was evaluated
+        self.iterations = 0  # number of brent-dekker iterations (after the bounds were bracketed)
+        self.rung = None  # the index of the lower bound of the ladder pair that bracketed the root (None if bracketed around a guess)
+        self.bracket_width = float('nan')  # the final width of the bracket (nan if the root was not bracketed)
+        self.residual = float('nan')  # f at the root returned (or for newton_halley, at the last point evaluated)
+        self.termination = None  # one of the terminations above
+        self.last_value = float('nan')  # the last value of f evaluated (for newton_halley, the tuple (f, f', f''))
+
+    # wraps f such that every evaluation is counted
+    def counted(self, f):
+        def counted_f(x):
+            self.evaluations += 1
+            self.last_value = f(x)
+            return self.last_value
+        return counted_f
+
+
+def brent_dekker_iterative_converge(f, state, tolerance):
+    a, b, c, d = state.a, state.b, state.c, state.d
+    f_a, f_b, f_c = state.f_a, state.f_b, state.f_c
 
     # try to compute new point 's' with inverse quadratic interpolation (IQI)
-    if f_a != f_c and f_b != f_c:
-        s = inverse_quadratic_interpolation(a, b, c, f_a, f_b, f_c)
+    # for tiny function values (e.g. far out of the money prices) the products in its denominators can underflow to zero,
+    # in which case 's' is left undefined so that bisection is used below
+    if f_a != f_c and f_b != f_c and f_a != f_b:
+        try:
+            s = inverse_quadratic_interpolation(a, b, c, f_a, f_b, f_c)
+        except ZeroDivisionError:
+            s = float('nan')
 
     # if cannot use IQI, the secant method is used to compute 's' intead
-    else:
+    elif f_a != f_b:
         s = secant_method(a, b, f_a, f_b)
 
+    # if f is flat between 'a' and 'b' neither can be used, and 's' is left undefined so that bisection is used below
+    else:
+        s = float('nan')
+
     # the bisection method is called when certain criteria are met, and overrides the secant value for 's'
-    if condition_for_bisection_method(a, b, c, d, s, mflag, tolerance):
+    if condition_for_bisection_method(a, b, c, d, s, state.mflag, tolerance):
         s = bisection_method(a, b)
-        mflag = True
+        state.mflag = True
 
     else:
-        mflag = False
+        state.mflag = False
 
     f_s = f(s)
-    d, c = c, b  # update values
+    state.d, state.c, state.f_c = c, b, f_b  # update values
 
-    if (f_a * f_s) < 0:  # ensures the root remains between 'a' and 'b'
-        b = s
+    # ensures the root remains between 'a' and 'b' - a point exactly on the root is kept in place of 'b', so that it is never lost
+    if (f_a < 0 <= f_s) or (f_s <= 0 < f_a):
+        state.b, state.f_b = s, f_s
     else:
-        a = s
+        state.a, state.f_a = s, f_s
 
     if abs(f_a) < abs(f_b):  # keep 'b' as the best guess
-        a, b = b, a
+        state.a, state.b = state.b, state.a
+        state.f_a, state.f_b = state.f_b, state.f_a
 
-    return a, b, c, d, mflag
+    return state
 
 
 def inverse_quadratic_interpolation(a, b, c, f_a, f_b, f_c):
@@ -93,7 +231,7 @@ def condition_for_bisection_method(a, b, c, d, s, mflag, tolerance):
     # iii) did not previously use bisection and |s - b| >= |c - d| / 2
     # iv) previously used bisection and |b - c| < tolerance
     # v) did not previously use bisection and |c - d| < tolerance
-    if ((not (3.0*a+b)/4.0 < s < b) or
+    if ((not min((3.0*a+b)/4.0, b) < s < max((3.0*a+b)/4.0, b)) or
         (mflag and (abs(s - b)) >= (abs(b - c) / 2)) or
         (not mflag and (abs(s - b)) >= (abs(c - d) / 2)) or
         (mflag and (abs(b - c)) < tolerance) or
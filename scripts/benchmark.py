@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# a reproducible benchmark of the engines and solvers, on a synthetic book of trades with known implied volatilities
+# generate_book builds the book from a seed: every row is drawn from a regime of moneyness, expiry, rate, model, underlying and
+# option type, priced at a known volatility with the pricing kernels (see pricing_kernels.py), and a fraction of rows are given
+# prices that no volatility can give (so should be nan)
+# run_benchmark solves the book with one engine / solver, measuring rows per second, pricings per solve, the latency of single
+# solves and the accuracy of the solutions against the known volatilities - see benchmark.py for running it and saving the results
+from scripts.trade_classes import TradeData
+from scripts.trade_store import TradeColumns
+from scripts.price_bounds import arbitrage_rejections, ACCEPTED
+from scripts.pricing_kernels import pricing_kernel
+from scripts import runner_methods
+from contextlib import redirect_stdout
+from math import exp
+import numpy as np
+import random
+import io
+import time
+
+INPUT_HEADER = ['ID', 'Underlying Type', 'Underlying', 'Risk-Free Rate', 'Days To Expiry',
+                'Strike', 'Option Type', 'Model Type', 'Market Price']
+
+# the ranges each regime is drawn from - moneyness is log(K/F), for the forward F of the underlying
+MONEYNESS_REGIMES = {'at the money': (-0.05, 0.05), 'near the money': (-0.3, 0.3), 'far from the money': (-0.8, 0.8)}
+EXPIRY_REGIMES = {'short expiry': (1.0, 30.0), 'medium expiry': (30.0, 365.0), 'long expiry': (365.0, 1825.0)}  # days
+RATE_REGIMES = {'negative rate': (-0.01, 0.0), 'low rate': (0.0, 0.02), 'high rate': (0.02, 0.08)}
+VOLATILITY_RANGE = (0.05, 1.0)
+
+# a row's volatility can only be known from its price if it has some time value - rows whose time value (price less intrinsic
+# value) is lost to rounding, e.g. deep in the money with a short expiry, are re-drawn (within the same regime)
+MINIMUM_TIME_VALUE = 1e-10  # relative to the price
+# and, as no market quotes them, rows priced below this (relative to the underlying) are re-drawn too
+MINIMUM_PRICE = 1e-8
+
+
+# the (engine, solver) pairs benchmarked by default
+CONFIGURATIONS = [('scalar', 'direct'), ('scalar', 'brent-dekker'), ('scalar', 'newton-halley'), ('batch', None)]
+
+# a solution is counted as accurate if within this (absolute) distance of the known volatility
+ACCURACY_TOLERANCE = 1e-6
+
+
+# a synthetic book: the csv rows (as read from an input file) alongside the known volatility (nan if unsolvable) and regime of each
+class SyntheticBook:
+
+    def __init__(self, seed, rows, true_volatilities, regimes):
+        self.seed = seed
+        self.rows = rows
+        self.true_volatilities = true_volatilities
+        self.regimes = regimes  # the tuple of regime names of each row, ending 'unsolvable' for the rows that should be nan
+
+    def __len__(self):
+        return len(self.rows)
+
+    def csv_columns(self):
+        return {key: [row[i] for row in self.rows] for i, key in enumerate(INPUT_HEADER)}
+
+
+# builds a book of n rows from the seed, with unsolvable_fraction of them given prices no volatility can give
+# the same seed always gives the same book (the generator is independent of numpy's random state)
+def generate_book(n, seed=0, unsolvable_fraction=0.05):
+    rng = random.Random(seed)
+    rows, true_volatilities, regimes = [], [], []
+    for i in range(n):
+        moneyness_regime, expiry_regime, rate_regime = (
+            rng.choice(sorted(regimes_of)) for regimes_of in [MONEYNESS_REGIMES, EXPIRY_REGIMES, RATE_REGIMES])
+        model_type, underlying_type, option_type = (
+            rng.choice(types) for types in [['BlackScholes', 'Bachelier'], ['Stock', 'Future'], ['Call', 'Put']])
+        S = rng.uniform(0.5, 2.0)
+        days = rng.uniform(*EXPIRY_REGIMES[expiry_regime])
+        r = rng.uniform(*RATE_REGIMES[rate_regime])
+        t = days / 365.0
+        # the strike is placed relative to the forward of the underlying (a future is its own forward)
+        forward = S * exp(r * t) if underlying_type == 'Stock' else S
+        while True:
+            K = forward * exp(rng.uniform(*MONEYNESS_REGIMES[moneyness_regime]))
+            sigma = rng.uniform(*VOLATILITY_RANGE)
+            price, _, _ = pricing_kernel(model_type, underlying_type, option_type, S, K, r, t)
+            V0, intrinsic = price(sigma), intrinsic_value(underlying_type, option_type, S, K, r, t)
+            if V0 - intrinsic > MINIMUM_TIME_VALUE * V0 and V0 > MINIMUM_PRICE * S:
+                break
+        regime = (moneyness_regime, expiry_regime, rate_regime, model_type)
+        if rng.random() < unsolvable_fraction:
+            # below the intrinsic value where there is one, otherwise a non-positive price
+            V0 = intrinsic * rng.uniform(0.5, 0.99) if intrinsic > 0 else -rng.uniform(0.0, 0.1)
+            sigma, regime = float('nan'), regime + ('unsolvable',)
+        # written with repr(), so that the inputs read back are exactly those priced
+        rows.append([str(i), underlying_type, repr(S), repr(r), repr(days), repr(K), option_type, model_type, repr(V0)])
+        true_volatilities.append(sigma)
+        regimes.append(regime)
+    return SyntheticBook(seed, rows, true_volatilities, regimes)
+
+
+# the lowest price of an option (see price_bounds.py), max(A - B, 0) for a call and max(B - A, 0) for a put, where A is the
+# discounted underlying and B the discounted strike
+def intrinsic_value(underlying_type, option_type, S, K, r, t):
+    A = S if underlying_type == 'Stock' else S * exp(-r * t)
+    B = K * exp(-r * t)
+    return max(A - B if option_type == 'Call' else B - A, 0.0)
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return None
+    summary = {'p%s' % point: float(np.percentile(values, point)) for point in points}
+    summary['max'] = float(max(values))
+    return summary
+
+
+# the price of each row of the book at the given volatilities, relative to its market price
+def relative_price_errors(book, imp_vol):
+    errors = []
+    for row, sigma in zip(book.rows, imp_vol.tolist()):
+        S, r, days, K, V0 = (float(row[i]) for i in [2, 3, 4, 5, 8])
+        price, _, _ = pricing_kernel(row[7], row[1], row[6], S, K, r, days / 365.0)
+        errors.append(abs(price(sigma) - V0) / V0)
+    return np.array(errors)
+
+
+# compares the solved volatilities to the known ones, overall and by regime
+# also gives the error of the price at the solved volatility, which (unlike the volatility) no solver can improve on
+def accuracy(book, imp_vol):
+    true_vol = np.array(book.true_volatilities)
+    solvable, solved = ~np.isnan(true_vol), ~np.isnan(imp_vol)
+    errors = np.abs(imp_vol - true_vol)
+    summary = {'solvable rows': int(solvable.sum()),
+               'unsolvable rows': int((~solvable).sum()),
+               'unexpected nan': int((solvable & ~solved).sum()),  # solvable rows without a solution
+               'unexpected solution': int((~solvable & solved).sum()),  # unsolvable rows given a solution
+               'max error': None, 'mean error': None, 'accurate': None, 'max relative price error': None,
+               'max error by regime': {}}
+    checked = solvable & solved
+    if checked.any():
+        summary['max relative price error'] = float(relative_price_errors(book, imp_vol)[checked].max())
+        summary['max error'] = float(errors[checked].max())
+        summary['mean error'] = float(errors[checked].mean())
+        summary['accurate'] = float((errors[checked] < ACCURACY_TOLERANCE).mean())
+        for index in range(len(book.regimes[0])):
+            for name in sorted({regime[index] for regime in book.regimes}):
+                in_regime = checked & np.array([regime[index] == name for regime in book.regimes])
+                if in_regime.any():
+                    summary['max error by regime'][name] = float(errors[in_regime].max())
+    return summary
+
+
+# solves the book with the given engine (and, for the scalar engine, solver), returning a dictionary of the results
+# the throughput is measured over the whole book (as by run_application, but without reading or writing files),
+# and the latency of each accepted row's solve over a second, single trade pass (scalar engine only)
+def run_benchmark(book, engine='scalar', solver='direct', repeats=1):
+    previous_solver = TradeData.solver
+    if solver is not None:
+        TradeData.solver = solver
+    try:
+        data = runner_methods.CSVFileData(INPUT_HEADER, book.rows)
+        durations = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            with redirect_stdout(io.StringIO()):  # the progress prints of the solve are not part of the benchmark
+                solution = runner_methods.CSVFileData.calculate_implied_volatilities(data, -1, runner_methods.SolveOptions(engine))
+            durations.append(time.perf_counter() - start_time)
+        imp_vol = np.array([row[7] for row in solution.body], dtype=np.float64)
+        result = {'engine': engine, 'solver': solver, 'rows': len(book),
+                  'seconds': min(durations), 'rows per second': len(book) / min(durations),
+                  'pricings per solve': None, 'latency (microseconds)': None,
+                  'accuracy': accuracy(book, imp_vol)}
+        if engine == 'scalar':
+            result.update(single_solve_timings(book))
+        return result
+    finally:
+        TradeData.solver = previous_solver
+
+
+# times each accepted row's trade object solve on its own, counting the pricings of the bracketed solves
+def single_solve_timings(book):
+    store = TradeColumns.from_csv_columns(book.csv_columns())
+    accepted = (arbitrage_rejections(store) == ACCEPTED).tolist()
+    latencies, evaluations, bracketed_solves = [], 0, 0
+    for row in store.rows():
+        if not accepted[row.index]:
+            continue
+        trade = runner_methods.create_instance_of_trade_object(row)
+        start_time = time.perf_counter()
+        trade.calc_implied_volatility()
+        latencies.append((time.perf_counter() - start_time) * 1e6)
+        if trade.solve_stats is not None:
+            evaluations += trade.solve_stats.evaluations
+            bracketed_solves += 1
+    return {'pricings per solve': evaluations / bracketed_solves if bracketed_solves else None,
+            'latency (microseconds)': percentiles(latencies)}
+
+
+# runs every configuration over the book
+def run_benchmarks(book, configurations=CONFIGURATIONS, repeats=1):
+    return {'seed': book.seed, 'rows': len(book),
+            'results': [run_benchmark(book, engine, solver, repeats) for engine, solver in configurations]}
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# a bracketed root finder for many functions at once, for the batch engine (see batch_engine.py)
+# based on 'A new hybrid quadratic/bisection algorithm for finding the zero of a nonlinear function without using derivatives',
+# Chandrupatla, 1997 - each step is inverse quadratic interpolation through the last three points where that is well behaved,
+# and bisection otherwise, so (like brent-dekker, see bd_var_bounds.py) the root never leaves the bracket and the bracket always
+# shrinks, but the choice between the two is a simple test on the last three points, which works as a mask over arrays
+# every lane (function) is stepped together, and lanes drop out of the active set as they converge, so later iterations only
+# evaluate the functions that are still being solved
+import numpy as np
+
+EPSILON = np.finfo(np.float64).eps
+
+
+# the roots of the functions bracketed by [lower, upper], where f(x, lanes) gives the value of the functions of the given lanes
+# (an array of indices into lower / upper) at the array of points x - any vectorised pricing function fits, by selecting the rows
+# of the lanes it is asked for
+# f_lower and f_upper are the (already known) values at the ends of the brackets, which must lie either side of zero
+# a lane stops when its bracket is narrower than about 2 * x_tolerance (plus a few ulps of the root), when the function is exactly
+# zero, or after max_iter steps - and is given nan if the function is undefined (nan) within its bracket
+# returns the array of roots, and the array of the number of steps (evaluations of f) taken by each lane
+def chandrupatla(f, lower, upper, f_lower, f_upper, x_tolerance=5e-13, max_iter=100):
+    n = len(lower)
+    roots, steps = np.full(n, np.nan), np.zeros(n, dtype=np.int64)
+    # a is the newest point, b the other end of the bracket, c the point a replaced
+    a, b, c = np.array(lower, dtype=np.float64), np.array(upper, dtype=np.float64), np.array(lower, dtype=np.float64)
+    f_a, f_b, f_c = np.array(f_lower, dtype=np.float64), np.array(f_upper, dtype=np.float64), np.array(f_lower, dtype=np.float64)
+    lanes = np.arange(n)
+    t = np.full(n, 0.5)
+
+    # an end of the bracket may already be a root
+    exact = (f_a == 0) | (f_b == 0)
+    roots[exact] = np.where(f_a[exact] == 0, a[exact], b[exact])
+    active = ~exact
+    lanes, a, b, c, f_a, f_b, f_c, t = (values[active] for values in [lanes, a, b, c, f_a, f_b, f_c, t])
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            if len(lanes) == 0:
+                break
+            x_t = a + t * (b - a)
+            f_t = f(x_t, lanes)
+            steps[lanes] += 1
+            # keep the end of the bracket on the other side of the root from x_t
+            same_side = np.sign(f_t) == np.sign(f_a)
+            c, f_c = np.where(same_side, a, b), np.where(same_side, f_a, f_b)
+            b, f_b = np.where(same_side, b, a), np.where(same_side, f_b, f_a)
+            a, f_a = x_t, f_t
+
+            # the end with the smallest value is the best estimate of the root
+            a_is_best = np.abs(f_a) < np.abs(f_b)
+            x_m = np.where(a_is_best, a, b)
+            tolerance = 2.0 * EPSILON * np.abs(x_m) + x_tolerance
+            t_limit = tolerance / np.abs(b - a)
+            undefined = np.isnan(f_t)
+            done = (t_limit > 0.5) | (np.where(a_is_best, f_a, f_b) == 0) | undefined
+            roots[lanes[done]] = np.where(undefined[done], np.nan, x_m[done])
+
+            # inverse quadratic interpolation where the last three points are well behaved, otherwise bisection
+            xi, phi = (a - b) / (c - b), (f_a - f_b) / (f_c - f_b)
+            interpolate = (phi ** 2 < xi) & ((1.0 - phi) ** 2 < 1.0 - xi)
+            t = np.where(interpolate, f_a / (f_b - f_a) * f_c / (f_b - f_c) + (c - a) / (b - a) * f_a / (f_c - f_a) * f_b / (f_c - f_b),
+                         0.5)
+            # never closer to an end than the tolerance, so that every step shrinks the bracket
+            t = np.clip(t, t_limit, 1.0 - t_limit)
+
+            active = ~done
+            lanes, a, b, c, f_a, f_b, f_c, t = (values[active] for values in [lanes, a, b, c, f_a, f_b, f_c, t])
+        else:
+            # the lanes that did not converge within max_iter steps keep their best estimate
+            if len(lanes) > 0:
+                roots[lanes] = np.where(np.abs(f_a) < np.abs(f_b), a, b)
+    return roots, steps
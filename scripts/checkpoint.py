@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# checkpoints of a long run, so that it can be resumed (with '--resume') after a crash or pre-emption, rather than started again
+# the input file is solved chunk by chunk (as when streaming), and after each chunk is written the checkpoint records how many input
+# rows are done and how long the output (and diagnostics and reject) files were at that point
+# a resumed run cuts the output files back to those lengths (dropping anything written after the last checkpoint), skips the rows
+# that are done and carries on - as every chunk is solved independently, the final output is byte for byte that of an unbroken run
+# the checkpoint also records the settings of the run, and a run with different settings (which could give different output) will
+# not resume from it
+import json
+import os
+
+
+class Checkpoint:
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings  # a dictionary of everything the output depends on, which must match to resume
+
+    # the state saved by the last checkpoint (see save), or None if there is no checkpoint to resume from
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint['settings'] != self.settings:
+            raise ValueError("the checkpoint %s was made with different settings: %s" % (self.path, checkpoint['settings']))
+        checkpoint['nan counts'] = {int(reason): count for reason, count in checkpoint['nan counts'].items()}
+        return checkpoint
+
+    # written to a temporary file and then moved into place, so that a crash while saving leaves the last checkpoint as it was
+    # the reject file is only created once a row is rejected, so until then has no length (None)
+    def save(self, rows, output_length, diagnostics_length, nan_counts, rejects_length=None, rows_rejected=0):
+        checkpoint = {'settings': self.settings, 'rows': rows, 'output length': output_length,
+                      'diagnostics length': diagnostics_length, 'nan counts': dict(nan_counts),
+                      'rejects length': rejects_length, 'rows rejected': rows_rejected}
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.path)
+
+    # once the run is finished, there is nothing to resume
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# opens a file to write, from the start - or, given a length, to carry on writing from that length (cutting off anything after it)
+def open_to_write(path, length=None):
+    if length is None:
+        return open(path, 'w')
+    output = open(path, 'r+')
+    output.truncate(length)
+    output.seek(length)
+    return output
+
+
+# makes sure that everything written to a file so far would survive a crash, returning its length
+def synced_length(output):
+    output.flush()
+    os.fsync(output.fileno())
+    return output.tell()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# typed ingestion of the input file: the rows read by the csv reader are turned into columns, and each column converted in bulk by
+# its type in the schema - the numeric columns straight to float64 arrays, the rest kept as strings for the trade store to encode
+# (see trade_store.py)
+# a row that cannot be read (the wrong number of fields, a value that is not a number, or a model type there is no trade class
+# for) is not solved, but quarantined with the reason in a reject file (see RejectFile), while the rest of the file carries on
+# each column is converted with a single numpy call, and only a column that fails is gone through value by value to find its bad rows
+import numpy as np
+import csv
+import os
+from scripts.trade_store import MODEL_CODES
+from scripts.checkpoint import open_to_write, synced_length
+
+# the columns of the input file, and their types - a column of codes is read as strings, with rows outside REQUIRED_CODES rejected
+NUMBER, TEXT = 'number', 'text'
+INPUT_SCHEMA = {'ID': TEXT, 'Underlying Type': TEXT, 'Underlying': NUMBER, 'Risk-Free Rate': NUMBER, 'Days To Expiry': NUMBER,
+                'Strike': NUMBER, 'Option Type': TEXT, 'Model Type': TEXT, 'Market Price': NUMBER}
+# the columns a row must have a recognised value in to be solved at all - an unrecognised underlying or option type is only
+# given nan (see price_bounds.py), but without a model type the trade has no class
+REQUIRED_CODES = {'Model Type': MODEL_CODES}
+
+REJECT_HEADER = ['Reject Reason']
+
+
+# the columns (header -> values) of the rows, typed by the schema, and a dictionary row index -> reason of the rows rejected
+# (any with a nan, as a placeholder, in their numeric columns) - the price columns (see '--prices') replace 'Market Price'
+def parse_rows(header, rows, prices=None):
+    schema = dict(INPUT_SCHEMA)
+    if prices:
+        del schema['Market Price']
+        schema.update({name: NUMBER for name in prices})
+    for name in schema:
+        if name not in header:
+            raise ValueError("no column named %s in the input file" % name)
+
+    rejects = {}
+    width = len(header)
+    if set(map(len, rows)) - {width}:
+        rejects = {i: "expected %s fields, found %s" % (width, len(row)) for i, row in enumerate(rows) if len(row) != width}
+        rows = [[''] * width if i in rejects else row for i, row in enumerate(rows)]
+    values = list(zip(*rows)) if rows else [()] * width
+    columns = {}
+    for i, name in enumerate(header):
+        if schema.get(name) == NUMBER:
+            columns[name], bad = number_column(values[i])
+            for index in bad:
+                rejects.setdefault(index, "invalid %s: '%s'" % (name, values[i][index]))
+        else:
+            columns[name] = values[i]
+    for name, codes in REQUIRED_CODES.items():
+        if set(columns[name]) - codes.keys():
+            for index, value in enumerate(columns[name]):
+                if value not in codes:
+                    rejects.setdefault(index, "unrecognised %s: '%s'" % (name, value))
+    return columns, rejects
+
+
+# the values as a float64 array, and the indices of the values that are not numbers (given nan)
+def number_column(values):
+    try:
+        return np.array(values, dtype=np.float64), []
+    except ValueError:
+        numbers, bad = np.empty(len(values)), []
+        for index, value in enumerate(values):
+            try:
+                numbers[index] = float(value)
+            except ValueError:
+                numbers[index] = np.nan
+                bad.append(index)
+        return numbers, bad
+
+
+# the file the rejected rows of a run are written to, as they were read with the reason for each - only created once there is a
+# row to write to it (any left by an earlier run is removed), and given a length (from a checkpoint), carried on from that length
+class RejectFile:
+
+    def __init__(self, path, header, length=None):
+        self.path = path
+        self.header = header  # the header of the input file
+        self.file, self.writer = None, None
+        if length is not None:
+            self.file = open_to_write(path, length)
+            self.writer = csv.writer(self.file)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        if self.file is not None:
+            self.file.close()
+
+    # writes rows (lists of the fields read, followed by the reason)
+    def write(self, rows):
+        if not rows:
+            return
+        if self.file is None:
+            self.file = open(self.path, 'w')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.header + REJECT_HEADER)
+        self.writer.writerows(rows)
+
+    # the length of the file, once safely written (None if it has not been created)
+    def synced_length(self):
+        return synced_length(self.file) if self.file is not None else None
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# implied volatility for the normal (bachelier) model without root finding, following
+# 'Implied Normal Volatility', P. Jaeckel, 2017
+# with x = -|F - K|/(sigma_n*sqrt(T)), the time value of the option is |F - K| * -phi_tilde(x), where phi_tilde(x) = N(x) + n(x)/x,
+# so sigma_n follows from inverting phi_tilde - a rational approximation gives x to a relative accuracy of ~3e-4, and a single
+# householder (third order) step polishes it to machine precision
+from math import log, sqrt, pi
+from scripts.normal_dist import erf_cdf as norm_cdf, erf_pdf as norm_pdf
+
+SQRT_TWO_PI = sqrt(2.0 * pi)
+
+# below this x, phi_tilde is evaluated with an asymptotic expansion, as N(x) and n(x)/x cancel
+ASYMPTOTIC_EXPANSION_THRESHOLD = -10.0
+
+
+# returns the normal volatility sigma_n such that the (undiscounted) normal model price of the option equals 'price', i.e.
+#   price = (F - K)N(d) + sigma_n*sqrt(T)*n(d) for a call (q = 1), with d = (F - K)/(sigma_n*sqrt(T)), and the call + K - F for a put (q = -1)
+# returns nan if the price lies below intrinsic value, and 0 at intrinsic value
+def implied_normal_volatility(price, F, K, T, q, polish=True):
+    if T <= 0.0:
+        return float('nan')
+    if F == K:
+        return price * SQRT_TWO_PI / sqrt(T)
+    time_value = price - max(q * (F - K), 0.0)
+    if time_value == 0.0:
+        return 0.0
+    if not time_value > 0.0:
+        return float('nan')
+    absolute_moneyness = abs(F - K)
+    x_star = inverse_phi_tilde(-time_value / absolute_moneyness, polish)
+    return absolute_moneyness / abs(x_star * sqrt(T))
+
+
+# phi_tilde(x) = N(x) + n(x)/x, for x < 0
+def phi_tilde(x):
+    if x < ASYMPTOTIC_EXPANSION_THRESHOLD:
+        # N(x) = n(x)R(x), with R(x) ~ sum_k (-1)^k (2k - 1)!! / |x|^(2k + 1), and the k = 0 term cancels with 1/x
+        inverse_x2 = 1.0 / (x * x)
+        total, term, k = 0.0, -1.0 / (x * x * abs(x)), 1
+        while abs(term) > 1e-17 * abs(total) and k < 64:
+            total += term
+            term *= -(2.0 * k + 1.0) * inverse_x2
+            k += 1
+        return norm_pdf(x) * total
+    return norm_cdf(x) + norm_pdf(x) / x
+
+
+# the x < 0 solving phi_tilde(x) = phi_tilde_star, for phi_tilde_star < 0
+def inverse_phi_tilde(phi_tilde_star, polish=True):
+    if phi_tilde_star < -0.001882039271:
+        # equation (2.1), for x in (-2.25, 0), as phi_tilde(-2.25) = -0.001882039271
+        # the asymptote as phi_tilde_star -> -infinity is x ~ 1/(sqrt(2pi)*(phi_tilde_star - 1/2))
+        g = 1.0 / (phi_tilde_star - 0.5)
+        g2 = g * g
+        xi_bar = (0.032114372355 - g2 * (0.016969777977 - g2 * (2.6207332461E-3 - 9.6066952861E-5 * g2))) / \
+            (1.0 - g2 * (0.6635646938 - g2 * (0.14528712196 - 0.010472855461 * g2)))
+        x_bar = g * (0.3989422804014326 + xi_bar * g2)
+    else:
+        # equation (2.2), for the remaining tail, x < -2.25
+        h = sqrt(-log(-phi_tilde_star))
+        x_bar = (9.4883409779 - h * (9.6320903635 - h * (0.58556997323 + 2.1464093351 * h))) / \
+            (1.0 - h * (0.65174820867 + h * (1.5120247828 + 6.6437847132E-5 * h)))
+    if not polish:
+        return x_bar
+    # equation (2.3), one householder step
+    q = (phi_tilde(x_bar) - phi_tilde_star) / norm_pdf(x_bar)
+    x2 = x_bar * x_bar
+    return x_bar + 3.0 * q * x2 * (2.0 - q * x_bar * (2.0 + x2)) / \
+        (6.0 + q * x_bar * (-12.0 + x_bar * (6.0 * q + x_bar * (-6.0 + q * x_bar * (3.0 + x2)))))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# incremental runs: re-running a file after only some of its rows have changed (e.g. a few prices or rates have ticked intraday),
+# only the new and changed rows are solved, and the rest take their results from the output of the previous run
+# the rows of the previous input file are matched to those of the new one by ID, and a row is unchanged if the hash of its content
+# (every field, as read) is the same - so the cost of a re-run is reading and hashing the file, plus solving what has changed
+# the settings a run was solved with are saved next to its output (see save_settings), and a run with different settings (e.g.
+# another solver, which could give different results) solves every row again
+import hashlib
+import json
+import csv
+import os
+
+
+# a hash of the content of an input row (its fields, as read from the csv file)
+def row_hash(row):
+    return hashlib.blake2b('\x1f'.join(row).encode(), digest_size=16).digest()
+
+
+# the results of a previous run, as a dictionary of ID -> (hash of the input row, output row)
+# the output row is cut to its first output_columns columns (the columns of a solution, see runner_methods.py), with the
+# implied volatility read back as a float - the other columns are kept as the strings they were written as
+# IDs given to more than one row of the previous input are left out, as they cannot be told apart
+def load_previous_results(input_file, output_file, header, output_columns):
+    with open(input_file, 'r') as previous_input, open(output_file, 'r') as previous_output:
+        input_reader, output_reader = csv.reader(previous_input), csv.reader(previous_output)
+        next(input_reader)
+        if next(output_reader, None) != header:
+            raise ValueError("the previous output file %s has different columns to this run" % output_file)
+        results, repeated = {}, set()
+        # the output has a row for each input row, in the same order (unless the previous run stopped early), less the rows
+        # that could not be read (see csv_schema.py)
+        for output_row in output_reader:
+            for input_row in input_reader:
+                if input_row and input_row[0] == output_row[0]:
+                    break
+            else:
+                raise ValueError("the previous output file %s does not match its input file %s" % (output_file, input_file))
+            if input_row[0] in results:
+                repeated.add(input_row[0])
+            output_row = output_row[:output_columns]
+            output_row[7] = float(output_row[7])
+            results[input_row[0]] = (row_hash(input_row), output_row)
+    for ID in repeated:
+        del results[ID]
+    return results
+
+
+# the file the settings of the run that wrote an output file are kept in
+def settings_path(output_file):
+    return output_file + '.settings'
+
+
+def save_settings(output_file, settings):
+    with open(settings_path(output_file), 'w') as settings_file:
+        json.dump(settings, settings_file)
+
+
+# the settings saved with an output file, or None if there are none (e.g. the run did not finish)
+def load_settings(output_file):
+    if not os.path.exists(settings_path(output_file)):
+        return None
+    with open(settings_path(output_file), 'r') as settings_file:
+        return json.load(settings_file)
+
+
+# an output file that is being written over no longer has the settings of the run that wrote it
+def remove_settings(output_file):
+    if os.path.exists(settings_path(output_file)):
+        os.remove(settings_path(output_file))
+
+
+# for each input row, its output row from the previous run if it is unchanged, otherwise None (it has to be solved)
+def reused_results(previous_results, rows):
+    reused = []
+    for row in rows:
+        previous = previous_results.get(row[0])
+        reused.append(previous[1] if previous is not None and previous[0] == row_hash(row) else None)
+    return reused
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# implied volatility for black-76 (i.e. options on a forward) without root bracketing, following
+# 'Let's Be Rational', P. Jaeckel, 2015 (i), and 'By Implication', P. Jaeckel, 2006 (ii)
+# the price is normalised to b(x, s) = exp(x/2)N(x/s + s/2) - exp(-x/2)N(x/s - s/2), with x = ln(F/K) and s = sigma*sqrt(T),
+# an initial guess for s is taken from a rational cubic interpolation of (a transformation of) b over one of four
+# segments, and at most two householder (third order) steps are then taken, which gives s to machine precision
+import sys
+from math import exp, log, sqrt, pi
+from scipy.special import erfcx, ndtri
+from scripts.normal_dist import erf_cdf as norm_cdf, erf_pdf as norm_pdf
+
+DBL_EPSILON = sys.float_info.epsilon
+DBL_MIN = sys.float_info.min
+DBL_MAX = sys.float_info.max
+SQRT_DBL_MAX = sqrt(DBL_MAX)
+FOURTH_ROOT_DBL_EPSILON = sqrt(sqrt(DBL_EPSILON))
+SIXTEENTH_ROOT_DBL_EPSILON = sqrt(sqrt(FOURTH_ROOT_DBL_EPSILON))
+
+ONE_OVER_SQRT_TWO = 1.0 / sqrt(2.0)
+ONE_OVER_SQRT_TWO_PI = 1.0 / sqrt(2.0 * pi)
+SQRT_PI_OVER_TWO = sqrt(pi / 2.0)
+SQRT_THREE = sqrt(3.0)
+SQRT_ONE_OVER_THREE = 1.0 / SQRT_THREE
+TWO_PI = 2.0 * pi
+PI_OVER_SIX = pi / 6.0
+TWO_PI_OVER_SQRT_TWENTY_SEVEN = 2.0 * pi / sqrt(27.0)
+
+# below this (h + t), b is evaluated with an asymptotic expansion of the mills ratio, and below SMALL_T_EXPANSION_THRESHOLD (t),
+# with a taylor expansion in t, as the plain formula suffers from cancellation in both regions
+ASYMPTOTIC_EXPANSION_THRESHOLD = -10.0
+SMALL_T_EXPANSION_THRESHOLD = 2.0 * SIXTEENTH_ROOT_DBL_EPSILON
+
+MINIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER = -(1.0 - sqrt(DBL_EPSILON))
+MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER = 2.0 / (DBL_EPSILON * DBL_EPSILON)
+
+HOUSEHOLDER_ITERATIONS = 2
+
+
+# returns sigma such that the black-76 price (undiscounted, i.e. price / discount factor) of the option equals 'price'
+# q = 1 for a call, q = -1 for a put
+# returns nan if the price lies on or below intrinsic value, or on or above the maximum possible price (F for a call, K for a put)
+def implied_volatility_from_a_transformed_rational_guess(price, F, K, T, q, N=HOUSEHOLDER_ITERATIONS):
+    if T <= 0.0 or F <= 0.0 or K <= 0.0:
+        return float('nan')
+    intrinsic = max(F - K, 0.0) if q > 0 else max(K - F, 0.0)
+    if price < intrinsic:
+        return float('nan')
+    max_price = K if q < 0 else F
+    if price >= max_price:
+        return float('nan')
+    x = log(F / K)
+    # map in-the-money options to out-of-the-money ones by put-call parity
+    if q * x > 0:
+        price = abs(max(price - intrinsic, 0.0))
+        q = -q
+    s = normalised_implied_volatility(price / (sqrt(F) * sqrt(K)), x, q, N)
+    return s / sqrt(T) if s > 0.0 else float('nan')
+
+
+# the normalised price of an out-of-the-money or at-the-money option (q*x <= 0) -> s = sigma*sqrt(T)
+def normalised_implied_volatility(beta, x, q, N=HOUSEHOLDER_ITERATIONS):
+    # map puts to calls, b_put(x, s) = b_call(-x, s)
+    if q < 0:
+        x = -x
+    if beta <= 0.0:
+        return 0.0
+    b_max = exp(0.5 * x)
+    if beta >= b_max:
+        return float('nan')
+
+    iterations, direction_reversal_count = 0, 0
+    f, s, ds, ds_previous = -DBL_MAX, -DBL_MAX, -DBL_MAX, 0.0
+    s_left, s_right = DBL_MIN, DBL_MAX
+
+    # the point of inflexion of b in s, splitting the lower and upper halves
+    s_c = sqrt(abs(2.0 * x))
+    b_c = normalised_black_call(x, s_c)
+    v_c = normalised_vega(x, s_c)
+
+    if beta < b_c:
+        s_l = s_c - b_c / v_c
+        b_l = normalised_black_call(x, s_l)
+        if beta < b_l:
+            # the lowest segment, where the guess is interpolated in f = 2pi/sqrt(27)|x|N(-|x|/(sqrt(3)s))^3, which is close to linear in beta
+            f_lower_map_l, d_f_lower_map_l_d_beta, d2_f_lower_map_l_d_beta2 = compute_f_lower_map_and_first_two_derivatives(
+                x, s_l)
+            r_ll = convex_rational_cubic_control_parameter_to_fit_second_derivative_at_right_side(
+                0.0, b_l, 0.0, f_lower_map_l, 1.0, d_f_lower_map_l_d_beta, d2_f_lower_map_l_d_beta2, True)
+            f = rational_cubic_interpolation(
+                beta, 0.0, b_l, 0.0, f_lower_map_l, 1.0, d_f_lower_map_l_d_beta, r_ll)
+            if not f > 0.0:  # roundoff for extreme |x|, so falls back to quadratic interpolation with f(0) = 0, f'(0) = 1
+                t = beta / b_l
+                f = (f_lower_map_l * t + b_l * (1.0 - t)) * t
+            s = inverse_f_lower_map(x, f)
+            s_right = s_l
+            # the objective function here is g(s) = 1/ln(b(s)) - 1/ln(beta), which is close to linear in s
+            ln_beta = log(beta)
+            while iterations < N and abs(ds) > DBL_EPSILON * s:
+                if ds * ds_previous < 0.0:
+                    direction_reversal_count += 1
+                if iterations > 0 and (direction_reversal_count == 3 or not s_left < s < s_right):
+                    # looping inefficiently, or stepped outside the bracket, so bisect instead
+                    s = 0.5 * (s_left + s_right)
+                    if s_right - s_left <= DBL_EPSILON * s:
+                        break
+                    direction_reversal_count = 0
+                    ds = 0.0
+                ds_previous = ds
+                b = normalised_black_call(x, s)
+                bp = normalised_vega(x, s)
+                if b > beta and s < s_right:
+                    s_right = s
+                elif b < beta and s > s_left:
+                    s_left = s
+                if b <= 0.0 or bp <= 0.0:  # underflow, so bisect for this iteration
+                    ds = 0.5 * (s_left + s_right) - s
+                else:
+                    ln_b = log(b)
+                    bpob = bp / b
+                    h = x / s
+                    b_halley = h * h / s - s / 4.0
+                    newton = (ln_beta - ln_b) * ln_b / ln_beta / bpob
+                    halley = b_halley - bpob * (1.0 + 2.0 / ln_b)
+                    b_hh3 = b_halley * b_halley - 3.0 * (h / s) ** 2 - 0.25
+                    hh3 = b_hh3 + 2.0 * bpob ** 2 * (1.0 + 3.0 / ln_b * (1.0 + 1.0 / ln_b)) - \
+                        3.0 * b_halley * bpob * (1.0 + 2.0 / ln_b)
+                    ds = newton * householder_factor(newton, halley, hh3)
+                ds = max(-0.5 * s, ds)
+                s += ds
+                iterations += 1
+            return s
+        else:
+            # the lower middle segment, interpolated in s directly
+            v_l = normalised_vega(x, s_l)
+            r_lm = convex_rational_cubic_control_parameter_to_fit_second_derivative_at_right_side(
+                b_l, b_c, s_l, s_c, 1.0 / v_l, 1.0 / v_c, 0.0, False)
+            s = rational_cubic_interpolation(
+                beta, b_l, b_c, s_l, s_c, 1.0 / v_l, 1.0 / v_c, r_lm)
+            s_left, s_right = s_l, s_c
+    else:
+        s_h = s_c + (b_max - b_c) / v_c if v_c > DBL_MIN else s_c
+        b_h = normalised_black_call(x, s_h)
+        if beta <= b_h:
+            # the upper middle segment, interpolated in s directly
+            v_h = normalised_vega(x, s_h)
+            r_hm = convex_rational_cubic_control_parameter_to_fit_second_derivative_at_left_side(
+                b_c, b_h, s_c, s_h, 1.0 / v_c, 1.0 / v_h, 0.0, False)
+            s = rational_cubic_interpolation(
+                beta, b_c, b_h, s_c, s_h, 1.0 / v_c, 1.0 / v_h, r_hm)
+            s_left, s_right = s_c, s_h
+        else:
+            # the highest segment, where the guess is interpolated in f = N(-s/2)
+            f_upper_map_h, d_f_upper_map_h_d_beta, d2_f_upper_map_h_d_beta2 = compute_f_upper_map_and_first_two_derivatives(
+                x, s_h)
+            if -SQRT_DBL_MAX < d2_f_upper_map_h_d_beta2 < SQRT_DBL_MAX:
+                r_hh = convex_rational_cubic_control_parameter_to_fit_second_derivative_at_left_side(
+                    b_h, b_max, f_upper_map_h, 0.0, d_f_upper_map_h_d_beta, -0.5, d2_f_upper_map_h_d_beta2, True)
+                f = rational_cubic_interpolation(
+                    beta, b_h, b_max, f_upper_map_h, 0.0, d_f_upper_map_h_d_beta, -0.5, r_hh)
+            if f <= 0.0:  # falls back to quadratic interpolation with f(b_h), f(b_max) = 0 and f'(b_max) = -1/2
+                h = b_max - b_h
+                t = (beta - b_h) / h
+                f = (f_upper_map_h * (1.0 - t) + 0.5 * h * t) * (1.0 - t)
+            s = inverse_f_upper_map(f)
+            s_left = s_h
+            if beta > 0.5 * b_max:
+                # the objective function here is g(s) = ln(b_max - beta) - ln(b_max - b(s))
+                while iterations < N and abs(ds) > DBL_EPSILON * s:
+                    if ds * ds_previous < 0.0:
+                        direction_reversal_count += 1
+                    if iterations > 0 and (direction_reversal_count == 3 or not s_left < s < s_right):
+                        s = 0.5 * (s_left + s_right)
+                        if s_right - s_left <= DBL_EPSILON * s:
+                            break
+                        direction_reversal_count = 0
+                        ds = 0.0
+                    ds_previous = ds
+                    b = normalised_black_call(x, s)
+                    bp = normalised_vega(x, s)
+                    if b > beta and s < s_right:
+                        s_right = s
+                    elif b < beta and s > s_left:
+                        s_left = s
+                    if b >= b_max or bp <= DBL_MIN:  # overflow, so bisect for this iteration
+                        ds = 0.5 * (s_left + s_right) - s
+                    else:
+                        b_max_minus_b = b_max - b
+                        g = log((b_max - beta) / b_max_minus_b)
+                        gp = bp / b_max_minus_b
+                        b_halley = (x / s) ** 2 / s - s / 4.0
+                        b_hh3 = b_halley * b_halley - 3.0 * (x / (s * s)) ** 2 - 0.25
+                        newton = -g / gp
+                        halley = b_halley + gp
+                        hh3 = b_hh3 + gp * (2.0 * gp + 3.0 * b_halley)
+                        ds = newton * householder_factor(newton, halley, hh3)
+                    ds = max(-0.5 * s, ds)
+                    s += ds
+                    iterations += 1
+                return s
+
+    # the two middle segments (and the lower part of the highest one), where the objective function is g(s) = b(s) - beta
+    while iterations < N and abs(ds) > DBL_EPSILON * s:
+        if ds * ds_previous < 0.0:
+            direction_reversal_count += 1
+        if iterations > 0 and (direction_reversal_count == 3 or not s_left < s < s_right):
+            s = 0.5 * (s_left + s_right)
+            if s_right - s_left <= DBL_EPSILON * s:
+                break
+            direction_reversal_count = 0
+            ds = 0.0
+        ds_previous = ds
+        b = normalised_black_call(x, s)
+        bp = normalised_vega(x, s)
+        if b > beta and s < s_right:
+            s_right = s
+        elif b < beta and s > s_left:
+            s_left = s
+        newton = (beta - b) / bp
+        halley = (x / s) ** 2 / s - s / 4.0
+        hh3 = halley * halley - 3.0 * (x / (s * s)) ** 2 - 0.25
+        ds = max(-0.5 * s, newton * householder_factor(newton, halley, hh3))
+        s += ds
+        iterations += 1
+    return s
+
+
+# the step of householder's third order method, as a multiple of the newton step
+def householder_factor(newton, halley, hh3):
+    return (1.0 + 0.5 * halley * newton) / (1.0 + newton * (halley + hh3 * newton / 6.0))
+
+
+# the normalised intrinsic value, exp(x/2) - exp(-x/2) for an in-the-money call (q = 1) or put (q = -1), otherwise 0
+def normalised_intrinsic(x, q):
+    if q * x <= 0.0:
+        return 0.0
+    x2 = x * x
+    if x2 < 98.0 * FOURTH_ROOT_DBL_EPSILON:  # 2sinh(x/2) by its taylor series, avoiding cancellation for small x
+        return abs(x * (1.0 + x2 * (1.0 / 24.0 + x2 * (1.0 / 1920.0 + x2 * (1.0 / 322560.0 + x2 / 92897280.0)))))
+    return abs(exp(0.5 * x) - exp(-0.5 * x))
+
+
+# the normalised black call price b(x, s)
+def normalised_black_call(x, s):
+    if x > 0.0:  # in-out duality, b(x, s) = intrinsic + b(-x, s)
+        return normalised_intrinsic(x, 1.0) + normalised_black_call(-x, s)
+    if s <= 0.0:
+        return 0.0
+    h, t = x / s, 0.5 * s
+    if h + t < ASYMPTOTIC_EXPANSION_THRESHOLD:
+        return asymptotic_expansion_of_normalised_black_call(h, t)
+    if t < SMALL_T_EXPANSION_THRESHOLD:
+        return small_t_expansion_of_normalised_black_call(h, t)
+    if h + t > 0.85:
+        return exp(0.5 * x) * norm_cdf(h + t) - exp(-0.5 * x) * norm_cdf(h - t)
+    # b = exp(-(h^2 + t^2)/2)/2 * (erfcx(-(h + t)/sqrt(2)) - erfcx(-(h - t)/sqrt(2)))
+    return 0.5 * exp(-0.5 * (h * h + t * t)) * float(erfcx(-ONE_OVER_SQRT_TWO * (h + t)) - erfcx(-ONE_OVER_SQRT_TWO * (h - t)))
+
+
+# with R(z) = N(z)/n(z) (the mills ratio of -z), b = n0 * (R(h + t) - R(h - t)), where n0 = exp(-(h^2 + t^2)/2)/sqrt(2pi)
+# for h + t << 0, R(z) ~ sum_k (-1)^k (2k - 1)!! / |z|^(2k + 1), and each difference |h + t|^-n - |h - t|^-n is built up
+# from positive terms (as |h - t| - |h + t| = 2t) to avoid cancellation
+def asymptotic_expansion_of_normalised_black_call(h, t):
+    u, v = -(h + t), t - h  # 0 < u < v
+    inverse_u, inverse_v = 1.0 / u, 1.0 / v
+    d_1 = 2.0 * t * inverse_u * inverse_v  # u^-1 - v^-1
+    d_n, inverse_v_n = d_1, inverse_v  # u^-n - v^-n and v^-n, for n = 1
+    total, coefficient, previous_term = d_1, 1.0, DBL_MAX
+    for k in range(1, 64):
+        for _ in range(2):  # n -> n + 1 -> n + 2
+            d_n = d_n * inverse_u + inverse_v_n * d_1
+            inverse_v_n *= inverse_v
+        coefficient *= -(2.0 * k - 1.0)
+        term = coefficient * d_n
+        if abs(term) >= abs(previous_term) or abs(term) <= DBL_EPSILON * abs(total):
+            break
+        total += term
+        previous_term = term
+    return ONE_OVER_SQRT_TWO_PI * exp(-0.5 * (h * h + t * t)) * total
+
+
+# R(h + t) - R(h - t) = 2 * sum_(k odd) R^(k)(h) t^k / k!, where R' = 1 + hR and R^(n + 1) = hR^(n) + nR^(n - 1)
+def small_t_expansion_of_normalised_black_call(h, t):
+    R_previous = SQRT_PI_OVER_TWO * float(erfcx(-ONE_OVER_SQRT_TWO * h))  # R(h)
+    R = 1.0 + h * R_previous  # R'(h)
+    total, t_k_over_k_factorial, w = 0.0, t, t * t
+    for k in range(1, 18, 2):
+        total += R * t_k_over_k_factorial
+        # two steps of the recurrence, R^(k) -> R^(k + 2)
+        R_previous, R = R, h * R + k * R_previous
+        R_previous, R = R, h * R + (k + 1) * R_previous
+        t_k_over_k_factorial *= w / ((k + 1) * (k + 2))
+    return 2.0 * ONE_OVER_SQRT_TWO_PI * exp(-0.5 * (h * h + t * t)) * total
+
+
+# db/ds
+def normalised_vega(x, s):
+    if s <= 0.0:
+        return 0.0
+    return ONE_OVER_SQRT_TWO_PI * exp(-0.5 * ((x / s) ** 2 + (0.5 * s) ** 2))
+
+
+def compute_f_lower_map_and_first_two_derivatives(x, s):
+    ax = abs(x)
+    z = SQRT_ONE_OVER_THREE * ax / s
+    y = z * z
+    s2 = s * s
+    Phi = norm_cdf(-z)
+    phi = norm_pdf(z)
+    fpp = PI_OVER_SIX * y / (s2 * s) * Phi * (8.0 * SQRT_THREE * s * ax + (3.0 * s2 * (s2 - 8.0) - 8.0 * x * x) * Phi / phi) * \
+        exp(2.0 * y + 0.25 * s2)
+    if abs(s) < DBL_MIN:
+        return 0.0, 1.0, fpp
+    Phi2 = Phi * Phi
+    fp = TWO_PI * y * Phi2 * exp(y + 0.125 * s2)
+    f = 0.0 if ax < DBL_MIN else TWO_PI_OVER_SQRT_TWENTY_SEVEN * ax * (Phi2 * Phi)
+    return f, fp, fpp
+
+
+def inverse_f_lower_map(x, f):
+    if abs(f) < DBL_MIN:
+        return 0.0
+    return abs(x / (SQRT_THREE * float(ndtri((f / (TWO_PI_OVER_SQRT_TWENTY_SEVEN * abs(x))) ** (1.0 / 3.0)))))
+
+
+def compute_f_upper_map_and_first_two_derivatives(x, s):
+    f = norm_cdf(-0.5 * s)
+    if abs(x) < DBL_MIN:
+        return f, -0.5, 0.0
+    w = (x / s) ** 2
+    return f, -0.5 * exp(0.5 * w), SQRT_PI_OVER_TWO * exp(w + 0.125 * s * s) * w / s
+
+
+def inverse_f_upper_map(f):
+    return -2.0 * float(ndtri(f))
+
+
+# the rational cubic interpolation of Delbourgo and Gregory, between (x_l, y_l) and (x_r, y_r) with gradients d_l and d_r,
+# and the control parameter r (r = 3 gives the cubic hermite spline, r -> infinity a straight line)
+def rational_cubic_interpolation(x, x_l, x_r, y_l, y_r, d_l, d_r, r):
+    h = x_r - x_l
+    if abs(h) <= 0.0:
+        return 0.5 * (y_l + y_r)
+    t = (x - x_l) / h
+    if r >= MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER:
+        return y_r * t + y_l * (1.0 - t)
+    omt = 1.0 - t
+    t2, omt2 = t * t, omt * omt
+    return (y_r * t2 * t + (r * y_r - h * d_r) * t2 * omt + (r * y_l + h * d_l) * t * omt2 + y_l * omt2 * omt) / \
+        (1.0 + (r - 3.0) * t * omt)
+
+
+def rational_cubic_control_parameter_to_fit_second_derivative_at_left_side(x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_l):
+    h = x_r - x_l
+    numerator = 0.5 * h * second_derivative_l + (d_r - d_l)
+    if abs(numerator) < DBL_MIN:
+        return 0.0
+    denominator = (y_r - y_l) / h - d_l
+    if abs(denominator) < DBL_MIN:
+        return MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER if numerator > 0.0 else MINIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    return numerator / denominator
+
+
+def rational_cubic_control_parameter_to_fit_second_derivative_at_right_side(x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_r):
+    h = x_r - x_l
+    numerator = 0.5 * h * second_derivative_r + (d_r - d_l)
+    if abs(numerator) < DBL_MIN:
+        return 0.0
+    denominator = d_r - (y_r - y_l) / h
+    if abs(denominator) < DBL_MIN:
+        return MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER if numerator > 0.0 else MINIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    return numerator / denominator
+
+
+# the smallest control parameter that keeps the interpolation monotonic and convex/concave, where the end points allow it
+def minimum_rational_cubic_control_parameter(d_l, d_r, s, prefer_shape_preservation_over_smoothness):
+    monotonic = d_l * s >= 0.0 and d_r * s >= 0.0
+    convex = d_l <= s <= d_r
+    concave = d_l >= s >= d_r
+    if not monotonic and not convex and not concave:
+        return MINIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    d_r_m_d_l, d_r_m_s, s_m_d_l = d_r - d_l, d_r - s, s - d_l
+    r1, r2 = -DBL_MAX, -DBL_MAX
+    if monotonic:
+        if abs(s) >= DBL_MIN:
+            r1 = (d_r + d_l) / s
+        elif prefer_shape_preservation_over_smoothness:
+            r1 = MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    if convex or concave:
+        if not (abs(s_m_d_l) < DBL_MIN or abs(d_r_m_s) < DBL_MIN):
+            r2 = max(abs(d_r_m_d_l / d_r_m_s), abs(d_r_m_d_l / s_m_d_l))
+        elif prefer_shape_preservation_over_smoothness:
+            r2 = MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    elif monotonic and prefer_shape_preservation_over_smoothness:
+        r2 = MAXIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER
+    return max(MINIMUM_RATIONAL_CUBIC_CONTROL_PARAMETER, r1, r2)
+
+
+def convex_rational_cubic_control_parameter_to_fit_second_derivative_at_left_side(x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_l,
+                                                                                  prefer_shape_preservation_over_smoothness):
+    r = rational_cubic_control_parameter_to_fit_second_derivative_at_left_side(
+        x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_l)
+    r_min = minimum_rational_cubic_control_parameter(
+        d_l, d_r, (y_r - y_l) / (x_r - x_l), prefer_shape_preservation_over_smoothness)
+    return max(r, r_min)
+
+
+def convex_rational_cubic_control_parameter_to_fit_second_derivative_at_right_side(x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_r,
+                                                                                   prefer_shape_preservation_over_smoothness):
+    r = rational_cubic_control_parameter_to_fit_second_derivative_at_right_side(
+        x_l, x_r, y_l, y_r, d_l, d_r, second_derivative_r)
+    r_min = minimum_rational_cubic_control_parameter(
+        d_l, d_r, (y_r - y_l) / (x_r - x_l), prefer_shape_preservation_over_smoothness)
+    return max(r, r_min)
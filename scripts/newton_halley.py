@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# a safeguarded newton / halley root finder, an alternative to bd_var_bounds for functions whose first and second
+# derivatives are cheap to compute alongside their value (e.g. an option price, its vega and its volga)
+# f(x) returns the tuple (f(x), f'(x), f''(x)) and, as with bd_var_bounds, the root is first bracketed (by walking up the
+# bounds ladder, or stepping out from an initial guess) - the bracket is then kept for the whole solve, and any step that would leave it is replaced by bisection
+# N.B. THIS WORKS ONLY ON INCREASING ROOTS (i.e. with pos. gradient), as bd_var_bounds
+
+# the function will automaticaly break after 'max_iter' number of iterations,
+# or once a step (or the bracket) is smaller than 'tolerance'
+from scripts.bd_var_bounds import (SolveStats, bisection_method, bracket_on_ladder, bracket_around_guess, unbracketed_termination,
+                                   GUESS_BRACKET_WIDTH, CONVERGED, EXACT_ROOT, MAX_ITERATIONS)
+
+
+def newton_halley(f, bounds, initial_guess=None, max_iter=50, tolerance=1e-8, guess_width=None):
+    root, _ = newton_halley_solve(f, bounds, initial_guess, max_iter, tolerance, guess_width)
+    return root
+
+
+def newton_halley_solve(f, bounds, initial_guess=None, max_iter=50, tolerance=1e-8, guess_width=None):
+    stats = SolveStats()
+    f = stats.counted(f)
+
+    # brackets exactly as bd_var_bounds_solve, keeping the derivatives at every point evaluated along the way
+    evaluated = {}
+
+    def f_value(x):
+        evaluated[x] = f(x)
+        return evaluated[x][0]
+
+    if initial_guess is not None and bounds[0] < initial_guess < bounds[-1]:
+        bracket = bracket_around_guess(f_value, initial_guess, bounds, guess_width or GUESS_BRACKET_WIDTH)
+    else:
+        bracket = bracket_on_ladder(f_value, bounds)
+        stats.rung = None if bracket is None else bounds.index(bracket[0])
+    if bracket is None:
+        stats.termination = unbracketed_termination(stats.last_value[0])
+        return float('nan'), stats
+    a, b, f_a, f_b = bracket
+
+    # starts from whichever end of the bracket is closer to the root
+    x = a if abs(f_a) < abs(f_b) else b
+    f_x, f_prime, f_double_prime = evaluated[x]
+    while True:
+        stats.bracket_width, stats.residual = b - a, f_x
+        if f_x == 0.0:
+            stats.termination = EXACT_ROOT
+            return x, stats
+        # keeps the root between 'a' and 'b'
+        if f_x < 0:
+            a = x
+        else:
+            b = x
+        stats.bracket_width = b - a
+        step = halley_step(f_x, f_prime, f_double_prime)
+        if abs(step) < tolerance:
+            stats.termination = CONVERGED
+            return x + step, stats
+        # falls back to bisection if the step is undefined or leaves the bracket
+        x = x + step
+        if not a < x < b:
+            x = bisection_method(a, b)
+        if abs(b - a) < tolerance or stats.iterations == max_iter:
+            stats.termination = CONVERGED if abs(b - a) < tolerance else MAX_ITERATIONS
+            return x, stats
+        f_x, f_prime, f_double_prime = f(x)
+        stats.iterations += 1
+
+
+# halley's step, -f/f' / (1 - f*f''/(2f'^2)), which reduces to newton's step (-f/f') when the correction is too large to trust
+# returns nan if f' is zero (or nan), so that bisection is used instead
+def halley_step(f_x, f_prime, f_double_prime):
+    if not f_prime > 0:
+        return float('nan')
+    newton = -f_x / f_prime
+    correction = 1.0 + newton * f_double_prime / (2.0 * f_prime)
+    if 0.5 < correction < 2.0:
+        return newton / correction
+    return newton
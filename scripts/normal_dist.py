@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# the standard normal distribution functions (cdf N() and pdf n()) used by the pricing code, with a selectable backend:
+#   'erf'   - pure python using math.erfc/math.exp, fastest for single floats (default)
+#   'numpy' - numpy/scipy ufuncs, for arrays (used by the batch engine regardless of the selected backend)
+#   'scipy' - scipy.stats.norm, kept as the reference the other backends are tested against
+# the pricing code should call normal_dist.cdf / normal_dist.pdf (rather than importing them) so that set_backend takes effect
+import numpy as np
+from math import erf, erfc, exp, sqrt, pi
+from scipy.special import ndtr
+from scipy.stats import norm
+
+ONE_OVER_SQRT_TWO = 1.0 / sqrt(2.0)
+ONE_OVER_SQRT_TWO_PI = 1.0 / sqrt(2.0 * pi)
+
+
+# N(x) = (1 + erf(x/sqrt(2)))/2 near the origin, otherwise computed from erfc(|x|/sqrt(2)) to keep full relative precision in the tails
+# (this is the same split as cephes' ndtr, used by scipy, so the two agree to the last bit or so)
+def erf_cdf(x):
+    z = x * ONE_OVER_SQRT_TWO
+    if abs(z) < ONE_OVER_SQRT_TWO:
+        return 0.5 + 0.5 * erf(z)
+    y = 0.5 * erfc(abs(z))
+    return 1.0 - y if z > 0 else y
+
+
+def erf_pdf(x):
+    return ONE_OVER_SQRT_TWO_PI * exp(-0.5 * x * x)
+
+
+def numpy_cdf(x):
+    return ndtr(x)
+
+
+def numpy_pdf(x):
+    return ONE_OVER_SQRT_TWO_PI * np.exp(-0.5 * np.square(x))
+
+
+def scipy_cdf(x):
+    return norm.cdf(x)
+
+
+def scipy_pdf(x):
+    return norm.pdf(x)
+
+
+BACKENDS = {'erf': (erf_cdf, erf_pdf),
+            'numpy': (numpy_cdf, numpy_pdf),
+            'scipy': (scipy_cdf, scipy_pdf)}
+
+backend = 'erf'
+cdf, pdf = BACKENDS[backend]
+
+
+def set_backend(name):
+    global backend, cdf, pdf
+    if name not in BACKENDS:
+        raise ValueError("invalid normal distribution backend: %s" % name)
+    backend = name
+    cdf, pdf = BACKENDS[name]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# a no-arbitrage pre-filter, run over a whole TradeColumns store (see trade_store.py) before any solving
+# rows whose market price lies outside the prices the model can give (for any sigma > 0) can only be nan, so are rejected
+# here, with a reason code, rather than being found out by walking the whole volatility ladder
+# for both models, with A = the discounted underlying (S for a stock, Sexp(-rt) for a future) and B = the discounted strike Kexp(-rt):
+#   black-scholes: max(A - B, 0) < call < A and max(B - A, 0) < put < B
+#   bachelier:     max(A - B, 0) < call and max(B - A, 0) < put (the price is unbounded above as sigma grows)
+import numpy as np
+from scripts.trade_store import INVALID_CODE, BLACK_SCHOLES, FUTURE, CALL
+
+ACCEPTED = 0
+INVALID_INPUTS = 1
+UNSUPPORTED_TYPE = 2
+NON_POSITIVE_PRICE = 3
+BELOW_INTRINSIC_VALUE = 4
+ABOVE_UPPER_BOUND = 5
+# given after solving, to rows that passed the filter but still have no solution within VOLATILITY_BOUNDS
+OUTSIDE_VOLATILITY_BOUNDS = 6
+
+REASONS = {ACCEPTED: '',
+           INVALID_INPUTS: 'invalid inputs',
+           UNSUPPORTED_TYPE: 'unsupported underlying or option type',
+           NON_POSITIVE_PRICE: 'non-positive price',
+           BELOW_INTRINSIC_VALUE: 'below intrinsic value',
+           ABOVE_UPPER_BOUND: 'above upper bound',
+           OUTSIDE_VOLATILITY_BOUNDS: 'outside volatility bounds'}
+
+
+# the lowest and highest prices each row can have, as arrays (see above)
+def price_bounds(columns):
+    with np.errstate(all='ignore'):
+        exp_rt = columns.row_factors()[1]
+        A = np.where(columns.underlying == FUTURE, columns.S * exp_rt, columns.S)
+        B = columns.K * exp_rt
+        is_call = columns.option == CALL
+        lower = np.maximum(np.where(is_call, A - B, B - A), 0.0)
+        upper = np.where(columns.model == BLACK_SCHOLES, np.where(is_call, A, B), np.inf)
+    return lower, upper
+
+
+# the reason code of every row, ACCEPTED for the rows that should be solved
+def arbitrage_rejections(columns):
+    lower, upper = price_bounds(columns)
+    V0 = columns.V0
+    # black-scholes needs a positive underlying (for log(S/K)), both models need a positive strike and time to expiry
+    valid_inputs = (columns.K > 0) & (columns.t > 0) & np.isfinite(columns.r) & np.isfinite(V0) & \
+        ((columns.S > 0) | (columns.model != BLACK_SCHOLES)) & np.isfinite(columns.S)
+    supported = (columns.underlying != INVALID_CODE) & (columns.option != INVALID_CODE) & (columns.model != INVALID_CODE)
+    with np.errstate(invalid='ignore'):
+        return np.select([~valid_inputs, ~supported, V0 <= 0, V0 < lower, V0 >= upper],
+                         [INVALID_INPUTS, UNSUPPORTED_TYPE, NON_POSITIVE_PRICE, BELOW_INTRINSIC_VALUE, ABOVE_UPPER_BOUND],
+                         ACCEPTED).astype(np.int8)
+
+
+# gives OUTSIDE_VOLATILITY_BOUNDS to the accepted rows that solved to nan
+def solved_reasons(rejections, imp_vol):
+    return np.where((rejections == ACCEPTED) & np.isnan(imp_vol), OUTSIDE_VOLATILITY_BOUNDS, rejections).astype(np.int8)
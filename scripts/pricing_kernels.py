@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# specialised pricing functions ('kernels') of sigma, one per (model, underlying type, option type), used by the bracketed solvers
+# each builder takes a single trade's S, K, r and t, and computes everything that does not depend on sigma (log(S/K), sqrt(t),
+# exp(-rt), ...) once, returning the functions:
+#   price(sigma) - the value of the trade
+#   price_and_greeks(sigma) - the tuple (value, vega, volga), where vega and volga are the first and second derivatives in sigma
+#   greeks(sigma) - the tuple (delta, gamma, vega, theta) reported at the solved sigma, where delta and gamma are the first and
+#   second derivatives in the underlying S (spot or future), and theta is the change in value as time passes, -dV/dt (per year)
+# the operations are kept in the same order as the formulas in trade_classes.py, so the values are identical to the last bit
+from math import log, sqrt, exp
+from scripts import normal_dist
+
+
+# black-scholes, stock: call = SN(d1) - Kexp(-rt)N(d2), put = Kexp(-rt)N(-d2) - SN(-d1)
+# d1 = (log(S/K) + (r + sigma^2/2)t)/(sigma*sqrt(t)), d2 = d1 - sigma*sqrt(t), vega = Sn(d1)sqrt(t), volga = vega*d1*d2/sigma
+def black_scholes_stock_call(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    log_moneyness, discounted_strike = log(S / K), K * discount
+
+    def price(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        return S * cdf(d1) - discounted_strike * cdf(d1 - sigma * sqrt_t)
+
+    def price_and_greeks(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        d2 = d1 - sigma * sqrt_t
+        vega = S * pdf(d1) * sqrt_t
+        return S * cdf(d1) - discounted_strike * cdf(d2), vega, vega * d1 * d2 / sigma
+
+    # delta = N(d1), gamma = n(d1)/(S*sigma*sqrt(t)), theta = -Sn(d1)sigma/(2sqrt(t)) - rKexp(-rt)N(d2)
+    def greeks(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        n_d1 = pdf(d1)
+        theta = -S * n_d1 * sigma / (2.0 * sqrt_t) - r * discounted_strike * cdf(d1 - sigma * sqrt_t)
+        return cdf(d1), n_d1 / (S * sigma * sqrt_t), S * n_d1 * sqrt_t, theta
+
+    return price, price_and_greeks, greeks
+
+
+def black_scholes_stock_put(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    log_moneyness, discounted_strike = log(S / K), K * discount
+
+    def price(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        return -S * cdf(-d1) + discounted_strike * cdf(-(d1 - sigma * sqrt_t))
+
+    def price_and_greeks(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        d2 = d1 - sigma * sqrt_t
+        vega = S * pdf(d1) * sqrt_t
+        return -S * cdf(-d1) + discounted_strike * cdf(-d2), vega, vega * d1 * d2 / sigma
+
+    # delta = -N(-d1), gamma = n(d1)/(S*sigma*sqrt(t)), theta = -Sn(d1)sigma/(2sqrt(t)) + rKexp(-rt)N(-d2)
+    def greeks(sigma):
+        d1 = (log_moneyness + (r + sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        n_d1 = pdf(d1)
+        theta = -S * n_d1 * sigma / (2.0 * sqrt_t) + r * discounted_strike * cdf(-(d1 - sigma * sqrt_t))
+        return -cdf(-d1), n_d1 / (S * sigma * sqrt_t), S * n_d1 * sqrt_t, theta
+
+    return price, price_and_greeks, greeks
+
+
+# black-scholes, future (black-76): call = exp(-rt)(SN(d1) - KN(d2)), put = exp(-rt)(KN(-d2) - SN(-d1))
+# d1 = (log(S/K) + (sigma^2/2)t)/(sigma*sqrt(t)), d2 = d1 - sigma*sqrt(t), vega = exp(-rt)Sn(d1)sqrt(t), volga = vega*d1*d2/sigma
+def black_scholes_future_call(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    log_moneyness = log(S / K)
+    discounted_underlying = discount * S
+
+    def price(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        return discount * (S * cdf(d1) - K * cdf(d1 - sigma * sqrt_t))
+
+    def price_and_greeks(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        d2 = d1 - sigma * sqrt_t
+        vega = discounted_underlying * pdf(d1) * sqrt_t
+        return discount * (S * cdf(d1) - K * cdf(d2)), vega, vega * d1 * d2 / sigma
+
+    # delta = exp(-rt)N(d1), gamma = exp(-rt)n(d1)/(S*sigma*sqrt(t)), theta = rV - exp(-rt)Sn(d1)sigma/(2sqrt(t))
+    def greeks(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        n_d1, N_d1 = pdf(d1), cdf(d1)
+        value = discount * (S * N_d1 - K * cdf(d1 - sigma * sqrt_t))
+        theta = r * value - discounted_underlying * n_d1 * sigma / (2.0 * sqrt_t)
+        return discount * N_d1, discount * n_d1 / (S * sigma * sqrt_t), discounted_underlying * n_d1 * sqrt_t, theta
+
+    return price, price_and_greeks, greeks
+
+
+def black_scholes_future_put(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    log_moneyness = log(S / K)
+    discounted_underlying = discount * S
+
+    def price(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        return discount * (K * cdf(-(d1 - sigma * sqrt_t)) - S * cdf(-d1))
+
+    def price_and_greeks(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        d2 = d1 - sigma * sqrt_t
+        vega = discounted_underlying * pdf(d1) * sqrt_t
+        return discount * (K * cdf(-d2) - S * cdf(-d1)), vega, vega * d1 * d2 / sigma
+
+    # delta = -exp(-rt)N(-d1), gamma = exp(-rt)n(d1)/(S*sigma*sqrt(t)), theta = rV - exp(-rt)Sn(d1)sigma/(2sqrt(t))
+    def greeks(sigma):
+        d1 = (log_moneyness + (sigma ** 2 / 2.0) * t) / (sigma * sqrt_t)
+        n_d1, N_minus_d1 = pdf(d1), cdf(-d1)
+        value = discount * (K * cdf(-(d1 - sigma * sqrt_t)) - S * N_minus_d1)
+        theta = r * value - discounted_underlying * n_d1 * sigma / (2.0 * sqrt_t)
+        return -discount * N_minus_d1, discount * n_d1 / (S * sigma * sqrt_t), discounted_underlying * n_d1 * sqrt_t, theta
+
+    return price, price_and_greeks, greeks
+
+
+# bachelier, stock: call = (S - K_mod)N(d) + K_mod*sigma*sqrt(t)*n(d), put = call + K_mod - S, where K_mod = Kexp(-rt)
+# d = (S - K_mod)/(K_mod*sigma*sqrt(t)), vega = K_mod*sqrt(t)n(d), volga = vega*d^2/sigma
+def bachelier_stock_call(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    K_mod = K * discount
+    moneyness = S - K_mod
+
+    def price(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        return moneyness * cdf(d) + K_mod * sigma * sqrt_t * pdf(d)
+
+    def price_and_greeks(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        n_d = pdf(d)
+        vega = K_mod * sqrt_t * n_d
+        return moneyness * cdf(d) + K_mod * sigma * sqrt_t * n_d, vega, vega * d * d / sigma
+
+    # delta = N(d), gamma = n(d)/(K_mod*sigma*sqrt(t)), theta = -rK_mod*N(d) - K_mod*sigma*n(d)(1/(2sqrt(t)) - r*sqrt(t))
+    def greeks(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        n_d = pdf(d)
+        theta = -r * K_mod * cdf(d) - K_mod * sigma * n_d * (1.0 / (2.0 * sqrt_t) - r * sqrt_t)
+        return cdf(d), n_d / (K_mod * sigma * sqrt_t), K_mod * sqrt_t * n_d, theta
+
+    return price, price_and_greeks, greeks
+
+
+def bachelier_stock_put(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    K_mod = K * discount
+    moneyness = S - K_mod
+
+    def price(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        return moneyness * cdf(d) + K_mod * sigma * sqrt_t * pdf(d) + K_mod - S
+
+    def price_and_greeks(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        n_d = pdf(d)
+        vega = K_mod * sqrt_t * n_d
+        return moneyness * cdf(d) + K_mod * sigma * sqrt_t * n_d + K_mod - S, vega, vega * d * d / sigma
+
+    # delta = N(d) - 1, gamma = n(d)/(K_mod*sigma*sqrt(t)), theta = the call's theta + rK_mod
+    def greeks(sigma):
+        d = moneyness / (K_mod * sigma * sqrt_t)
+        n_d = pdf(d)
+        theta = -r * K_mod * cdf(d) - K_mod * sigma * n_d * (1.0 / (2.0 * sqrt_t) - r * sqrt_t) + r * K_mod
+        return cdf(d) - 1.0, n_d / (K_mod * sigma * sqrt_t), K_mod * sqrt_t * n_d, theta
+
+    return price, price_and_greeks, greeks
+
+
+# bachelier, future: call = (S - K)exp(-rt)N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d), put = call + Kexp(-rt) - Sexp(-rt)
+# d = (S - K)/(K*sigma*sqrt(t)), vega = Kexp(-rt)sqrt(t)n(d), volga = vega*d^2/sigma
+def bachelier_future_call(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    moneyness, discounted_moneyness, discounted_strike = S - K, (S - K) * discount, K * discount
+
+    def price(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        return discounted_moneyness * cdf(d) + discounted_strike * sigma * sqrt_t * pdf(d)
+
+    def price_and_greeks(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        n_d = pdf(d)
+        vega = discounted_strike * sqrt_t * n_d
+        return discounted_moneyness * cdf(d) + discounted_strike * sigma * sqrt_t * n_d, vega, vega * d * d / sigma
+
+    # delta = exp(-rt)N(d), gamma = exp(-rt)n(d)/(K*sigma*sqrt(t)), theta = rV - Kexp(-rt)sigma*n(d)/(2sqrt(t))
+    def greeks(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        n_d, N_d = pdf(d), cdf(d)
+        value = discounted_moneyness * N_d + discounted_strike * sigma * sqrt_t * n_d
+        theta = r * value - discounted_strike * sigma * n_d / (2.0 * sqrt_t)
+        return discount * N_d, discount * n_d / (K * sigma * sqrt_t), discounted_strike * sqrt_t * n_d, theta
+
+    return price, price_and_greeks, greeks
+
+
+def bachelier_future_put(S, K, r, t, factors=None):
+    cdf, pdf = normal_dist.cdf, normal_dist.pdf
+    sqrt_t, discount = time_factors(r, t, factors)
+    moneyness, discounted_moneyness, discounted_strike = S - K, (S - K) * discount, K * discount
+    discounted_underlying = S * discount
+
+    def price(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        return discounted_moneyness * cdf(d) + discounted_strike * sigma * sqrt_t * pdf(d) + discounted_strike - discounted_underlying
+
+    def price_and_greeks(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        n_d = pdf(d)
+        vega = discounted_strike * sqrt_t * n_d
+        value = discounted_moneyness * cdf(d) + discounted_strike * sigma * sqrt_t * n_d + discounted_strike - discounted_underlying
+        return value, vega, vega * d * d / sigma
+
+    # delta = exp(-rt)(N(d) - 1), gamma = exp(-rt)n(d)/(K*sigma*sqrt(t)), theta = rV - Kexp(-rt)sigma*n(d)/(2sqrt(t))
+    def greeks(sigma):
+        d = moneyness / (K * sigma * sqrt_t)
+        n_d, N_d = pdf(d), cdf(d)
+        value = discounted_moneyness * N_d + discounted_strike * sigma * sqrt_t * n_d + discounted_strike - discounted_underlying
+        theta = r * value - discounted_strike * sigma * n_d / (2.0 * sqrt_t)
+        return discount * (N_d - 1.0), discount * n_d / (K * sigma * sqrt_t), discounted_strike * sqrt_t * n_d, theta
+
+    return price, price_and_greeks, greeks
+
+
+KERNELS = {('BlackScholes', 'Stock', 'Call'): black_scholes_stock_call,
+           ('BlackScholes', 'Stock', 'Put'): black_scholes_stock_put,
+           ('BlackScholes', 'Future', 'Call'): black_scholes_future_call,
+           ('BlackScholes', 'Future', 'Put'): black_scholes_future_put,
+           ('Bachelier', 'Stock', 'Call'): bachelier_stock_call,
+           ('Bachelier', 'Stock', 'Put'): bachelier_stock_put,
+           ('Bachelier', 'Future', 'Call'): bachelier_future_call,
+           ('Bachelier', 'Future', 'Put'): bachelier_future_put}
+
+
+# the (price, price_and_greeks, greeks) kernel of a trade, or None for an unrecognised combination of types
+# factors are the (sqrt(t), exp(-rt), ...) shared by every trade with the same expiry and rate (see trade_store.py), which are
+# computed here if not given
+def pricing_kernel(model_type, underlying_type, option_type, S, K, r, t, factors=None):
+    build = KERNELS.get((model_type, underlying_type, option_type))
+    if build is None:
+        return None
+    return build(S, K, r, t, factors)
+
+
+# sqrt(t) and exp(-rt), from the shared factors of the trade's expiry and rate if given
+def time_factors(r, t, factors):
+    if factors is None:
+        return sqrt(t), exp(-r * t)
+    return factors[0], factors[1]
@@ -1,14 +1,39 @@
 #!/usr/bin/env python3
-from scripts.trade_classes import BlackScholes, Bachelier
+from scripts.trade_classes import BlackScholes, Bachelier, TradeData, SOLVERS
+from scripts.batch_engine import implied_volatility_accepted, implied_volatility_seeded, greeks as batch_greeks
+from scripts.trade_store import TradeColumns, TradeRow, columns_subset, with_prices
+from scripts.price_bounds import arbitrage_rejections, solved_reasons, ACCEPTED, REASONS
+from scripts.solve_cache import SolveCache, solve_key
+from scripts.solve_chain import chain_order, warm_started
+from scripts.bd_var_bounds import BELOW_LOWEST_BOUND, ABOVE_HIGHEST_BOUND, UNDEFINED_VALUE
+from scripts.telemetry import Telemetry, ProgressReporter
+from scripts.checkpoint import Checkpoint, open_to_write, synced_length
+from scripts.incremental import load_previous_results, reused_results, load_settings, save_settings, remove_settings
+from scripts.csv_schema import parse_rows, RejectFile
+from scripts import normal_dist
 from math import isnan
+from multiprocessing import Pool
+from functools import partial
+from contextlib import contextmanager
+from collections import Counter
+from itertools import islice, repeat
+import numpy as np
 import csv
+import os
 import time
 
+# 'scalar' builds and solves one trade object per row, 'batch' solves every row together as numpy columns (see batch_engine.py)
+ENGINES = ['scalar', 'batch']
+
 
 class ImpliedVolatilityCalculator:
 
     def __init__(self, system_arguments):
-        # system_arguments = [runner.py, input_file.csv, output_file.csv, lines_to_run]
+        # system_arguments = [runner.py, input_file.csv, output_file.csv, lines_to_run, --option=value, ...]
+        # options start with '--' and are separated out from the positional arguments
+        options = parse_options(system_arguments)
+        system_arguments = [
+            argument for argument in system_arguments if not argument.startswith('--')]
         self.input_file = system_arguments[1]
         self.output_file = system_arguments[2]
         # sets 'lines to run' property as -1 if another value is not given (so will read whole file)
@@ -18,18 +43,189 @@ class ImpliedVolatilityCalculator:
             self.lines_to_run = int(system_arguments[3])
         else:
             raise ValueError("wrong number of system arguments")
+        self.engine = options.get('engine', 'scalar')
+        if self.engine not in ENGINES:
+            raise ValueError("invalid engine: %s" % self.engine)
+        # the backend for the normal distribution functions used by the scalar pricing code (see normal_dist.py)
+        self.normal_backend = options.get('normal', 'erf')
+        normal_dist.set_backend(self.normal_backend)
+        # how the scalar engine solves each trade (see trade_classes.py)
+        TradeData.solver = options.get('solver', 'direct')
+        if TradeData.solver not in SOLVERS:
+            raise ValueError("invalid solver: %s" % TradeData.solver)
+        # streaming reads, solves and writes 'chunk_size' rows at a time, rather than holding the whole file in memory
+        self.stream = 'stream' in options
+        self.chunk_size = int(options.get('chunk-size', 1000))
+        if self.chunk_size < 1:
+            raise ValueError("chunk size must be at least 1")
+        # with more than one worker, chunks are solved in parallel by a pool of worker processes
+        self.workers = int(options.get('workers', 1))
+        if self.workers < 1:
+            raise ValueError("number of workers must be at least 1")
+        # adds a column to the output giving the reason for each nan result (see price_bounds.py)
+        self.nan_reasons = 'nan-reasons' in options
+        # caches the solution of each distinct quote, so repeated quotes are solved once (see solve_cache.py)
+        # '--cache-file=path' also loads the cache from (and saves it back to) a file, to reuse the solves of earlier runs
+        self.cache_file = options.get('cache-file')
+        self.cache = None
+        if 'cache' in options or 'cache-size' in options or self.cache_file:
+            if self.engine != 'scalar':
+                raise ValueError("the solve cache is only used by the scalar engine")
+            if self.workers > 1:
+                raise ValueError("the solve cache is not shared between worker processes")
+            self.cache = SolveCache(int(options.get('cache-size', 100000)))
+            if self.cache_file:
+                self.cache.load(self.cache_file)
+        # solves the trades of each chain (underlying and expiry) in order of strike, each starting from its neighbour's solution
+        # (see solve_chain.py) - results are still written in input order
+        self.chain = 'chain' in options
+        if self.chain and self.engine != 'scalar':
+            raise ValueError("chain mode is only used by the scalar engine")
+        # records how each bracketed solve went (see solve_diagnostics), as extra columns of the output with '--diagnostics',
+        # or in a separate file (by ID) with '--diagnostics=path' - nothing is recorded without the option
+        self.diagnostics = options.get('diagnostics')
+        if self.diagnostics and self.engine != 'scalar':
+            raise ValueError("diagnostics are only recorded by the scalar engine")
+        # adds the delta, gamma, vega and theta of each trade at its implied volatility to the output, computed straight after
+        # the solve from the same pricing kernel (see pricing_kernels.py), or the same columns with the batch engine
+        self.greeks = 'greeks' in options
+        # with '--prices=Mid,Bid,Ask', each row is solved at the price of each of the named input columns, the first taking the
+        # place of the 'Market Price' column and each of the others adding an implied volatility column to the output - the
+        # solution at the first price seeds the solves at the others (see TradeData.implied_volatility_at)
+        self.prices = options['prices'].split(',') if 'prices' in options else None
+        # rows that cannot be read (see csv_schema.py) are left out of the output and written, with the reason for each, to
+        # '--rejects=path', or next to the output file
+        self.rejects_file = options.get('rejects', os.path.splitext(self.output_file)[0] + '_rejects.csv')
+        self.solve_options = SolveOptions(self.engine, self.chain, bool(self.diagnostics), self.greeks, self.prices)
+        # the progress of the run is printed every 'progress-interval' seconds (0 for never), and with '--metrics=path' the
+        # stage timings, nan counts and solve time histograms of the run are written to a metrics file (see telemetry.py)
+        self.progress_interval = float(options.get('progress-interval', 10))
+        self.metrics_file = options.get('metrics')
+        self.telemetry = Telemetry(record_solve_times=bool(self.metrics_file))
+        # with '--checkpoint', the file is solved in chunks (as when streaming) and a checkpoint is saved after each chunk is
+        # written, so that an interrupted run can be carried on with '--resume' (see checkpoint.py) - the checkpoint is kept
+        # at '--checkpoint-file=path', or next to the output file, and is removed once the run is finished
+        self.resume = 'resume' in options
+        self.checkpoint = None
+        if 'checkpoint' in options or 'checkpoint-file' in options or self.resume:
+            self.checkpoint = Checkpoint(options.get('checkpoint-file', self.output_file + '.checkpoint'),
+                                         self.__checkpoint_settings())
+        # with '--previous-input=path', only the rows that are new or changed since the previous run (on that input file) are
+        # solved, the rest taking their results from its output - '--previous-output=path', or the output file (see incremental.py)
+        self.previous_input = options.get('previous-input')
+        self.previous_output = options.get('previous-output', self.output_file)
+        if self.previous_input and (self.workers > 1 or self.checkpoint is not None):
+            raise ValueError("incremental runs are not used with worker processes or checkpoints")
 
     def run_application(self):
         # timer to test efficiency
         start_time = time.time()
-        # creates a CSVFileData instance with the input file
-        input_CSV_data = self.__read_input_file()
-        # calculate the implied volatilities for input_CSV_data
-        output_CSV_data = CSVFileData.calculate_implied_volatilities(
-            input_CSV_data, self.lines_to_run)
-        # writes the solution data to the output file
-        self.__write_output_file(output_CSV_data)
-        print("--- took %s seconds ---" % (time.time() - start_time))
+        previous = None
+        if self.previous_input:
+            with self.telemetry.stage('parse'):
+                output_header = self.__output_header()
+                # results are only reused if they were solved the same way
+                if load_settings(self.previous_output) == self.__solve_settings():
+                    previous = load_previous_results(self.previous_input, self.previous_output, output_header,
+                                                     len(output_header) - 1 if self.nan_reasons else len(output_header))
+                else:
+                    print("--- the previous output was solved with other settings (or they are not known), so every row is solved ---")
+        remove_settings(self.output_file)
+        if self.stream or self.workers > 1 or self.checkpoint is not None:
+            self.__stream_input_to_output_file(previous)
+        else:
+            # creates a CSVFileData instance with the input file
+            with self.telemetry.stage('parse'):
+                input_CSV_data = self.__read_input_file()
+            total_rows = len(input_CSV_data.body) if self.lines_to_run < 0 else min(self.lines_to_run, len(input_CSV_data.body))
+            # calculate the implied volatilities for input_CSV_data
+            with ProgressReporter(self.telemetry, self.progress_interval, total_rows):
+                output_CSV_data = CSVFileData.calculate_implied_volatilities(
+                    input_CSV_data, self.lines_to_run, self.solve_options, self.cache, self.telemetry, previous)
+            self.telemetry.rows_finished(len(output_CSV_data.body))
+            # writes the solution data to the output file, and any rejected rows to the reject file
+            with self.telemetry.stage('write'):
+                self.__write_output_file(output_CSV_data)
+                with RejectFile(self.rejects_file, input_CSV_data.header) as rejects:
+                    rejects.write(output_CSV_data.rejects)
+        # recorded with the output, for an incremental run from it
+        save_settings(self.output_file, self.__solve_settings())
+        metrics = {}
+        if self.cache is not None:
+            print("--- solve cache: %s hits, %s misses ---" % (self.cache.hits, self.cache.misses))
+            metrics.update({'cache hits': self.cache.hits, 'cache misses': self.cache.misses})
+            if self.cache_file:
+                self.cache.save(self.cache_file)
+        if self.telemetry.rows_rejected:
+            print("--- %s rows rejected, written to %s ---" % (self.telemetry.rows_rejected, self.rejects_file))
+        metrics['rows rejected'] = self.telemetry.rows_rejected
+        if previous is not None:
+            print("--- incremental run: %s rows reused, %s solved ---" %
+                  (self.telemetry.rows_reused, self.telemetry.rows_done - self.telemetry.rows_reused))
+            metrics['rows reused'] = self.telemetry.rows_reused
+        run_seconds = time.time() - start_time
+        print("--- stage timings: %s ---" % self.telemetry.stage_summary())
+        print("--- %s rows at %.0f rows/s ---" % (self.telemetry.rows_done, self.telemetry.rows_done / run_seconds))
+        if self.metrics_file:
+            self.telemetry.write_metrics(self.metrics_file, run_seconds, REASONS, metrics)
+        print("--- took %s seconds ---" % run_seconds)
+
+    # solves the input file chunk by chunk, writing (and flushing) each chunk of results as it is solved
+    # with a pool of workers, chunks are solved in parallel but still written in input order (pool.imap keeps order)
+    # resuming from a checkpoint, the rows it records as done are skipped and the output carries on from where it was saved
+    def __stream_input_to_output_file(self, previous=None):
+        resumed = self.checkpoint.load() if self.resume else None
+        if resumed is not None:
+            print("--- resuming from checkpoint after %s rows ---" % resumed['rows'])
+        rows_done = resumed['rows'] if resumed else 0
+        lines_to_run = self.lines_to_run - rows_done if self.lines_to_run >= 0 else -1
+        with open(self.input_file, 'r') as input, \
+                open_to_write(self.output_file, resumed and resumed['output length']) as output, \
+                self.__diagnostics_file(resumed and resumed['diagnostics length']) as (diagnostics, diagnostics_writer):
+            input_reader = csv.reader(input, delimiter=',')
+            output_writer = csv.writer(output, delimiter=',')
+            header = next(input_reader)
+            rejects = RejectFile(self.rejects_file, header, resumed and resumed.get('rejects length'))
+            if resumed is None:
+                output_writer.writerow(self.__output_header())
+            input_rows = islice(input_reader, rows_done, None)
+            input_chunks = timed(read_in_chunks(input_rows, self.chunk_size, lines_to_run), self.telemetry, 'parse')
+            chunks = ((header, chunk, self.solve_options, self.telemetry.record_solve_times) for chunk in input_chunks)
+            progress = {'rows': rows_done, 'nan counts': Counter(resumed['nan counts'] if resumed else {})}
+            self.telemetry.rows_rejected = resumed.get('rows rejected', 0) if resumed else 0
+            write_chunk = partial(self.__write_chunk, output, output_writer, diagnostics, diagnostics_writer, rejects, progress)
+            with ProgressReporter(self.telemetry, self.progress_interval), rejects:
+                if self.workers > 1:
+                    # each worker times its own chunks, which are merged into the telemetry of the run
+                    with Pool(self.workers, initialise_worker, (self.normal_backend, TradeData.solver)) as pool:
+                        solved_chunks = pool.imap(solve_chunk, chunks)
+                        for solved_chunk in solved_chunks:
+                            self.telemetry.merge(solved_chunk.telemetry)
+                            write_chunk(solved_chunk)
+                else:
+                    solved_chunks = map(partial(solve_chunk, cache=self.cache, telemetry=self.telemetry, previous=previous),
+                                        chunks)
+                    for solved_chunk in solved_chunks:
+                        write_chunk(solved_chunk)
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+        self.telemetry.nan_counts = progress['nan counts']
+        print_nan_counts(progress['nan counts'])
+
+    # progress holds the number of input rows done and the nan counts so far, which are saved with each checkpoint
+    def __write_chunk(self, output, output_writer, diagnostics, diagnostics_writer, rejects, progress, solved_chunk):
+        self.telemetry.rows_finished(len(solved_chunk.body))
+        with self.telemetry.stage('write'):
+            progress['nan counts'] += write_rows(output_writer, solved_chunk, self.nan_reasons, diagnostics_writer)
+            rejects.write(solved_chunk.rejects)
+            progress['rows'] += len(solved_chunk.body) + len(solved_chunk.rejects)
+            if self.checkpoint is None:
+                output.flush()
+            else:
+                # the checkpoint is only saved once the rows it counts as done are safely written
+                diagnostics_length = synced_length(diagnostics) if diagnostics is not None else None
+                self.checkpoint.save(progress['rows'], synced_length(output), diagnostics_length, progress['nan counts'],
+                                     rejects.synced_length(), self.telemetry.rows_rejected)
 
     def __read_input_file(self):
         with open(self.input_file, 'r') as input:
@@ -38,22 +234,83 @@ class ImpliedVolatilityCalculator:
         return input_data
 
     def __write_output_file(self, csv_file_data):
-        with open(self.output_file, 'w') as output:
+        with open(self.output_file, 'w') as output, self.__diagnostics_file() as (_, diagnostics_writer):
             output_writer = csv.writer(output, delimiter=',')
-            output_writer.writerow(csv_file_data.header)  # writes file header
-            nan_count = 0
-            for line in csv_file_data.body:
-                if isnan(line[7]):
-                    nan_count += 1
-                output_writer.writerow(line)
-        print("--- total number of nan results: %s ---" % nan_count)
+            output_writer.writerow(self.__output_header())  # writes file header
+            nan_counts = write_rows(output_writer, csv_file_data, self.nan_reasons, diagnostics_writer)
+        self.telemetry.nan_counts = nan_counts
+        print_nan_counts(nan_counts)
+
+    def __output_header(self):
+        header = OUTPUT_HEADER + prices_header(self.prices)
+        header = header + GREEKS_HEADER if self.greeks else header
+        header = header + DIAGNOSTICS_HEADER if self.diagnostics is True else header
+        return header + ['NaN Reason'] if self.nan_reasons else header
+
+    # the diagnostics file and a csv writer for it (with its header written), if diagnostics are written to a separate file,
+    # otherwise (None, None) - given a length (from a checkpoint), the file is carried on from that length instead
+    @contextmanager
+    def __diagnostics_file(self, length=None):
+        if not self.diagnostics or self.diagnostics is True:
+            yield None, None
+            return
+        with open_to_write(self.diagnostics, length) as diagnostics:
+            diagnostics_writer = csv.writer(diagnostics, delimiter=',')
+            if length is None:
+                diagnostics_writer.writerow(['ID'] + DIAGNOSTICS_HEADER)
+            yield diagnostics, diagnostics_writer
+
+    # the settings the results of a run depend on, other than its input and output columns - saved with the output, so that an
+    # incremental run only reuses results solved the same way (see incremental.py)
+    def __solve_settings(self):
+        return {'lines to run': self.lines_to_run, 'engine': self.engine, 'solver': TradeData.solver,
+                'normal': self.normal_backend, 'chain': self.chain}
+
+    # everything the output of a checkpointed run depends on - a checkpoint is only resumed by a run with the same settings
+    def __checkpoint_settings(self):
+        settings = self.__solve_settings()
+        settings.update({'input file': os.path.abspath(self.input_file), 'input size': os.path.getsize(self.input_file),
+                         'chunk size': self.chunk_size, 'nan reasons': self.nan_reasons, 'diagnostics': self.diagnostics,
+                         'greeks': self.greeks, 'prices': self.prices, 'rejects': os.path.abspath(self.rejects_file)})
+        return settings
+
+
+OUTPUT_HEADER = ['ID', 'Spot', 'Strike', 'Risk-Free Rate', 'Years to Expiry',
+                 'Option Type', 'Model Type', 'Implied Volatility', 'Market Price']
+
+# the greeks of each trade at its implied volatility, following the output columns (and implied volatilities at any other prices)
+# of a row when asked for (see TradeData.greeks)
+GREEKS_HEADER = ['Delta', 'Gamma', 'Vega', 'Theta']
+
+# the diagnostics of each solve, following the output columns (other prices and greeks) of a row when recorded (see solve_diagnostics)
+DIAGNOSTICS_HEADER = ['Iterations', 'Evaluations', 'Bracket', 'Bracket Width', 'Residual', 'Termination']
+
+
+# the settings of a run that decide how each row is solved and what its solution holds, passed as one to each solve (and, with
+# worker processes, pickled with each chunk)
+class SolveOptions:
+
+    def __init__(self, engine='scalar', chain=False, diagnostics=False, greeks=False, prices=None):
+        self.engine = engine  # one of ENGINES
+        self.chain = chain  # solves the trades of each chain in order of strike (see solve_chain.py)
+        self.diagnostics = diagnostics  # follows each row of the solution with the diagnostics of its solve
+        self.greeks = greeks  # follows each row of the solution with its greeks (before any diagnostics)
+        self.prices = prices  # the '--prices' columns, or None for the 'Market Price' column alone
+
+
+# the implied volatility of each trade at the price of each but the first of the '--prices' columns, following the output columns
+def prices_header(prices):
+    return ['Implied Volatility (%s)' % name for name in prices[1:]] if prices else []
 
 
 class CSVFileData:
 
-    def __init__(self, header, body):
+    def __init__(self, header, body, nan_reasons=None, telemetry=None, rejects=None):
         self.header = header  # an array containing the header items
         self.body = body  # an array containing the rows of data (as arrays)
+        self.nan_reasons = nan_reasons  # for solutions, the reason code (see price_bounds.py) of each row
+        self.telemetry = telemetry  # for solutions, the Telemetry the build and solve were timed with (see telemetry.py)
+        self.rejects = rejects  # for solutions, the input rows that could not be read, each followed by the reason (see csv_schema.py)
 
     @classmethod
     def create_CSVFileData_from_raw_CSV_file(cls, raw_csv_file):
@@ -62,28 +319,142 @@ class CSVFileData:
             input_data.append(line)
         return cls(input_data[0], input_data[1:])
 
+    # rows rejected by the no-arbitrage pre-filter are not solved, but given nan and the reason for rejection
+    # rows that cannot be read at all are left out of the solution, and kept (with the reason) as its rejects
+    # the rows are solved as set by the options (a SolveOptions) - with diagnostics, each row of the solution is followed by the
+    # diagnostics of its solve, with greeks, by its greeks (before any diagnostics), and with prices (a list of input columns), each
+    # row is solved at the price of the first in place of the 'Market Price' column, and its solution followed by its implied
+    # volatility at the price of each of the others
+    # the build (of the store, and the pre-filter) and the solve are timed with the telemetry given, or a new one
+    # with the results of a previous run (see incremental.py), only the rows that are new or changed since are solved
     @classmethod
-    def calculate_implied_volatilities(cls, data, lines):
-        trades = []
-        for trade_data in data.__data_as_dictionary(lines):
-            trade = create_instance_of_trade_object(trade_data)
-            trades.append(trade)
-        csv_output_body = polymorphic_solve(trades)
-        csv_putput_header = ['ID', 'Spot', 'Strike', 'Risk-Free Rate', 'Years to Expiry',
-                             'Option Type', 'Model Type', 'Implied Volatility', 'Market Price']
-        return cls(csv_putput_header, csv_output_body)
-
-    # takes the array of lines from the csv file and parses them into dictionaries
-    # stops after break_point number of rows (default: will read whole file)
-    def __data_as_dictionary(self, break_point):
-        line_count, keys, data = 0, self.header, []
-        for row in self.body:
-            if line_count == break_point:
-                break
+    def calculate_implied_volatilities(cls, data, lines, options=None, cache=None, telemetry=None, previous=None):
+        options = options if options is not None else SolveOptions()
+        prices = options.prices
+        telemetry = telemetry if telemetry is not None else Telemetry()
+        with telemetry.stage('build'):
+            # the rows are read into typed columns (see csv_schema.py), and held in a compact store (see trade_store.py)
+            rows = data.body if lines < 0 else data.body[:lines]
+            columns, rejects = parse_rows(data.header, rows, prices)
+            if prices:
+                columns['Market Price'] = columns[prices[0]]
+            store = TradeColumns.from_csv_columns(columns)
+            other_prices = [columns[name] for name in prices[1:]] if prices else []
+            rejected_rows = []
+            if rejects:
+                read = np.ones(len(rows), dtype=bool)
+                read[list(rejects)] = False
+                store, other_prices = columns_subset(store, read), [V0[read] for V0 in other_prices]
+                rejected_rows = [rows[i] + [reason] for i, reason in sorted(rejects.items())]
+                rows = [row for row, is_read in zip(rows, read.tolist()) if is_read]
+            telemetry.rows_rejected += len(rejected_rows)
+            rejections = arbitrage_rejections(store)
+            reused = reused_results(previous, rows) if previous is not None else None
+        with telemetry.stage('solve'):
+            if reused is None:
+                csv_output_body = solve_store(store, rejections, options, cache, telemetry, other_prices)
             else:
-                data.append(dictionaryFormatter(row, keys))
-                line_count += 1
-        return data
+                changed = np.array([row is None for row in reused], dtype=bool)
+                solved_rows = iter(solve_store(columns_subset(store, changed), rejections[changed], options, cache, telemetry,
+                                               [V0[changed] for V0 in other_prices]))
+                # a reused row has no diagnostics of this run if they were written to a separate file
+                unsolved = solve_diagnostics(None) if options.diagnostics else []
+                width = len(OUTPUT_HEADER) + len(other_prices) + (len(GREEKS_HEADER) if options.greeks else 0)
+                csv_output_body = [next(solved_rows) if row is None else
+                                   row + unsolved if len(row) == width else row for row in reused]
+                telemetry.rows_reused += len(reused) - int(changed.sum())
+            imp_vol = np.array([row[7] for row in csv_output_body], dtype=np.float64)
+        return cls(OUTPUT_HEADER, csv_output_body, solved_reasons(rejections, imp_vol).tolist(), telemetry, rejected_rows)
+
+
+# yields the rows of a csv reader in lists of up to chunk_size rows
+# stops after break_point number of rows (default: will read whole file)
+def read_in_chunks(input_reader, chunk_size, break_point=-1):
+    chunk, line_count = [], 0
+    for row in input_reader:
+        if line_count == break_point:
+            break
+        chunk.append(row)
+        line_count += 1
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# solves the rows of a store with the engine of the options, giving the rejected rows nan
+# each of other_prices (arrays of prices, by row) is passed through the pre-filter on its own, and the accepted prices solved,
+# seeded by the solution of the row at its own price
+def solve_store(store, rejections, options, cache=None, telemetry=None, other_prices=()):
+    other_prices = [np.where(arbitrage_rejections(with_prices(store, V0)) == ACCEPTED, V0, np.nan) for V0 in other_prices]
+    if options.engine == 'batch':
+        imp_vol = implied_volatility_accepted(store, rejections)
+        columns = [imp_vol.tolist() for imp_vol in
+                   [implied_volatility_seeded(store, V0, imp_vol) for V0 in other_prices]]
+        if options.greeks:
+            columns += [greek.tolist() for greek in batch_greeks(store, imp_vol)]
+        if columns:
+            return [row + list(extra) for row, extra in zip(store.format_solution(imp_vol), zip(*columns))]
+        return store.format_solution(imp_vol)
+    return solve_accepted_trades(store, rejections, options, cache, telemetry, other_prices)
+
+
+# solves one chunk of csv rows, returning the solution as a CSVFileData
+# takes a single tuple (header, rows, options, record_solve_times) so it can be mapped over chunks, in this or a worker process
+# - without a telemetry (i.e. in a worker), the chunk is timed with its own
+def solve_chunk(chunk, cache=None, telemetry=None, previous=None):
+    header, rows, options, record_solve_times = chunk
+    telemetry = telemetry if telemetry is not None else Telemetry(record_solve_times)
+    return CSVFileData.calculate_implied_volatilities(CSVFileData(header, rows), -1, options, cache, telemetry, previous)
+
+
+# passes the items of an iterator through, adding the time taken to get each one to a stage of the telemetry
+def timed(iterator, telemetry, stage):
+    iterator = iter(iterator)
+    while True:
+        with telemetry.stage(stage):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+# worker processes need the same module level settings as the main process (they are not inherited on every platform)
+def initialise_worker(normal_backend, solver):
+    normal_dist.set_backend(normal_backend)
+    TradeData.solver = solver
+
+
+# writes the solution rows (with the reason for each nan, if with_nan_reasons), returning the count of nan results by reason
+# with a diagnostics_writer, the diagnostics following each row are written to it (by ID) rather than to the output
+def write_rows(output_writer, csv_file_data, with_nan_reasons=False, diagnostics_writer=None):
+    nan_counts = Counter()
+    for line, reason in zip(csv_file_data.body, csv_file_data.nan_reasons):
+        if diagnostics_writer is not None:
+            diagnostics_writer.writerow([line[0]] + line[-len(DIAGNOSTICS_HEADER):])
+            line = line[:-len(DIAGNOSTICS_HEADER)]
+        if isnan(line[7]):
+            nan_counts[reason] += 1
+        output_writer.writerow(line + [REASONS[reason]] if with_nan_reasons else line)
+    return nan_counts
+
+
+def print_nan_counts(nan_counts):
+    print("--- total number of nan results: %s ---" % sum(nan_counts.values()))
+    if nan_counts:
+        print("--- nan results by reason: %s ---" % ', '.join(
+            '%s: %s' % (REASONS[reason], count) for reason, count in sorted(nan_counts.items())))
+
+
+# options are given as '--name=value', or '--name' for an on/off flag
+def parse_options(system_arguments):
+    options = {}
+    for argument in system_arguments:
+        if argument.startswith('--'):
+            name, _, value = argument[2:].partition('=')
+            options[name] = value if value else True
+    return options
 
 
 # using dictionaries allows data to be found by key-value pairing instead of location
@@ -92,23 +463,103 @@ def dictionaryFormatter(row, keys):
     return {keys[i]: row[i] for i in range(len(row))}
 
 
+# data is either a dictionary of csv strings (see dictionaryFormatter) or a TradeRow view of a trade store
 def create_instance_of_trade_object(data):
-    if data['Model Type'] == 'Bachelier':
-        model = Bachelier(data)
-    elif data['Model Type'] == 'BlackScholes':
-        model = BlackScholes(data)
+    is_trade_row = isinstance(data, TradeRow)
+    model_type = data.model_type if is_trade_row else data['Model Type']
+    if model_type == 'Bachelier':
+        model_class = Bachelier
+    elif model_type == 'BlackScholes':
+        model_class = BlackScholes
     else:
         raise ValueError('invalid model type present')
-    return model
+    return model_class.from_trade_row(data) if is_trade_row else model_class(data)
+
+
+# solves the rows of a store accepted by the no-arbitrage pre-filter one trade object at a time (each built only as it is solved),
+# giving the rejected rows nan
+# in chain mode the accepted rows are solved in chain order (see solve_chain.py), then put back in input order
+# a row rejected at its own price may still be accepted at its other prices, which are then solved without a seed
+def solve_accepted_trades(store, rejections, options, cache=None, telemetry=None, other_prices=()):
+    accepted = (rejections == ACCEPTED).tolist()
+    row_prices = list(zip(*(V0.tolist() for V0 in other_prices))) if other_prices else [()] * len(store)
+    if options.chain:
+        order = chain_order(store, np.flatnonzero(rejections == ACCEPTED)).tolist()
+        trades = warm_started(create_instance_of_trade_object(store.row(i)) for i in order)
+        solved_by_index = dict(zip(order, polymorphic_solve(trades, options, cache, telemetry, [row_prices[i] for i in order])))
+        solved_rows = (solved_by_index[i] for i in sorted(solved_by_index))
+    else:
+        trades = (create_instance_of_trade_object(row) for row in store.rows() if accepted[row.index])
+        solved_rows = iter(polymorphic_solve(trades, options, cache, telemetry,
+                                             [prices for prices, is_accepted in zip(row_prices, accepted) if is_accepted]))
+    rejected_indices = np.flatnonzero(rejections != ACCEPTED).tolist()
+    rejected = columns_subset(store, rejections != ACCEPTED)
+    rejected_rows = iter(rejected.format_solution(np.full(len(rejected), np.nan)))
+    if other_prices:
+        rejected_rows = (row + [create_instance_of_trade_object(store.row(i)).implied_volatility_at(V0) for V0 in row_prices[i]]
+                         for row, i in zip(rejected_rows, rejected_indices))
+    if options.greeks:
+        rejected_rows = (row + [np.nan] * len(GREEKS_HEADER) for row in rejected_rows)
+    if options.diagnostics:
+        rejected_rows = (row + solve_diagnostics(None) for row in rejected_rows)
+    return [next(solved_rows) if is_accepted else next(rejected_rows) for is_accepted in accepted]
 
 
 # uses polymorphism to call the calc_implied_volatility() and format_solution() method of each data instance
-def polymorphic_solve(data_entries):
-    results, entry_id = [], 1
-    for data_entry in data_entries:
-        if (entry_id % 1000) == 0:
-            print('solving %sth entry' % entry_id)
-        data_entry.calc_implied_volatility()
-        results.append(data_entry.format_solution())
-        entry_id += 1
+# with a SolveCache, each distinct quote is only solved the first time it is seen
+# with other_prices (the list of other prices of each trade), each solution is followed by the implied volatility of the trade at
+# each of them, then with the greeks option, by the greeks of the trade at its implied volatility, then with the diagnostics
+# option, by the diagnostics of its solve
+# with a telemetry, each solve is counted towards the progress of the run (and timed, if it records solve times), and the pricings
+# of each bracketed solve are counted
+def polymorphic_solve(data_entries, options=None, cache=None, telemetry=None, other_prices=None):
+    options = options if options is not None else SolveOptions()
+    results = []
+    timed_solves = telemetry is not None and telemetry.record_solve_times
+    other_prices = other_prices if other_prices is not None else repeat(())
+    for data_entry, prices in zip(data_entries, other_prices):
+        if timed_solves:
+            start_time = time.perf_counter()
+        if cache is None:
+            data_entry.calc_implied_volatility()
+        else:
+            solve_with_cache(data_entry, cache)
+        if timed_solves:
+            telemetry.observe_solve(data_entry.model_type, data_entry.option_type, time.perf_counter() - start_time)
+        if telemetry is not None:
+            telemetry.rows_in_progress += 1
+            if data_entry.solve_stats is not None:
+                telemetry.observe_bracketed_solve(data_entry.solve_stats)
+        solution = data_entry.format_solution() + [data_entry.implied_volatility_at(V0) for V0 in prices]
+        if options.greeks:
+            solution += data_entry.greeks()
+        if options.diagnostics:
+            results.append(solution + solve_diagnostics(data_entry.solve_stats))
+        else:
+            results.append(solution)
     return results
+
+
+# solves a trade, unless the same quote (solved the same way) is already in the cache
+def solve_with_cache(data_entry, cache):
+    key = solve_key(data_entry, TradeData.solver, normal_dist.backend)
+    imp_vol = cache.get(key)
+    if imp_vol is None:
+        data_entry.calc_implied_volatility()
+        cache.put(key, data_entry.imp_vol)
+    else:
+        data_entry.imp_vol = imp_vol
+
+
+# the DIAGNOSTICS_HEADER columns of a solve, from its SolveStats (see bd_var_bounds.py) - left empty for a trade that was not
+# solved with a bracketed solver (i.e. rejected, solved directly or found in the solve cache)
+# the bracket is 'ladder N' if the root was bracketed by the Nth pair of VOLATILITY_BOUNDS, or 'guess' if around an initial guess
+def solve_diagnostics(solve_stats):
+    if solve_stats is None:
+        return [''] * len(DIAGNOSTICS_HEADER)
+    if solve_stats.termination in (BELOW_LOWEST_BOUND, ABOVE_HIGHEST_BOUND, UNDEFINED_VALUE):
+        bracket = ''
+    else:
+        bracket = 'guess' if solve_stats.rung is None else 'ladder %s' % solve_stats.rung
+    return [solve_stats.iterations, solve_stats.evaluations, bracket, solve_stats.bracket_width, solve_stats.residual,
+            solve_stats.termination]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# a cache of solved implied volatilities, so that a quote repeated within a file (or across runs) is only solved once
+# results are keyed on the normalised inputs of the solve - the model, underlying and option types, S, K, r, t and V0 as
+# floats (so e.g. '1.0' and '1.00' are the same quote), along with the solver and normal distribution backend they were solved with
+# the least recently used results are evicted once the cache holds 'max_size' of them
+# the cache can be saved to (and loaded from) a csv file, so that later runs reuse the solves of earlier ones
+from collections import OrderedDict
+import csv
+import os
+
+CACHE_FILE_HEADER = ['Solver', 'Normal Backend', 'Model Type', 'Underlying Type', 'Option Type',
+                     'Underlying', 'Strike', 'Risk-Free Rate', 'Years to Expiry', 'Market Price', 'Implied Volatility']
+
+
+class SolveCache:
+
+    def __init__(self, max_size=100000):
+        if max_size < 1:
+            raise ValueError("cache size must be at least 1")
+        self.max_size = max_size
+        self.results = OrderedDict()  # key -> implied volatility, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    # the implied volatility of a previously solved key (counting a hit), or None (counting a miss)
+    def get(self, key):
+        imp_vol = self.results.get(key)
+        if imp_vol is None:
+            self.misses += 1
+            return None
+        self.results.move_to_end(key)
+        self.hits += 1
+        return imp_vol
+
+    def put(self, key, imp_vol):
+        self.results[key] = imp_vol
+        self.results.move_to_end(key)
+        if len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    # loads the results of a cache file, if there is one, as least recently used (in the order they were saved)
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r') as cache_file:
+            cache_reader = csv.reader(cache_file, delimiter=',')
+            next(cache_reader)
+            for row in cache_reader:
+                self.put(tuple(row[:5]) + tuple(float(value) for value in row[5:10]), float(row[10]))
+
+    # floats are written with repr(), so they are read back exactly
+    def save(self, path):
+        with open(path, 'w') as cache_file:
+            cache_writer = csv.writer(cache_file, delimiter=',')
+            cache_writer.writerow(CACHE_FILE_HEADER)
+            for key, imp_vol in self.results.items():
+                cache_writer.writerow(list(key[:5]) + [repr(value) for value in key[5:]] + [repr(imp_vol)])
+
+
+# the key of a trade object's solve (see above)
+def solve_key(trade, solver, normal_backend):
+    return (solver, normal_backend, trade.model_type, trade.underlying_type, trade.option_type,
+            trade.S, trade.K, trade.r, trade.t, trade.V0)
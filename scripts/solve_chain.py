@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# 'chain mode': trades on the same underlying and expiry (a chain) differ only in strike, so neighbouring strikes have close
+# implied volatilities - sorting each chain by strike and starting each bracketed solve from the solution of the strike before it
+# (the trade's warm_start, see solve_for_sigma) leaves only a narrow bracket to search, in place of a closed form guess
+# a chain is every trade with the same model, underlying type, underlying value, rate and expiry (calls and puts together,
+# as by put-call parity they share a volatility)
+from math import isnan
+import numpy as np
+
+
+# the indices of a store (those given, e.g. the accepted rows) in chain order, chain by chain and by strike within each chain
+def chain_order(store, indices):
+    indices = np.asarray(indices, dtype=np.intp)
+    keys = [getattr(store, field)[indices] for field in ['K', 't', 'r', 'S', 'underlying', 'model']]
+    return indices[np.lexsort(keys)]
+
+
+def same_chain(trade, other):
+    return (trade.model_type, trade.underlying_type, trade.S, trade.r, trade.t) == \
+        (other.model_type, other.underlying_type, other.S, other.r, other.t)
+
+
+# passes the trades (in chain order) through, giving each one a warm start from the solutions of the strikes before it -
+# extrapolated linearly in strike from the two before it, or the solution of the one before it at the start of a chain
+# N.B. this relies on each trade being solved before the next is taken (as in polymorphic_solve)
+def warm_started(trades):
+    neighbours = []  # the solved trades before this one in its chain, most recent last (at most two)
+    for trade in trades:
+        if neighbours and not same_chain(neighbours[-1], trade):
+            neighbours = []
+        trade.warm_start = extrapolated_volatility(neighbours, trade.K)
+        yield trade
+        if not isnan(trade.imp_vol):
+            neighbours = neighbours[-1:] + [trade]
+
+
+def extrapolated_volatility(neighbours, strike):
+    if not neighbours:
+        return None
+    last = neighbours[-1]
+    if len(neighbours) == 1 or neighbours[0].K == last.K:
+        return last.imp_vol
+    slope = (last.imp_vol - neighbours[0].imp_vol) / (last.K - neighbours[0].K)
+    guess = last.imp_vol + slope * (strike - last.K)
+    # the extrapolation is only trusted while it stays close to the last solution
+    return guess if 0.5 * last.imp_vol < guess < 2.0 * last.imp_vol else last.imp_vol
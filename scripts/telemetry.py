@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# telemetry of a run: how long each stage took (parse, build, solve, write), how many rows have been solved (reported with the rows
+# per second and ETA at an interval, by a ProgressReporter thread, so the solve loop only counts rows), and histograms of the time
+# taken by each solve, by model and option type, and how many pricings the bracketed solves took
+# a Telemetry is filled in by the code it times (see runner_methods.py) - worker processes each fill in their own for a chunk, which
+# are merged into that of the run - and can be written out as a metrics file, in json or the prometheus textfile format
+from contextlib import contextmanager
+from collections import Counter
+from threading import Thread, Event
+import json
+import time
+
+STAGES = ['parse', 'build', 'solve', 'write']
+
+# the upper bounds (in seconds) of the buckets of the solve time histograms
+SOLVE_SECONDS_BUCKETS = [1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, float('inf')]
+
+
+class Telemetry:
+
+    def __init__(self, record_solve_times=False):
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.rows_done = 0  # rows solved, in chunks (or the whole file) that are finished
+        self.rows_in_progress = 0  # rows solved so far in the chunk being solved (by the scalar engine, in this process)
+        self.rows_reused = 0  # rows (counted in rows_done) given the result of a previous run, rather than solved (see incremental.py)
+        self.rows_rejected = 0  # input rows (not counted in rows_done) that could not be read, so were not solved (see csv_schema.py)
+        self.record_solve_times = record_solve_times  # solves are only timed if the histograms are wanted
+        self.solve_seconds = {}  # (model type, option type) -> [counts per bucket, total seconds]
+        self.nan_counts = Counter()  # reason code -> number of nan results (see price_bounds.py)
+        self.bracketed_solves = 0  # solves by a bracketed solver (i.e. with a SolveStats, see bd_var_bounds.py)
+        self.bracketed_evaluations = 0  # pricings taken by those solves
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start_time
+
+    # adds the time of a single solve to the histogram of its model and option type
+    def observe_solve(self, model_type, option_type, seconds):
+        histogram = self.solve_seconds.get((model_type, option_type))
+        if histogram is None:
+            histogram = self.solve_seconds[(model_type, option_type)] = [[0] * len(SOLVE_SECONDS_BUCKETS), 0.0]
+        for i, upper_bound in enumerate(SOLVE_SECONDS_BUCKETS):
+            if seconds <= upper_bound:
+                histogram[0][i] += 1
+                break
+        histogram[1] += seconds
+
+    # counts the pricings of a solve by a bracketed solver, from its SolveStats
+    def observe_bracketed_solve(self, solve_stats):
+        self.bracketed_solves += 1
+        self.bracketed_evaluations += solve_stats.evaluations
+
+    def rows_finished(self, rows):
+        self.rows_done += rows
+        self.rows_in_progress = 0
+
+    # adds the timings and histograms of another Telemetry (e.g. that of a chunk solved by a worker process)
+    # the stage times of chunks solved in parallel add up to more than the time the run took
+    def merge(self, other):
+        for stage, seconds in other.stage_seconds.items():
+            self.stage_seconds[stage] += seconds
+        self.rows_reused += other.rows_reused
+        self.rows_rejected += other.rows_rejected
+        self.bracketed_solves += other.bracketed_solves
+        self.bracketed_evaluations += other.bracketed_evaluations
+        for key, (counts, seconds) in other.solve_seconds.items():
+            histogram = self.solve_seconds.setdefault(key, [[0] * len(SOLVE_SECONDS_BUCKETS), 0.0])
+            histogram[0] = [count + other_count for count, other_count in zip(histogram[0], counts)]
+            histogram[1] += seconds
+
+    # the mean number of pricings per bracketed solve (None if there were none)
+    def pricings_per_bracketed_solve(self):
+        return self.bracketed_evaluations / self.bracketed_solves if self.bracketed_solves else None
+
+    def stage_summary(self):
+        return ', '.join('%s %.3fs' % (stage, self.stage_seconds[stage]) for stage in STAGES)
+
+    # the metrics of a run, as a dictionary (the json metrics file)
+    def metrics(self, run_seconds, reasons, extra=None):
+        metrics = {'run seconds': run_seconds,
+                   'rows': self.rows_done,
+                   'rows per second': self.rows_done / run_seconds if run_seconds > 0 else None,
+                   'stage seconds': dict(self.stage_seconds),
+                   'nan results': {reasons[reason]: count for reason, count in sorted(self.nan_counts.items())},
+                   'bracketed solves': self.bracketed_solves,
+                   'pricings per bracketed solve': self.pricings_per_bracketed_solve(),
+                   'solve seconds': {'%s %s' % key: {'buckets': dict(zip(map(str, SOLVE_SECONDS_BUCKETS), cumulative(counts))),
+                                                     'sum': seconds, 'count': sum(counts)}
+                                     for key, (counts, seconds) in sorted(self.solve_seconds.items())}}
+        metrics.update(extra or {})
+        return metrics
+
+    # the metrics of a run in the prometheus textfile format
+    def prometheus_metrics(self, run_seconds, reasons, extra=None):
+        lines = ['# TYPE implied_volatility_run_seconds gauge',
+                 'implied_volatility_run_seconds %r' % run_seconds,
+                 '# TYPE implied_volatility_rows gauge',
+                 'implied_volatility_rows %s' % self.rows_done,
+                 '# TYPE implied_volatility_stage_seconds gauge']
+        lines += ['implied_volatility_stage_seconds{stage="%s"} %r' % (stage, self.stage_seconds[stage]) for stage in STAGES]
+        lines.append('# TYPE implied_volatility_nan_results gauge')
+        lines += ['implied_volatility_nan_results{reason="%s"} %s' % (reasons[reason], count)
+                  for reason, count in sorted(self.nan_counts.items())]
+        lines += ['# TYPE implied_volatility_bracketed_solves gauge',
+                  'implied_volatility_bracketed_solves %s' % self.bracketed_solves,
+                  '# TYPE implied_volatility_bracketed_solve_pricings gauge',
+                  'implied_volatility_bracketed_solve_pricings %s' % self.bracketed_evaluations]
+        for name, value in sorted((extra or {}).items()):
+            lines += ['# TYPE implied_volatility_%s gauge' % name.replace(' ', '_'),
+                      'implied_volatility_%s %r' % (name.replace(' ', '_'), value)]
+        lines.append('# TYPE implied_volatility_solve_seconds histogram')
+        for (model_type, option_type), (counts, seconds) in sorted(self.solve_seconds.items()):
+            labels = 'model="%s",option="%s"' % (model_type, option_type)
+            lines += ['implied_volatility_solve_seconds_bucket{%s,le="%s"} %s' % (labels, prometheus_bound(upper_bound), count)
+                      for upper_bound, count in zip(SOLVE_SECONDS_BUCKETS, cumulative(counts))]
+            lines += ['implied_volatility_solve_seconds_sum{%s} %r' % (labels, seconds),
+                      'implied_volatility_solve_seconds_count{%s} %s' % (labels, sum(counts))]
+        return '\n'.join(lines) + '\n'
+
+    # writes the metrics file, as json if the path ends '.json', otherwise in the prometheus textfile format
+    def write_metrics(self, path, run_seconds, reasons, extra=None):
+        with open(path, 'w') as metrics_file:
+            if path.endswith('.json'):
+                json.dump(self.metrics(run_seconds, reasons, extra), metrics_file, indent=2)
+            else:
+                metrics_file.write(self.prometheus_metrics(run_seconds, reasons, extra))
+
+
+def cumulative(counts):
+    total, totals = 0, []
+    for count in counts:
+        total += count
+        totals.append(total)
+    return totals
+
+
+def prometheus_bound(upper_bound):
+    return '+Inf' if upper_bound == float('inf') else repr(upper_bound)
+
+
+# prints the progress of a run (rows solved, rows per second and, if the total is known, the ETA) every 'interval' seconds,
+# from its own thread, until stopped - the solve loop is never held up, it only updates the counts of the telemetry
+class ProgressReporter:
+
+    def __init__(self, telemetry, interval, total_rows=None):
+        self.telemetry = telemetry
+        self.interval = interval
+        self.total_rows = total_rows  # None if not known (e.g. when streaming)
+        self.start_time = time.perf_counter()
+        self.stopped = Event()
+        self.thread = Thread(target=self.__report_until_stopped, daemon=True)
+
+    def __enter__(self):
+        if self.interval > 0:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exception):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def __report_until_stopped(self):
+        while not self.stopped.wait(self.interval):
+            print(self.progress())
+
+    def progress(self):
+        rows = self.telemetry.rows_done + self.telemetry.rows_in_progress
+        rate = rows / (time.perf_counter() - self.start_time)
+        if self.total_rows is None:
+            return '--- solved %s rows (%.0f rows/s) ---' % (rows, rate)
+        eta = (self.total_rows - rows) / rate if rate > 0 else float('inf')
+        return '--- solved %s of %s rows (%.0f rows/s, ETA %.1f seconds) ---' % (rows, self.total_rows, rate, eta)
@@ -1,12 +1,40 @@
 #!/usr/bin/env python3
 from abc import ABC, abstractmethod
-from scripts.bd_var_bounds import bd_var_bounds
-from math import log, sqrt, exp
-from scipy.stats import norm
+from scripts.bd_var_bounds import bd_var_bounds_solve
+from scripts.newton_halley import newton_halley_solve
+from scripts.lets_be_rational import implied_volatility_from_a_transformed_rational_guess
+from scripts.implied_normal_volatility import implied_normal_volatility
+from scripts.volatility_guess import corrado_miller_volatility, normal_volatility_guess
+from scripts.pricing_kernels import pricing_kernel
+from math import exp, isnan
+
+# the ladder of volatilities used to bracket the root (see bd_var_bounds), shared by every model
+VOLATILITY_BOUNDS = [10e-8, 1, 2, 5, 10, 100, 1000]
+
+# 'direct' inverts the price without root bracketing (see lets_be_rational.py and implied_normal_volatility.py),
+# 'brent-dekker' always brackets and solves with bd_var_bounds, 'newton-halley' brackets as bd_var_bounds but then steps with
+# the analytic vega and volga of the trade (see newton_halley.py)
+SOLVERS = ['direct', 'brent-dekker', 'newton-halley']
+
+OPTION_SIGNS = {'Call': 1.0, 'Put': -1.0}
+
+# the narrowest relative half width of the first bracket around a warm start from another price (see implied_volatility_at)
+MIN_WARM_START_BRACKET = 1e-9
 
 
 class TradeData(ABC):
 
+    __slots__ = ('ID', 'S', 'K', 'r', 't', 'V0', 'underlying_type',
+                 'option_type', 'model_type', 'imp_vol', 'solve_stats', 'warm_start', 'warm_start_bracket', 'bounds',
+                 'kernel', 'factors')
+
+    model_name = None  # the 'Model Type' of the trade class, used to find its pricing kernels
+    solver = 'direct'  # one of SOLVERS, shared by every trade
+    # whether the bracketed solvers start from a closed form guess of sigma (see volatility_guess.py), rather than the bottom of the ladder
+    bracket_from_guess = True
+    # the relative half width of the bracket placed around a warm start (the solution of a neighbouring trade, see solve_chain.py)
+    warm_start_width = 0.005
+
     def __init__(self, data):
         self.ID = data['ID']
         self.S = float(data['Underlying'])  # spot / future underlying
@@ -18,6 +46,127 @@ class TradeData(ABC):
         self.option_type = data['Option Type']
         self.model_type = data['Model Type']
         self.imp_vol = float('nan')  # i.e. sigma => volatility
+        self.solve_stats = None  # the SolveStats (evaluations, iterations) of the last solve
+        self.warm_start = None  # if set, a close estimate of sigma that the bracketed solvers start from, in place of volatility_guess()
+        self.warm_start_bracket = None  # if set, the relative half width of the bracket around the warm start, in place of warm_start_width
+        self.bounds = VOLATILITY_BOUNDS  # the ladder the root is bracketed within, narrowed for a solve seeded by another price
+        self.kernel = None  # the pricing kernel the trade was solved with, kept for its greeks (see greeks)
+        self.factors = None  # the (sqrt(t), exp(-rt), exp(rt)) shared by the trades of a store with the same t and r (see trade_store.py)
+
+    # builds the trade from a TradeRow view of a trade store (see trade_store.py), rather than a dictionary of csv strings
+    @classmethod
+    def from_trade_row(cls, row):
+        trade, store, i = cls.__new__(cls), row.store, row.index
+        trade.ID, trade.S, trade.K, trade.r, trade.t, trade.V0 = store.ID[i], store.S.item(i), store.K.item(i), \
+            store.r.item(i), store.t.item(i), store.V0.item(i)
+        trade.underlying_type, trade.option_type, trade.model_type = row.underlying_type, row.option_type, row.model_type
+        trade.imp_vol = float('nan')
+        trade.solve_stats = None
+        trade.warm_start = None
+        trade.warm_start_bracket = None
+        trade.bounds = VOLATILITY_BOUNDS
+        trade.kernel = None
+        trade.factors = row.factors
+        return trade
+
+    # finds the root of the trade value (less V0) over the volatility ladder, keeping a record of the work done
+    # the trade is priced with the kernel specialised to its model, underlying and option type (see pricing_kernels.py)
+    # volatility_guess() gives an approximate sigma, which the root is bracketed around (nan if there is no sensible guess)
+    # a warm start is used in its place, with a narrower first bracket
+    # the kernel does not depend on V0, so a trade solved again at another price (see implied_volatility_at) keeps its kernel
+    def solve_for_sigma(self, underlying_type, volatility_guess):
+        kernel = self.kernel or pricing_kernel(self.model_name, underlying_type, self.option_type, self.S, self.K, self.r, self.t,
+                                               self.factors)
+        if kernel is None:
+            return float('nan')
+        self.kernel = kernel
+        price, price_and_greeks, _ = kernel
+        V0 = self.V0
+        if self.warm_start is not None:
+            initial_guess, guess_width = self.warm_start, self.warm_start_bracket or self.warm_start_width
+        else:
+            initial_guess, guess_width = volatility_guess() if self.bracket_from_guess else None, None
+        if self.solver == 'newton-halley':
+            def trade_value_root_and_derivatives(sigma):
+                value, vega, volga = price_and_greeks(sigma)
+                return value - V0, vega, volga
+            sigma, self.solve_stats = newton_halley_solve(
+                trade_value_root_and_derivatives, self.bounds, initial_guess, guess_width=guess_width)
+        else:
+            def trade_value_root(sigma):
+                return price(sigma) - V0
+            sigma, self.solve_stats = bd_var_bounds_solve(
+                trade_value_root, self.bounds, initial_guess=initial_guess, guess_width=guess_width)
+        return sigma
+
+    # exp(-rt) and exp(rt), shared with the other trades of the same expiry and rate if built from a store
+    def discount(self):
+        return self.factors[1] if self.factors is not None else exp(-self.r * self.t)
+
+    def growth(self):
+        return self.factors[2] if self.factors is not None else exp(self.r * self.t)
+
+    # the value of the call with the same strike, by put-call parity, for an option on 'forward' struck at 'strike'
+    # (the value, forward and strike must all be discounted to the same date)
+    def equivalent_call_value(self, value, forward, strike):
+        if self.option_type == 'Put':
+            return value + forward - strike
+        return value
+
+    # nan for a solution outside of the volatility ladder, matching what bd_var_bounds would give
+    def within_volatility_bounds(self, sigma):
+        if VOLATILITY_BOUNDS[0] <= sigma <= VOLATILITY_BOUNDS[-1]:
+            return sigma
+        return float('nan')
+
+    # the (delta, gamma, vega, theta) of the trade at its implied volatility (see pricing_kernels.py), from the kernel it was solved
+    # with (built here if it was solved directly, or found in the solve cache) - nan if the trade has no implied volatility
+    def greeks(self):
+        if isnan(self.imp_vol):
+            return [float('nan')] * 4
+        if self.kernel is None:
+            self.kernel = pricing_kernel(self.model_name, self.underlying_type, self.option_type, self.S, self.K, self.r, self.t,
+                                         self.factors)
+            if self.kernel is None:
+                return [float('nan')] * 4
+        return list(self.kernel[2](self.imp_vol))
+
+    # the implied volatility of the trade at another market price V0 (e.g. its bid or ask, when its own V0 is the mid), leaving the
+    # trade's own solution as it was - nan for a nan price
+    # once the trade is solved, the bracketed solvers reuse the kernel it was solved with, and as the price is monotone in sigma,
+    # only search the ladder between its solution and the end on the side of V0 - starting from a Halley step (with the vega and
+    # volga at the solution) towards V0, which is close for a nearby price, with an error of the order of the square of its
+    # (relative) length, used as the half width of the first bracket (see bracket_around_guess, which widens it if it misses)
+    def implied_volatility_at(self, V0):
+        if isnan(V0):
+            return float('nan')
+        solution = (self.V0, self.imp_vol, self.solve_stats, self.warm_start, self.warm_start_bracket, self.bounds)
+        if self.solver != 'direct' and not isnan(self.imp_vol):
+            if self.kernel is None:
+                self.kernel = pricing_kernel(self.model_name, self.underlying_type, self.option_type, self.S, self.K, self.r, self.t,
+                                             self.factors)
+            if self.kernel is not None:
+                value, vega, volga = self.kernel[1](self.imp_vol)
+                f = value - V0
+                if f == 0:
+                    return self.imp_vol
+                # the root lies between the solution and the end of the ladder on the side of V0
+                if f < 0:
+                    self.bounds = [self.imp_vol, VOLATILITY_BOUNDS[-1]]
+                else:
+                    self.bounds = [VOLATILITY_BOUNDS[0], self.imp_vol]
+                denominator = 2.0 * vega * vega - f * volga
+                estimate = self.imp_vol - 2.0 * f * vega / denominator if denominator > 0 else float('nan')
+                if estimate > 0:
+                    step = abs(estimate - self.imp_vol) / estimate
+                    self.warm_start = estimate
+                    self.warm_start_bracket = min(max(step * step, MIN_WARM_START_BRACKET), self.warm_start_width)
+        self.V0 = V0
+        try:
+            self.calc_implied_volatility()
+            return self.imp_vol
+        finally:
+            self.V0, self.imp_vol, self.solve_stats, self.warm_start, self.warm_start_bracket, self.bounds = solution
 
     def format_solution(self):
         return [self.ID, self.S, self.K, self.r, self.t, self.option_type, self.model_type, self.imp_vol, self.V0]
@@ -29,83 +178,52 @@ class TradeData(ABC):
 
 class BlackScholes(TradeData):
 
-    # returns d1 and d2, as defined in the black-scholes model
-    def stock_probability_factors(self, sigma):
-        d1 = (log(self.S / self.K) + (self.r + sigma ** 2 / 2.0) *
-              self.t) / (sigma * sqrt(self.t))
-        d2 = d1 - sigma * sqrt(self.t)
-        return d1, d2
+    __slots__ = ()
 
-    # finds the implied volatility of a stock option
-    def implied_volatility_stock(self):
-
-        if self.option_type == 'Call':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns SN(d1) - Kexp(-rt)N(d2)
-            def trade_value_as_func_of_sigma(sigma):
-                d1, d2 = self.stock_probability_factors(sigma)
-                return self.S * norm.cdf(d1) - self.K * exp(-self.r * self.t) * norm.cdf(d2)
+    model_name = 'BlackScholes'
 
-            def trade_value_root(
-                sigma): return trade_value_as_func_of_sigma(sigma) - self.V0
+    # corrado-miller, with the stock S and the discounted strike Kexp(-rt)
+    def stock_volatility_guess(self):
+        X = self.K * self.discount()
+        return corrado_miller_volatility(self.equivalent_call_value(self.V0, self.S, X), self.S, X, self.t)
 
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
-
-        elif self.option_type == 'Put':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns Kexp(-rt)N(-d2) - SN(-d1)
-            def trade_value_as_func_of_sigma(sigma):
-                d1, d2 = self.stock_probability_factors(sigma)
-                return -self.S * norm.cdf(-d1) + self.K * exp(-self.r * self.t) * norm.cdf(-d2)
-
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
+    # finds the implied volatility of a stock option
+    # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
+    # returns SN(d1) - Kexp(-rt)N(d2) for a call, and Kexp(-rt)N(-d2) - SN(-d1) for a put (see pricing_kernels.py)
+    def implied_volatility_stock(self):
 
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
+        # a stock option maps to black-76 through the forward F = Sexp(rt)
+        if self.solver == 'direct':
+            return self.black_76_implied_volatility(self.S * self.growth())
 
-        else:
-            return float('nan')
+        return self.solve_for_sigma('Stock', self.stock_volatility_guess)
 
     # finds the implied volatility of a futures option
     # S is here taken to represent the value of the future underlying, F
     # uses black's model (modified black-scholes), where (essentially) spot price is replaced with a discounted futures price
     # e.g. S <=> F * exp(-rt)
+    # returns exp(-rt)(SN(d1) - KN(d2)) for a call, and exp(-rt)(KN(-d2) - SN(-d1)) for a put, with r factored out of d1
 
-    # adapted to black-76 method by factoring r out of d1
-    def futures_probability_factors(self, sigma):
-        d1 = (log(self.S / self.K) + (sigma ** 2 / 2.0) *
-              self.t) / (sigma * sqrt(self.t))
-        d2 = d1 - sigma * sqrt(self.t)
-        return d1, d2
+    # corrado-miller, with the discounted future Sexp(-rt) and discounted strike Kexp(-rt)
+    def futures_volatility_guess(self):
+        S, X = self.S * self.discount(), self.K * self.discount()
+        return corrado_miller_volatility(self.equivalent_call_value(self.V0, S, X), S, X, self.t)
 
     def implied_volatility_future(self):
 
-        if self.option_type == 'Call':
-            # trade value as a function of sigma, such that f(sigma) = V0 where sigma is the implied volatility
-            # returns exp(-rt)(SN(d1) - KN(d2))
-            def trade_value_as_func_of_sigma(sigma):
-                d1, d2 = self.futures_probability_factors(sigma)
-                return exp(-self.r * self.t) * (self.S * norm.cdf(d1) - self.K * norm.cdf(d2))
-
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
-
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
-
-        elif self.option_type == 'Put':
-            # trade value as a function of sigma, such that f(sigma) = V0 where sigma is the implied volatility
-            # returns exp(-rt)(KN(-d2) - SN(-d1))
-            def trade_value_as_func_of_sigma(sigma):
-                d1, d2 = self.futures_probability_factors(sigma)
-                return exp(-self.r * self.t) * (self.K * norm.cdf(-d2) - self.S * norm.cdf(-d1))
+        if self.solver == 'direct':
+            return self.black_76_implied_volatility(self.S)
 
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
-
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
+        return self.solve_for_sigma('Future', self.futures_volatility_guess)
 
-        else:
+    # the implied volatility of an option on the forward F, from its black-76 price (undiscounted, V0exp(rt))
+    # solved directly, with a rational initial guess refined by at most two householder steps (see lets_be_rational.py)
+    def black_76_implied_volatility(self, forward):
+        if self.option_type not in OPTION_SIGNS:
             return float('nan')
+        sigma = implied_volatility_from_a_transformed_rational_guess(
+            self.V0 * self.growth(), forward, self.K, self.t, OPTION_SIGNS[self.option_type])
+        return self.within_volatility_bounds(sigma)
 
     def calc_implied_volatility(self):
         if self.underlying_type == 'Stock':
@@ -120,84 +238,55 @@ class BlackScholes(TradeData):
 # the book 'Martingale Methods in Financial Modelling', Musiela et al., 2008 (ii)
 class Bachelier(TradeData):
 
-    # returns d as from (ii) - eqn. 31a
-    # d = d_i / d_ii = (S - Kexp(-rt) / (Kexp(-rt)*sigma*sqrt(t))
-    def stock_probability_factor(self, sigma):
-        d_i = self.S - self.K * exp(-self.r * self.t)
-        d_ii = self.K * exp(-self.r * self.t) * sigma * sqrt(self.t)
-        return d_i / d_ii
-
-    def implied_volatility_stock(self):
-
-        if self.option_type == 'Call':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns (S - Kexp(-rt))N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d)
-            # where n() represents the probability density of the normal distribution function
-            def trade_value_as_func_of_sigma(sigma):
-                d = self.stock_probability_factor(sigma)
-                K_mod = self.K * exp(-self.r * self.t)  # K_mod = Kexp(-rt)
-                return (self.S - K_mod) * norm.cdf(d) + K_mod * sigma * sqrt(self.t) * norm.pdf(d)
-
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
+    __slots__ = ()
 
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
+    model_name = 'Bachelier'
+    polish = True  # whether the direct solve takes its polishing step (without it, sigma is good to ~3e-4 relative)
 
-        elif self.option_type == 'Put':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns (S - Kexp(-rt))N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d) + Kexp(-rt) - S
-            def trade_value_as_func_of_sigma(sigma):
-                d = self.stock_probability_factor(sigma)
-                K_mod = self.K * exp(-self.r * self.t)  # K_mod = Kexp(-rt)
-                return (self.S - K_mod) * norm.cdf(d) + K_mod * sigma * sqrt(self.t) * norm.pdf(d) + K_mod - self.S
+    # the normal model guess for an option on S struck at K_mod = Kexp(-rt), with normal volatility K_mod*sigma
+    def stock_volatility_guess(self):
+        K_mod = self.K * self.discount()
+        return normal_volatility_guess(self.equivalent_call_value(self.V0, self.S, K_mod), self.S, K_mod, self.t) / K_mod
 
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
+    # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
+    # returns (S - Kexp(-rt))N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d) for a call, and the call + Kexp(-rt) - S for a put
+    # where n() represents the probability density of the normal distribution function, and d as from (ii) - eqn. 31a
+    # d = (S - Kexp(-rt) / (Kexp(-rt)*sigma*sqrt(t)) (see pricing_kernels.py)
+    def implied_volatility_stock(self):
 
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
+        # a normal model option on S struck at K_mod = Kexp(-rt), with normal volatility K_mod*sigma
+        if self.solver == 'direct':
+            return self.normal_implied_volatility(self.V0, self.K * self.discount())
 
-        else:
-            return float('nan')
+        return self.solve_for_sigma('Stock', self.stock_volatility_guess)
 
     # similarly to when using the black-scholes model, to modify the bachelier to accomodate future underlying types,
     # the spot price is replaced with a discounted futures price
     # i.e. S => S * exp(-rt)
+    # returns (S - K)exp(-rt)N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d) for a call, and the call + Kexp(-rt) - Sexp(-rt) for a put
+    # d = (S - K) / (K*sigma*sqrt(t))
 
-    # d = d_i / d_ii = (S - K) / (K*sigma*sqrt(t))
-    def futures_probability_factor(self, sigma):
-        d_i = self.S - self.K
-        d_ii = self.K * sigma * sqrt(self.t)
-        return d_i / d_ii
+    # the normal model guess for an option on S struck at K, with normal volatility K*sigma, from the undiscounted value V0exp(rt)
+    def futures_volatility_guess(self):
+        undiscounted_value = self.V0 * self.growth()
+        return normal_volatility_guess(self.equivalent_call_value(undiscounted_value, self.S, self.K), self.S, self.K, self.t) / self.K
 
     def implied_volatility_future(self):
 
-        if self.option_type == 'Call':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns (S - K)exp(-rt))N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d)
-            def trade_value_as_func_of_sigma(sigma):
-                d = self.stock_probability_factor(sigma)
-                return (self.S - self.K) * exp(-self.r * self.t) * norm.cdf(d) + self.K * exp(-self.r * self.t) * sigma * sqrt(self.t) * norm.pdf(d)
-
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
+        # a normal model option on S struck at K, with normal volatility K*sigma, discounted by exp(-rt)
+        if self.solver == 'direct':
+            return self.normal_implied_volatility(self.V0 * self.growth(), self.K)
 
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
+        return self.solve_for_sigma('Future', self.futures_volatility_guess)
 
-        elif self.option_type == 'Put':
-            # trade value as a function of sigma, s.t. f(sigma) = V0, where sigma is the implied volatility
-            # returns (S - K)exp(-rt)N(d) + Kexp(-rt)*sigma*sqrt(t)*n(d) + Kexp(-rt) - Sexp(-rt)
-            def trade_value_as_func_of_sigma(sigma):
-                d = self.stock_probability_factor(sigma)
-                exp_rt = exp(-self.r * self.t)
-                return (self.S - self.K) * exp_rt * norm.cdf(d) + self.K * exp_rt * sigma * sqrt(self.t) * norm.pdf(d) + self.K * exp_rt - self.S * exp_rt
-
-            def trade_value_root(sigma):
-                return trade_value_as_func_of_sigma(sigma) - self.V0
-
-            return bd_var_bounds(trade_value_root, [10e-8, 1, 2, 5, 10, 100, 1000])
-
-        else:
+    # the implied volatility from the undiscounted price of a normal model option on S struck at 'strike', where the
+    # normal volatility is strike*sigma - solved analytically, with a single polishing step (see implied_normal_volatility.py)
+    def normal_implied_volatility(self, undiscounted_price, strike):
+        if self.option_type not in OPTION_SIGNS:
             return float('nan')
+        normal_volatility = implied_normal_volatility(
+            undiscounted_price, self.S, strike, self.t, OPTION_SIGNS[self.option_type], self.polish)
+        return self.within_volatility_bounds(normal_volatility / strike)
 
     def calc_implied_volatility(self):
         if self.underlying_type == 'Stock':
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# a compact, columnar store for the rows of the input file, instead of one dictionary and one trade object per row
+# the numeric fields are held as typed (numpy float64) arrays and the categorical fields as small (int8) integer codes,
+# a row costs ~50 bytes plus its ID, against well over a kilobyte as a dictionary of strings and a trade object
+# both engines work from the store: the batch engine vectorises over the arrays (see batch_engine.py), while the
+# scalar engine builds one trade object at a time from a TradeRow view (see create_instance_of_trade_object)
+# the factors that depend only on the expiry and rate of a row (sqrt(t), exp(-rt) and exp(rt)) are computed once for each distinct
+# (t, r) pair of the store, which rows refer to by index (see ExpiryFactors), rather than once per row or per pricing
+import numpy as np
+from math import sqrt, exp
+from itertools import repeat
+
+# the categorical csv columns are held as small integer codes, anything unrecognised is given INVALID_CODE
+MODEL_CODES = {'BlackScholes': 0, 'Bachelier': 1}
+UNDERLYING_CODES = {'Stock': 0, 'Future': 1}
+OPTION_CODES = {'Call': 0, 'Put': 1}
+INVALID_CODE = -1
+
+BLACK_SCHOLES, BACHELIER = MODEL_CODES['BlackScholes'], MODEL_CODES['Bachelier']
+STOCK, FUTURE = UNDERLYING_CODES['Stock'], UNDERLYING_CODES['Future']
+CALL, PUT = OPTION_CODES['Call'], OPTION_CODES['Put']
+
+# the csv column and the codes of each categorical field of the store
+CATEGORICAL_FIELDS = {'underlying': ('Underlying Type', UNDERLYING_CODES),
+                      'option': ('Option Type', OPTION_CODES),
+                      'model': ('Model Type', MODEL_CODES)}
+
+
+def encode_column(values, codes):
+    return np.fromiter(map(codes.get, values, repeat(INVALID_CODE)), dtype=np.int8, count=len(values))
+
+
+# the (rare) values without a code, by row, so that they can still be written back out as they were read
+def unrecognised_values(values, codes):
+    if not set(values) - codes.keys():
+        return {}
+    return {i: value for i, value in enumerate(values) if value not in codes}
+
+
+# values already read into a float64 array (see csv_schema.py) are used as they are
+def float_column(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+# the rows of the book as column arrays, with the categorical columns encoded
+class TradeColumns:
+
+    def __init__(self, ID, S, K, r, t, V0, underlying, option, model, unrecognised=None, expiry=None):
+        self.ID = ID  # list of ids, kept as strings
+        self.S = S  # spot / future underlying
+        self.K = K  # strike
+        self.r = r  # risk-free rate
+        self.t = t  # years to expiry
+        self.V0 = V0  # market value
+        self.underlying = underlying  # UNDERLYING_CODES
+        self.option = option  # OPTION_CODES
+        self.model = model  # MODEL_CODES
+        # categorical field -> {row: original value} for the rows coded INVALID_CODE
+        self.unrecognised = unrecognised if unrecognised is not None else {
+            field: {} for field in CATEGORICAL_FIELDS}
+        # (ExpiryFactors, the index of each row's (t, r) pair in it), built when first needed (see expiry_factors)
+        self.expiry = expiry
+
+    # builds the columns from a dictionary of csv header -> list of raw string values
+    @classmethod
+    def from_csv_columns(cls, columns):
+        unrecognised = {field: unrecognised_values(columns[key], codes)
+                        for field, (key, codes) in CATEGORICAL_FIELDS.items()}
+        return cls(list(columns['ID']),
+                   float_column(columns['Underlying']),
+                   float_column(columns['Strike']),
+                   float_column(columns['Risk-Free Rate']),
+                   float_column(columns['Days To Expiry']) / 365.0,
+                   float_column(columns['Market Price']),
+                   encode_column(columns['Underlying Type'], UNDERLYING_CODES),
+                   encode_column(columns['Option Type'], OPTION_CODES),
+                   encode_column(columns['Model Type'], MODEL_CODES),
+                   unrecognised)
+
+    # builds the columns from in-memory arrays (see api.py) - numeric arrays already held as float64 are used without a copy,
+    # and each categorical field is either one name for every row or an array of names
+    # the rows are numbered for their IDs, and t is in years
+    @classmethod
+    def from_arrays(cls, S, K, r, t, V0, underlying_type, option_type, model_type):
+        S, K, r, t, V0 = np.broadcast_arrays(*(np.asarray(values, dtype=np.float64) for values in [S, K, r, t, V0]))
+        if S.ndim != 1:
+            raise ValueError("trades must be given as one dimensional arrays")
+        categorical = []
+        for values, codes in [(underlying_type, UNDERLYING_CODES), (option_type, OPTION_CODES), (model_type, MODEL_CODES)]:
+            if isinstance(values, str):
+                categorical.append(np.full(len(S), codes.get(values, INVALID_CODE), dtype=np.int8))
+            elif len(values) != len(S):
+                raise ValueError("trades must be given as arrays of the same length")
+            else:
+                categorical.append(encode_column(values, codes))
+        return cls(range(len(S)), S, K, r, t, V0, *categorical)
+
+    def __len__(self):
+        return len(self.ID)
+
+    # the ExpiryFactors of the distinct (t, r) pairs of the store, and the index of each row's pair
+    def expiry_factors(self):
+        if self.expiry is None:
+            self.expiry = expiry_groups(self.t, self.r)
+        return self.expiry
+
+    # the arrays of sqrt(t), exp(-rt) and exp(rt) of every row, gathered from the factors of its (t, r) pair
+    def row_factors(self):
+        factors, group = self.expiry_factors()
+        return factors.sqrt_t[group], factors.discount[group], factors.growth[group]
+
+    # a view of a single row, for code that works one trade at a time
+    def row(self, index):
+        return TradeRow(self, index)
+
+    def rows(self):
+        for index in range(len(self)):
+            yield TradeRow(self, index)
+
+    # the name of a categorical field of a row, as it was read from the csv file
+    def name_of(self, field, index):
+        code = getattr(self, field).item(index)
+        if code == INVALID_CODE:
+            return self.unrecognised[field].get(index, '')
+        return CODE_NAMES[field][code]
+
+    # mirrors TradeData.format_solution for every row
+    def format_solution(self, imp_vol):
+        underlying_names, option_names, model_names = (
+            decode_names(getattr(self, field), codes, self.unrecognised[field])
+            for field, (_, codes) in CATEGORICAL_FIELDS.items())
+        return [list(row) for row in zip(self.ID, self.S.tolist(), self.K.tolist(), self.r.tolist(), self.t.tolist(),
+                                         option_names, model_names, imp_vol.tolist(), self.V0.tolist())]
+
+
+CODE_NAMES = {field: {code: name for name, code in codes.items()}
+              for field, (_, codes) in CATEGORICAL_FIELDS.items()}
+
+
+# unrecognised values (INVALID_CODE) are written back as they were read, or as an empty string if that is not known
+def decode_names(codes, names_to_codes, unrecognised=None):
+    unrecognised = unrecognised or {}
+    codes_to_names = {code: name for name, code in names_to_codes.items()}
+    return [unrecognised.get(i, '') if code == INVALID_CODE else codes_to_names[code]
+            for i, code in enumerate(codes.tolist())]
+
+
+def columns_subset(columns, mask):
+    kept = np.flatnonzero(mask)
+    new_index = {old: new for new, old in enumerate(kept.tolist())}
+    unrecognised = {field: {new_index[i]: value for i, value in values.items() if i in new_index}
+                    for field, values in columns.unrecognised.items()}
+    factors, group = columns.expiry_factors()
+    return TradeColumns([columns.ID[i] for i in kept.tolist()],
+                        columns.S[mask], columns.K[mask], columns.r[mask], columns.t[mask], columns.V0[mask],
+                        columns.underlying[mask], columns.option[mask], columns.model[mask], unrecognised, (factors, group[mask]))
+
+
+# the same rows at other market prices (e.g. the bids, when V0 holds the mids), sharing every other column with the store
+def with_prices(columns, V0):
+    return TradeColumns(columns.ID, columns.S, columns.K, columns.r, columns.t, V0, columns.underlying, columns.option,
+                        columns.model, columns.unrecognised, columns.expiry_factors())
+
+
+# sqrt(t), exp(-rt) and exp(rt) of each distinct (t, r) pair - computed with the math module, one pair at a time, so that they
+# are the same to the last bit as the trade classes and pricing kernels compute for a single trade
+class ExpiryFactors:
+
+    def __init__(self, t, r):
+        t, r = t.tolist(), r.tolist()
+        self.sqrt_t = np.array([sqrt(t_i) if t_i >= 0 else float('nan') for t_i in t])
+        self.discount = np.array([exp_or_inf(-r_i * t_i) for t_i, r_i in zip(t, r)])
+        self.growth = np.array([exp_or_inf(r_i * t_i) for t_i, r_i in zip(t, r)])
+        # the same factors as a tuple per pair, for building one trade object at a time (see TradeRow.factors)
+        self.tuples = list(zip(self.sqrt_t.tolist(), self.discount.tolist(), self.growth.tolist()))
+
+    def __len__(self):
+        return len(self.sqrt_t)
+
+
+# the factors are computed for every row, including those the pre-filter will reject (see price_bounds.py), which may overflow
+def exp_or_inf(x):
+    try:
+        return exp(x)
+    except OverflowError:
+        return float('inf')
+
+
+# the ExpiryFactors of the distinct (t, r) pairs of the given columns, and the index of each row's pair in them
+def expiry_groups(t, r):
+    pairs = np.empty(len(t), dtype=np.complex128)
+    pairs.real, pairs.imag = t, r
+    distinct, group = np.unique(pairs, return_inverse=True)
+    return ExpiryFactors(distinct.real, distinct.imag), group.reshape(-1)
+
+
+# a single row of a TradeColumns store, read on demand - holds nothing but a reference to the store and the row number
+class TradeRow:
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def ID(self):
+        return self.store.ID[self.index]
+
+    @property
+    def S(self):
+        return self.store.S.item(self.index)
+
+    @property
+    def K(self):
+        return self.store.K.item(self.index)
+
+    @property
+    def r(self):
+        return self.store.r.item(self.index)
+
+    @property
+    def t(self):
+        return self.store.t.item(self.index)
+
+    @property
+    def V0(self):
+        return self.store.V0.item(self.index)
+
+    @property
+    def underlying_type(self):
+        return self.store.name_of('underlying', self.index)
+
+    @property
+    def option_type(self):
+        return self.store.name_of('option', self.index)
+
+    @property
+    def model_type(self):
+        return self.store.name_of('model', self.index)
+
+    # the (sqrt(t), exp(-rt), exp(rt)) of the row's (t, r) pair
+    @property
+    def factors(self):
+        factors, group = self.store.expiry_factors()
+        return factors.tuples[group.item(self.index)]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# closed form approximations of the implied volatility, used as initial guesses by the bracketed solvers
+# (see bracket_around_guess in bd_var_bounds.py), in place of walking up the whole bounds ladder
+# each returns nan when the approximation breaks down (e.g. for a price below intrinsic value), in which case the ladder is used
+from math import sqrt, pi
+
+SQRT_TWO_PI = sqrt(2.0 * pi)
+
+
+# black-scholes, from 'A Simple Improved Formula for Implied Volatility', Corrado & Miller, 1996
+# for a call worth C on S (the discounted forward), struck at X (the discounted strike)
+#   sigma*sqrt(t) ~ sqrt(2pi)/(S + X) * (C - (S - X)/2 + sqrt((C - (S - X)/2)^2 - (S - X)^2/pi))
+# at the money this is the approximation of brenner & subrahmanyam (1988), sigma*sqrt(t) ~ sqrt(2pi)C/S
+def corrado_miller_volatility(C, S, X, t):
+    half_moneyness = (S - X) / 2.0
+    time_value = C - half_moneyness
+    # the square root can go negative far from the money, where its argument is floored at 0
+    discriminant = max(time_value * time_value - half_moneyness * half_moneyness * 4.0 / pi, 0.0)
+    sigma = SQRT_TWO_PI / (S + X) * (time_value + sqrt(discriminant)) / sqrt(t)
+    return sigma if sigma > 0 else float('nan')
+
+
+# bachelier, the equivalent for the normal model: for an (undiscounted) call worth C on F struck at K, with m = F - K and s = sigma_n*sqrt(t),
+# expanding N(d) and n(d) to second order about d = m/s = 0 gives C ~ m/2 + (s + m^2/2s)/sqrt(2pi), so that
+#   s ~ (A + sqrt(A^2 - 2m^2))/2, where A = sqrt(2pi)(C - m/2)
+# at the money this is exact, s = sqrt(2pi)C
+def normal_volatility_guess(C, F, K, t):
+    moneyness = F - K
+    A = SQRT_TWO_PI * (C - moneyness / 2.0)
+    discriminant = max(A * A - 2.0 * moneyness * moneyness, 0.0)
+    sigma_n = (A + sqrt(discriminant)) / 2.0 / sqrt(t)
+    return sigma_n if sigma_n > 0 else float('nan')
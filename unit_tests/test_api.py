@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+from scripts import api
+from scripts.trade_store import TradeColumns
+from scripts.price_bounds import ACCEPTED, ABOVE_UPPER_BOUND, UNSUPPORTED_TYPE, arbitrage_rejections
+from scripts.batch_engine import implied_volatility_accepted
+
+# the same trades as the runner tests, as the columns of the input file
+FRAME = {'ID': ['0', '1', '2', '3', '4'],
+         'Underlying Type': ['Stock', 'Future', 'Stock', 'Future', 'Stock'],
+         'Underlying': [0.5434, 0.1855, 1.1975, 1.8360, 1.0],
+         'Risk-Free Rate': [-0.0045, -0.0, -0.0023, -0.0031, 0.01],
+         'Days To Expiry': [305.17, 279.5115, 190.1082, 242.7474, 100.0],
+         'Strike': [0.7103, 0.2021, 1.4481, 2.2491, 1.0],
+         'Option Type': ['Call', 'Put', 'Call', 'Put', 'Call'],
+         'Model Type': ['BlackScholes', 'BlackScholes', 'Bachelier', 'Bachelier', 'BlackScholes'],
+         'Market Price': [0.09794149, 0.050103566, 0.3641165, 0.74574876, 5.0]}
+
+
+class TestApi(unittest.TestCase):
+
+    def test_matches_csv_solution(self):
+        store = TradeColumns.from_csv_columns({key: list(map(str, values)) for key, values in FRAME.items()})
+        expected = implied_volatility_accepted(store, arbitrage_rejections(store))
+        for engine in ['scalar', 'batch']:
+            for solver in [None, 'brent-dekker', 'newton-halley']:
+                imp_vol, reasons = api.implied_volatility_frame(FRAME, engine, solver, reasons=True)
+                np.testing.assert_allclose(imp_vol, expected, rtol=1e-9, atol=1e-12)
+                self.assertEqual(reasons.tolist(), [ACCEPTED] * 4 + [ABOVE_UPPER_BOUND])
+
+    def test_single_values_are_given_to_every_trade(self):
+        imp_vol = api.implied_volatility(1.0, np.array([0.9, 1.0, 1.1]), 0.01, 0.5, np.array([0.15, 0.08, 0.04]))
+        expected = [api.implied_volatility([1.0], [K], [0.01], [0.5], [V0])[0] for K, V0 in [(0.9, 0.15), (1.0, 0.08), (1.1, 0.04)]]
+        self.assertEqual(imp_vol.tolist(), expected)
+        self.assertTrue(np.isnan(api.implied_volatility([1.0], [1.0], [0.01], [0.5], [0.08], model_type='Heston')[0]))
+        _, reasons = api.implied_volatility([1.0], [1.0], [0.01], [0.5], [0.08], option_type='Straddle', reasons=True)
+        self.assertEqual(reasons.tolist(), [UNSUPPORTED_TYPE])
+
+    def test_float64_columns_are_not_copied(self):
+        S = np.array([1.0, 1.2])
+        store = TradeColumns.from_arrays(S, S, 0.0, 1.0, S, 'Stock', 'Call', 'BlackScholes')
+        self.assertTrue(np.shares_memory(store.S, S))
+        with self.assertRaises(ValueError):
+            TradeColumns.from_arrays(S, S, 0.0, 1.0, S, ['Stock'], 'Call', 'BlackScholes')
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            api.implied_volatility([1.0], [1.0], [0.0], [1.0], [0.1], engine='gpu')
+        with self.assertRaises(ValueError):
+            api.implied_volatility([1.0], [1.0], [0.0], [1.0], [0.1], solver='bisection')
+
+
+if __name__ == '__main__':
+    unittest.main()
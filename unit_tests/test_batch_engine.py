@@ -0,0 +1,104 @@
+import unittest
+from scripts import batch_engine as be
+from scripts import trade_classes as tc
+from scripts.trade_store import encode_column, OPTION_CODES, INVALID_CODE, CALL, PUT
+from scripts.price_bounds import arbitrage_rejections
+from math import isclose, isnan
+
+
+def trade_data(underlying_type, underlying, rate, days, strike, option_type, model_type, price):
+    return {'ID': '0', 'Underlying Type': underlying_type, 'Underlying': underlying, 'Risk-Free Rate': rate, 'Days To Expiry': days,
+            'Strike': strike, 'Option Type': option_type, 'Model Type': model_type, 'Market Price': price}
+
+
+def as_csv_columns(trades):
+    return {key: [trade[key] for trade in trades] for key in trades[0]}
+
+
+# solves a whole book given as csv columns, returning rows in the same format as format_solution
+def solve_csv_columns(csv_columns):
+    columns = be.TradeColumns.from_csv_columns(csv_columns)
+    return columns.format_solution(be.implied_volatility_accepted(columns, arbitrage_rejections(columns)))
+
+
+class TestBatchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = [
+            trade_data('Stock', '0.5434', '-0.0045', '305.1700',
+                       '0.7103', 'Call', 'BlackScholes', '0.09794149'),
+            trade_data('Stock', '0.8714', '-0.0049', '211.8715',
+                       '0.9426', 'Put', 'BlackScholes', '0.14370158'),
+            trade_data('Future', '1.3315', '-0.0007', '377.3859',
+                       '1.4348', 'Call', 'BlackScholes', '0.21010422'),
+            trade_data('Future', '0.1855', '-0.0000', '279.5115',
+                       '0.2021', 'Put', 'BlackScholes', '0.050103566'),
+            trade_data('Stock', '1.1975', '-0.0023', '190.1082',
+                       '1.4481', 'Call', 'Bachelier', '0.3641165'),
+            trade_data('Stock', '1.5853', '-0.0003', '336.6476',
+                       '1.8868', 'Put', 'Bachelier', '0.6068661'),
+            trade_data('Future', '1.4597', '-0.0002', '65.8745',
+                       '1.4992', 'Call', 'Bachelier', '0.049442439'),
+            trade_data('Future', '1.8360', '-0.0031', '242.7474',
+                       '2.2491', 'Put', 'Bachelier', '0.74574876'),
+        ]
+
+    def scalar_solution(self, data):
+        trade = tc.BlackScholes(
+            data) if data['Model Type'] == 'BlackScholes' else tc.Bachelier(data)
+        trade.calc_implied_volatility()
+        return trade.format_solution()
+
+    def test_encode_column(self):
+        self.assertEqual(encode_column(
+            ['Call', 'Put', 'Straddle'], OPTION_CODES).tolist(), [CALL, PUT, INVALID_CODE])
+
+    def test_matches_scalar_solution(self):
+        batch_rows = solve_csv_columns(as_csv_columns(self.trades))
+        for data, batch_row in zip(self.trades, batch_rows):
+            scalar_row = self.scalar_solution(data)
+            self.assertEqual(batch_row[:7], scalar_row[:7])
+            self.assertEqual(batch_row[8], scalar_row[8])
+            self.assertTrue(isclose(batch_row[7], scalar_row[7], rel_tol=1e-7))
+
+    def test_methods_agree(self):
+        columns = be.TradeColumns.from_csv_columns(as_csv_columns(self.trades))
+        chandrupatla = be.implied_volatility_batch(columns, method='chandrupatla')
+        bisection = be.implied_volatility_batch(columns, method='bisection')
+        for chandrupatla_vol, bisection_vol in zip(chandrupatla.tolist(), bisection.tolist()):
+            self.assertTrue(isclose(chandrupatla_vol, bisection_vol, abs_tol=1e-11))
+        with self.assertRaises(ValueError):
+            be.implied_volatility_batch(columns, method='secant')
+
+    def test_seeded_solves_match_unseeded(self):
+        columns = be.TradeColumns.from_csv_columns(as_csv_columns(self.trades))
+        seed = be.implied_volatility_batch(columns)
+        seed[0] = float('nan')  # solved without a seed
+        for scale in [0.9, 0.999, 1.0, 1.01, 1.5]:
+            V0 = columns.V0 * scale
+            expected = be.implied_volatility_batch(be.with_prices(columns, V0))
+            seeded = be.implied_volatility_seeded(columns, V0, seed)
+            for seeded_vol, expected_vol in zip(seeded.tolist(), expected.tolist()):
+                self.assertTrue(isclose(seeded_vol, expected_vol, abs_tol=1e-11) or isnan(seeded_vol) and isnan(expected_vol))
+        self.assertTrue(all(isnan(vol) for vol in be.implied_volatility_seeded(columns, columns.V0 * float('nan'), seed).tolist()))
+
+    def test_unsolvable_rows_are_nan(self):
+        trades = [
+            # would require sigma < 0
+            trade_data('Stock', '0.5434', '-0.0045', '305.1700',
+                       '0.7103', 'Call', 'BlackScholes', '-0.01'),
+            # would require sigma > 1000
+            trade_data('Stock', '0.8714', '-0.0049', '211.8715',
+                       '0.9426', 'Put', 'BlackScholes', '0.95'),
+            # unrecognised option type
+            trade_data('Stock', '1.1975', '-0.0023', '190.1082',
+                       '1.4481', 'Straddle', 'Bachelier', '0.3641165'),
+        ]
+        for row in solve_csv_columns(as_csv_columns(trades)):
+            self.assertTrue(isnan(row[7]))
+
+    def test_invalid_model_type(self):
+        # rejected by the pre-filter, so never priced
+        trades = [trade_data('Stock', '0.5434', '-0.0045', '305.1700',
+                             '0.7103', 'Call', 'Heston', '0.09794149')]
+        self.assertTrue(isnan(solve_csv_columns(as_csv_columns(trades))[0][7]))
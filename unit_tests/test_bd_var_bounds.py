@@ -11,6 +11,11 @@ class TestBrentDekkerVariableBoundsRootFinder(unittest.TestCase):
         with self.assertRaises(ZeroDivisionError):
             bdvb.inverse_quadratic_interpolation(1, 2, 3, -2, -2, 0)
 
+    def test_tiny_function_values(self):
+        # the denominators of inverse quadratic interpolation underflow to zero, so bisection is used in its place
+        root = bdvb.bd_var_bounds(lambda x: 1e-200 * (x ** 3 - 8), [0, 1, 5])
+        self.assertTrue(isclose(root, 2, rel_tol=1e-8))
+
     def test_secant_method(self):
         self.assertEqual(bdvb.secant_method(1, 2, 3, 4), -2)
         with self.assertRaises(ZeroDivisionError):
@@ -38,3 +43,93 @@ class TestBrentDekkerVariableBoundsRootFinder(unittest.TestCase):
             isclose(bdvb.bd_var_bounds(func2, [-1, -1.5]), -1.271026800))  # lower root
         self.assertTrue(isnan(bdvb.bd_var_bounds(  # no root between given bounds
             func1, [-2, 0])))
+
+    def test_each_point_evaluated_once(self):
+        evaluated = []
+
+        def func1(x):
+            evaluated.append(x)
+            return x**2 - 20
+        root, stats = bdvb.bd_var_bounds_solve(func1, [1, 2, 3, 4, 5])
+        self.assertTrue(isclose(root, sqrt(20)))
+        self.assertEqual(len(evaluated), len(set(evaluated)))
+        self.assertEqual(stats.evaluations, len(evaluated))
+        # 5 ladder points, then one evaluation per iteration
+        self.assertEqual(stats.evaluations, 5 + stats.iterations)
+
+    def test_solve_stats_when_unbracketed(self):
+        def func1(x): return x**2 - 20
+        root, stats = bdvb.bd_var_bounds_solve(func1, [5, 6])  # lowest bound lies above the root
+        self.assertTrue(isnan(root))
+        self.assertEqual((stats.evaluations, stats.iterations), (1, 0))
+        root, stats = bdvb.bd_var_bounds_solve(func1, [1, 2, 3])  # no bounds lie above the root
+        self.assertTrue(isnan(root))
+        self.assertEqual((stats.evaluations, stats.iterations), (3, 0))
+
+    def test_solve_stats_termination(self):
+        def func1(x): return x**2 - 20
+        root, stats = bdvb.bd_var_bounds_solve(func1, [1, 2, 5, 10])
+        self.assertEqual((stats.rung, stats.termination), (1, bdvb.CONVERGED))
+        self.assertTrue(stats.bracket_width <= 1e-8)
+        self.assertEqual(stats.residual, func1(root))
+        root, stats = bdvb.bd_var_bounds_solve(func1, [1, 2, 5, 10], initial_guess=4.0)
+        self.assertEqual((stats.rung, stats.termination), (None, bdvb.CONVERGED))
+        _, stats = bdvb.bd_var_bounds_solve(func1, [1, 2, 5, 10], max_iter=2)
+        self.assertEqual((stats.iterations, stats.termination), (2, bdvb.MAX_ITERATIONS))
+        _, stats = bdvb.bd_var_bounds_solve(lambda x: x - 4, [1, 4, 5])
+        self.assertEqual(stats.termination, bdvb.EXACT_ROOT)
+        for bounds, initial_guess, termination in [([5, 6], None, bdvb.BELOW_LOWEST_BOUND), ([5, 6], 5.5, bdvb.BELOW_LOWEST_BOUND),
+                                                   ([1, 2, 3], None, bdvb.ABOVE_HIGHEST_BOUND), ([1, 2, 3], 2.5, bdvb.ABOVE_HIGHEST_BOUND)]:
+            _, stats = bdvb.bd_var_bounds_solve(func1, bounds, initial_guess=initial_guess)
+            self.assertEqual(stats.termination, termination)
+            self.assertTrue(isnan(stats.bracket_width))
+        _, stats = bdvb.bd_var_bounds_solve(lambda x: float('nan'), [1, 2, 3])
+        self.assertEqual(stats.termination, bdvb.UNDEFINED_VALUE)
+
+    def test_step_onto_exact_root(self):
+        # x = 1 + y + y**2 is quadratic in y = f(x), so inverse quadratic interpolation lands exactly on the root (x = 1)
+        def func3(x): return (sqrt(4*x - 3) - 1) / 2
+        interpolate, steps = bdvb.inverse_quadratic_interpolation, []
+
+        def inverse_quadratic_interpolation(*args):
+            steps.append(interpolate(*args))
+            return steps[-1]
+        evaluated = []
+
+        def counted_func3(x):
+            evaluated.append(x)
+            return func3(x)
+        bdvb.inverse_quadratic_interpolation = inverse_quadratic_interpolation
+        try:
+            root, stats = bdvb.bd_var_bounds_solve(counted_func3, [0.75, 1.5])
+        finally:
+            bdvb.inverse_quadratic_interpolation = interpolate
+        self.assertEqual(evaluated[-1], 1.0)
+        self.assertIn(1.0, steps)
+        # the root is kept, and the solve stops there, rather than converging on a point beside it
+        self.assertEqual((root, stats.termination, stats.residual), (1.0, bdvb.EXACT_ROOT, 0.0))
+        for bounds in [[0.75, 2], [0.76, 3], [0.8, 4], [0.75, 0.9, 1.5]]:
+            root, stats = bdvb.bd_var_bounds_solve(func3, bounds)
+            self.assertEqual((root, stats.termination), (1.0, bdvb.EXACT_ROOT))
+
+    def test_bracket_around_guess(self):
+        def func1(x): return x**2 - 20
+        for guess in [1.0, 4.4, 4.5, 9.0]:
+            a, b, f_a, f_b = bdvb.bracket_around_guess(func1, guess, [1, 100])
+            self.assertTrue(a <= sqrt(20) <= b)
+            self.assertEqual((f_a, f_b), (func1(a), func1(b)))
+            root, stats = bdvb.bd_var_bounds_solve(func1, [1, 100], initial_guess=guess)
+            self.assertTrue(isclose(root, sqrt(20)))
+        # no root within the bounds
+        self.assertIsNone(bdvb.bracket_around_guess(func1, 6.0, [5, 10]))
+        self.assertIsNone(bdvb.bracket_around_guess(func1, 3.0, [1, 4]))
+        # a good guess needs fewer evaluations than the ladder
+        _, ladder_stats = bdvb.bd_var_bounds_solve(func1, [1e-7, 1, 2, 5, 10, 100, 1000])
+        _, guess_stats = bdvb.bd_var_bounds_solve(func1, [1e-7, 1, 2, 5, 10, 100, 1000], initial_guess=4.4)
+        self.assertTrue(guess_stats.evaluations < ladder_stats.evaluations)
+
+    def test_condition_for_bisection_method(self):
+        # s between b and (3a + b)/4, whichever way round 'a' and 'b' are
+        self.assertFalse(bdvb.condition_for_bisection_method(0.0, 1.0, 0.0, 0.0, 0.9, True, 1e-8))
+        self.assertFalse(bdvb.condition_for_bisection_method(1.0, 0.0, 1.0, 1.0, 0.1, True, 1e-8))
+        self.assertTrue(bdvb.condition_for_bisection_method(1.0, 0.0, 1.0, 1.0, 0.8, True, 1e-8))
@@ -0,0 +1,49 @@
+import unittest
+import json
+from scripts import benchmark as bm
+from scripts import trade_classes as tc
+from scripts.trade_store import TradeColumns
+from scripts.price_bounds import arbitrage_rejections, ACCEPTED
+from math import isnan
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_generate_book(self):
+        book = bm.generate_book(200, seed=1, unsolvable_fraction=0.2)
+        self.assertEqual(len(book), 200)
+        # the same seed gives the same book, a different one does not
+        self.assertEqual(bm.generate_book(200, seed=1, unsolvable_fraction=0.2).rows, book.rows)
+        self.assertNotEqual(bm.generate_book(200, seed=2, unsolvable_fraction=0.2).rows, book.rows)
+        # every unsolvable row is rejected before solving, every other row is accepted
+        rejections = arbitrage_rejections(TradeColumns.from_csv_columns(book.csv_columns())).tolist()
+        unsolvable = [isnan(volatility) for volatility in book.true_volatilities]
+        self.assertTrue(any(unsolvable))
+        self.assertEqual([rejection != ACCEPTED for rejection in rejections], unsolvable)
+        self.assertEqual(unsolvable, [regime[-1] == 'unsolvable' for regime in book.regimes])
+
+    def test_run_benchmark(self):
+        book = bm.generate_book(100, seed=3)
+        tc.TradeData.solver = 'direct'
+        result = bm.run_benchmark(book, 'scalar', 'newton-halley')
+        # the solver is only changed for the run
+        self.assertEqual(tc.TradeData.solver, 'direct')
+        self.assertGreater(result['rows per second'], 0)
+        self.assertGreater(result['pricings per solve'], 1)
+        self.assertLessEqual(result['latency (microseconds)']['p50'], result['latency (microseconds)']['max'])
+        self.assertEqual(result['accuracy']['unexpected nan'], 0)
+        self.assertEqual(result['accuracy']['unexpected solution'], 0)
+        self.assertLess(result['accuracy']['max error'], 1e-6)
+        self.assertLess(result['accuracy']['max relative price error'], 1e-6)
+
+    def test_run_benchmarks(self):
+        book = bm.generate_book(50, seed=4)
+        results = bm.run_benchmarks(book)
+        self.assertEqual([(result['engine'], result['solver']) for result in results['results']], bm.CONFIGURATIONS)
+        self.assertIsNone(results['results'][-1]['latency (microseconds)'])
+        # the results can be saved as json
+        self.assertEqual(json.loads(json.dumps(results))['rows'], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
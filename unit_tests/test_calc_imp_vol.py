@@ -1,6 +1,7 @@
 import unittest
 from scripts import trade_classes as tc
-from math import isclose, isnan
+from scipy.stats import norm
+from math import isclose, isnan, exp, sqrt
 
 
 class TestDataClasses(unittest.TestCase):
@@ -120,6 +121,8 @@ class TestDataClasses(unittest.TestCase):
         # sigma exists
         self.assertTrue(isclose(tc.Bachelier(
             bac_future_call_data2).implied_volatility_stock(), 0.2651761392457692))
+        # priced as an option on a future, i.e. with d = (S - K) / (K*sigma*sqrt(t)) (see test_bachelier_future_known_volatility)
+        self.assert_future_volatility(tc.Bachelier(bac_future_call_data2), 0.26508930015395304)
         # would require sigma > 1000, which is above the limit that I chose
         self.assertTrue(isnan(tc.BlackScholes(
             bac_future_call_data3).implied_volatility_stock()))
@@ -137,6 +140,31 @@ class TestDataClasses(unittest.TestCase):
         # sigma exists
         self.assertTrue(isclose(tc.Bachelier(
             bac_future_put_data2).implied_volatility_stock(), 0.69538421132548))
+        self.assert_future_volatility(tc.Bachelier(bac_future_put_data2), 0.6988009653433974)
         # would require sigma > 1000, which is above the limit that I chose
         self.assertTrue(isnan(tc.BlackScholes(
             bac_future_put_data3).implied_volatility_stock()))
+
+    # the implied volatility of a future, by every solver
+    def assert_future_volatility(self, trade, expected):
+        try:
+            for solver in tc.SOLVERS:
+                tc.TradeData.solver = solver
+                self.assertTrue(isclose(trade.implied_volatility_future(), expected, rel_tol=1e-12))
+        finally:
+            tc.TradeData.solver = 'direct'
+
+    def test_bachelier_future_known_volatility(self):
+        # the bachelier price of an option on a future F, discounted by exp(-rt), with normal volatility K*sigma:
+        # call = exp(-rt)[(F - K)N(d) + K*sigma*sqrt(t)n(d)], d = (F - K)/(K*sigma*sqrt(t)), and put = call + exp(-rt)(K - F)
+        def price(F, K, r, t, sigma, option_type):
+            d = (F - K) / (K * sigma * sqrt(t))
+            call = exp(-r * t) * ((F - K) * norm.cdf(d) + K * sigma * sqrt(t) * norm.pdf(d))
+            return call if option_type == 'Call' else call + exp(-r * t) * (K - F)
+        for F, K, r, days, sigma in [(1.2, 1.0, 0.03, 182.5, 0.25), (0.8, 1.0, -0.01, 365.0, 0.4), (1.0, 1.0, 0.05, 30.0, 0.1)]:
+            for option_type in ['Call', 'Put']:
+                data = {'ID': '0', 'Underlying Type': 'Future', 'Underlying': str(F), 'Risk-Free Rate': str(r), 'Days To Expiry': str(days),
+                        'Strike': str(K), 'Option Type': option_type, 'Model Type': 'Bachelier',
+                        'Market Price': repr(float(price(F, K, r, days / 365, sigma, option_type)))}
+                self.assert_future_volatility(tc.Bachelier(data), sigma)
+
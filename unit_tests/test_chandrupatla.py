@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from scripts.chandrupatla import chandrupatla
+
+
+class TestChandrupatla(unittest.TestCase):
+
+    def test_many_functions_at_once(self):
+        # x^3 - c for a range of c, bracketed by [0, 10]
+        targets = np.linspace(0.5, 900.0, 200)
+
+        def f(x, lanes): return x ** 3 - targets[lanes]
+
+        lower, upper = np.zeros(200), np.full(200, 10.0)
+        roots, steps = chandrupatla(f, lower, upper, f(lower, np.arange(200)), f(upper, np.arange(200)), 1e-14)
+        np.testing.assert_allclose(roots, np.cbrt(targets), rtol=1e-12)
+        self.assertTrue((steps < 20).all())
+
+    def test_converged_lanes_drop_out(self):
+        lane_counts = []
+
+        def f(x, lanes):
+            lane_counts.append(len(lanes))
+            # a steep step for the first lanes, which need many more iterations than the linear functions of the rest
+            return np.where(lanes < 3, np.tanh(1e6 * (x - 0.3)), x - 0.3)
+
+        lanes = np.arange(100)
+        roots, steps = chandrupatla(f, np.zeros(100), np.ones(100), f(np.zeros(100), lanes), f(np.ones(100), lanes))
+        np.testing.assert_allclose(roots, 0.3, atol=1e-12)
+        self.assertEqual(lane_counts[2], 100)
+        self.assertEqual(lane_counts[-1], 3)
+        self.assertEqual(steps.tolist(), [len(lane_counts) - 2] * 3 + [steps[3]] * 97)
+
+    def test_exact_and_undefined_roots(self):
+        def f(x, lanes): return np.where(lanes == 2, np.where(x > 0.5, np.nan, x - 0.75), x - 0.25)
+
+        lanes = np.arange(3)
+        lower, upper = np.array([0.25, 0.0, 0.0]), np.ones(3)
+        roots, steps = chandrupatla(f, lower, upper, f(lower, lanes), np.array([0.75, 0.75, 0.25]))
+        self.assertEqual(roots[0], 0.25)
+        self.assertEqual(steps[0], 0)
+        self.assertTrue(abs(roots[1] - 0.25) < 1e-12)
+        self.assertTrue(np.isnan(roots[2]))
+
+    def test_stays_within_the_bracket(self):
+        # a function that is flat over most of the bracket, where interpolation would overshoot
+        def f(x, lanes): return np.where(x < 0.999, -1e-12, x - 0.9995)
+
+        lanes = np.arange(1)
+        roots, _ = chandrupatla(f, np.zeros(1), np.ones(1), f(np.zeros(1), lanes), f(np.ones(1), lanes), 1e-13)
+        self.assertTrue(0.999 <= roots[0] <= 0.9995 + 1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
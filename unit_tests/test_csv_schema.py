@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+from scripts.csv_schema import parse_rows, RejectFile, REJECT_HEADER
+from math import isnan
+
+HEADER = ['ID', 'Underlying Type', 'Underlying', 'Risk-Free Rate', 'Days To Expiry',
+          'Strike', 'Option Type', 'Model Type', 'Market Price']
+ROWS = [
+    ['0', 'Stock', '0.5434', '-0.0045', '305.1700', '0.7103', 'Call', 'BlackScholes', '0.09794149'],
+    ['1', 'Future', '0.1855', '-0.0000', '279.5115', '0.2021', 'Straddle', 'BlackScholes', '0.050103566'],
+]
+
+
+class TestCSVSchema(unittest.TestCase):
+
+    def test_typed_columns(self):
+        columns, rejects = parse_rows(HEADER, ROWS)
+        self.assertEqual(rejects, {})
+        self.assertEqual(columns['Strike'].dtype.name, 'float64')
+        self.assertEqual(columns['Strike'].tolist(), [0.7103, 0.2021])
+        # an unrecognised option type is read, and left for the pre-filter to give nan
+        self.assertEqual(list(columns['Option Type']), ['Call', 'Straddle'])
+
+    def test_bad_rows_are_rejected(self):
+        rows = ROWS + [
+            ['2', 'Stock', 'abc', '0.01', '100', '1.0', 'Call', 'BlackScholes', '0.1'],
+            ['3', 'Stock', '1.0', '0.01', '100', '1.0', 'Call', 'Heston', '0.1'],
+            ['4', 'Stock', '1.0', '0.01'],
+            ['5', 'Stock', '1.0', '0.01', '100', '1.0', 'Call', 'Bachelier', ''],
+        ]
+        columns, rejects = parse_rows(HEADER, rows)
+        self.assertEqual(rejects, {2: "invalid Underlying: 'abc'", 3: "unrecognised Model Type: 'Heston'",
+                                   4: 'expected 9 fields, found 4', 5: "invalid Market Price: ''"})
+        # the rest of each column is still read
+        self.assertEqual(columns['Underlying'].tolist()[:2], [0.5434, 0.1855])
+        self.assertTrue(isnan(columns['Underlying'][2]))
+
+    def test_price_columns(self):
+        rows = [row + ['0.09', 'x'] for row in ROWS]
+        _, rejects = parse_rows(HEADER + ['Bid', 'Ask'], rows, ['Market Price', 'Bid', 'Ask'])
+        self.assertEqual(rejects, {0: "invalid Ask: 'x'", 1: "invalid Ask: 'x'"})
+        with self.assertRaises(ValueError):
+            parse_rows(HEADER, ROWS, ['Mid'])
+        with self.assertRaises(ValueError):
+            parse_rows(HEADER[1:], [row[1:] for row in ROWS])
+
+    def test_reject_file_is_only_created_when_needed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rejects.csv')
+            with RejectFile(path, HEADER) as rejects:
+                rejects.write([])
+            self.assertFalse(os.path.exists(path))
+            with RejectFile(path, HEADER) as rejects:
+                rejects.write([ROWS[0] + ['reason']])
+            with open(path, 'r') as reject_file:
+                self.assertEqual(reject_file.read().splitlines(), [','.join(HEADER + REJECT_HEADER), ','.join(ROWS[0] + ['reason'])])
+            # a reject file from an earlier run is removed
+            with RejectFile(path, HEADER):
+                pass
+            self.assertFalse(os.path.exists(path))
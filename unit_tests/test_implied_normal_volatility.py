@@ -0,0 +1,62 @@
+import unittest
+from scripts import implied_normal_volatility as inv
+from scripts import trade_classes as tc
+from scripts.normal_dist import erf_cdf, erf_pdf
+from math import isclose, isnan, sqrt
+
+
+def normal_model(F, K, T, sigma_n, q):
+    d = (F - K) / (sigma_n * sqrt(T))
+    return q * (F - K) * erf_cdf(q * d) + sigma_n * sqrt(T) * erf_pdf(d)
+
+
+class TestImpliedNormalVolatility(unittest.TestCase):
+
+    def test_round_trip(self):
+        for K in [0.2, 0.9, 0.99, 1.0, 1.01, 1.1, 2.5]:
+            for sigma_n in [0.005, 0.05, 0.2, 1.0, 5.0]:
+                for q in [1.0, -1.0]:
+                    price = normal_model(1.0, K, 0.5, sigma_n, q)
+                    # skip prices too close to intrinsic for the time value to survive rounding of the price
+                    if price - max(q * (1.0 - K), 0.0) <= 1e-6 * price:
+                        continue
+                    self.assertTrue(isclose(inv.implied_normal_volatility(
+                        price, 1.0, K, 0.5, q), sigma_n, rel_tol=1e-11))
+                    # without polishing, only the rational approximation is used
+                    self.assertTrue(isclose(inv.implied_normal_volatility(
+                        price, 1.0, K, 0.5, q, polish=False), sigma_n, rel_tol=1e-3))
+
+    def test_phi_tilde_tail(self):
+        # either side of the switch to the asymptotic expansion
+        for x in [-9.9, -10.1, -15.0]:
+            self.assertTrue(isclose(inv.inverse_phi_tilde(inv.phi_tilde(x)), x, rel_tol=1e-12))
+        self.assertTrue(isclose(inv.phi_tilde(-9.9999999), inv.phi_tilde(-10.0000001), rel_tol=1e-5))
+
+    def test_no_solution(self):
+        self.assertTrue(isnan(inv.implied_normal_volatility(0.1, 1.2, 1.0, 1.0, 1.0)))  # below intrinsic
+        self.assertTrue(isnan(inv.implied_normal_volatility(-0.01, 1.0, 1.2, 1.0, 1.0)))  # negative price
+        self.assertEqual(inv.implied_normal_volatility(0.5, 1.5, 1.0, 1.0, 1.0), 0.0)  # at intrinsic
+
+    def test_matches_brent_dekker(self):
+        trades = [
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '1.1975', 'Risk-Free Rate': '-0.0023', 'Days To Expiry': '190.1082',
+             'Strike': '1.4481', 'Option Type': 'Call', 'Model Type': 'Bachelier', 'Market Price': '0.3641165'},
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '1.5853', 'Risk-Free Rate': '-0.0003', 'Days To Expiry': '336.6476',
+             'Strike': '1.8868', 'Option Type': 'Put', 'Model Type': 'Bachelier', 'Market Price': '0.6068661'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '1.4597', 'Risk-Free Rate': '-0.0002', 'Days To Expiry': '65.8745',
+             'Strike': '1.4992', 'Option Type': 'Call', 'Model Type': 'Bachelier', 'Market Price': '0.049442439'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '1.8360', 'Risk-Free Rate': '-0.0031', 'Days To Expiry': '242.7474',
+             'Strike': '2.2491', 'Option Type': 'Put', 'Model Type': 'Bachelier', 'Market Price': '0.74574876'},
+        ]
+        try:
+            for data in trades:
+                results = {}
+                for solver in tc.SOLVERS:
+                    tc.TradeData.solver = solver
+                    trade = tc.Bachelier(data)
+                    trade.calc_implied_volatility()
+                    results[solver] = trade.imp_vol
+                self.assertTrue(
+                    isclose(results['direct'], results['brent-dekker'], rel_tol=1e-8))
+        finally:
+            tc.TradeData.solver = 'direct'
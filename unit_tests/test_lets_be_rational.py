@@ -0,0 +1,84 @@
+import unittest
+from scripts import lets_be_rational as lbr
+from scripts import trade_classes as tc
+from scripts.normal_dist import erf_cdf
+from math import isclose, isnan, exp, log, sqrt
+
+
+def black_76(F, K, T, sigma, q):
+    s = sigma * sqrt(T)
+    d1 = log(F / K) / s + s / 2.0
+    d2 = d1 - s
+    return q * (F * erf_cdf(q * d1) - K * erf_cdf(q * d2))
+
+
+class TestLetsBeRational(unittest.TestCase):
+
+    def test_normalised_black_call(self):
+        # away from the tails the plain formula is accurate, and every branch must agree with it
+        for x in [-2.0, -0.5, -0.01, 0.0, 0.3, 1.5]:
+            for s in [0.05, 0.2, 0.5, 1.0, 3.0]:
+                plain = exp(x / 2.0) * erf_cdf(x / s + s / 2.0) - \
+                    exp(-x / 2.0) * erf_cdf(x / s - s / 2.0)
+                self.assertTrue(
+                    isclose(lbr.normalised_black_call(x, s), plain, rel_tol=1e-12))
+        # deep out-of-the-money, where the plain formula loses all precision, the price must stay positive and increasing in s
+        previous = 0.0
+        for s in [0.2, 0.3, 0.5, 1.0]:
+            b = lbr.normalised_black_call(-5.0, s)
+            self.assertTrue(b > previous)
+            previous = b
+
+    def test_round_trip(self):
+        # every segment: deep out-of-the-money to deep in-the-money, tiny to very large volatilities
+        F = 1.0
+        for K in [0.05, 0.5, 0.9, 1.0, 1.1, 2.0, 20.0]:
+            for sigma in [0.01, 0.1, 0.3, 1.0, 3.0]:
+                for q in [1.0, -1.0]:
+                    price = black_76(F, K, 1.0, sigma, q)
+                    intrinsic = max(q * (F - K), 0.0)
+                    # skip prices indistinguishable from intrinsic, which have no meaningful implied volatility
+                    if price - intrinsic < 1e-12 * max(price, 1.0):
+                        continue
+                    self.assertTrue(isclose(lbr.implied_volatility_from_a_transformed_rational_guess(
+                        price, F, K, 1.0, q), sigma, rel_tol=1e-9))
+
+    def test_time_scaling(self):
+        price = black_76(1.3, 1.1, 0.25, 0.4, 1.0)
+        self.assertTrue(isclose(lbr.implied_volatility_from_a_transformed_rational_guess(
+            price, 1.3, 1.1, 0.25, 1.0), 0.4, rel_tol=1e-12))
+
+    def test_no_solution(self):
+        # below intrinsic
+        self.assertTrue(isnan(lbr.implied_volatility_from_a_transformed_rational_guess(
+            0.05, 1.2, 1.0, 1.0, 1.0)))
+        # above the maximum (F for a call, K for a put)
+        self.assertTrue(isnan(lbr.implied_volatility_from_a_transformed_rational_guess(
+            1.3, 1.2, 1.0, 1.0, 1.0)))
+        self.assertTrue(isnan(lbr.implied_volatility_from_a_transformed_rational_guess(
+            1.1, 1.2, 1.0, 1.0, -1.0)))
+        # negative price
+        self.assertTrue(isnan(lbr.implied_volatility_from_a_transformed_rational_guess(
+            -0.01, 1.2, 1.0, 1.0, -1.0)))
+
+    def test_matches_brent_dekker(self):
+        trades = [
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '0.5434', 'Risk-Free Rate': '-0.0045', 'Days To Expiry': '305.1700',
+             'Strike': '0.7103', 'Option Type': 'Call', 'Model Type': 'BlackScholes', 'Market Price': '0.09794149'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '0.1855', 'Risk-Free Rate': '-0.0000', 'Days To Expiry': '279.5115',
+             'Strike': '0.2021', 'Option Type': 'Put', 'Model Type': 'BlackScholes', 'Market Price': '0.050103566'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '1.3315', 'Risk-Free Rate': '0.0300', 'Days To Expiry': '50.0000',
+             'Strike': '1.1348', 'Option Type': 'Call', 'Model Type': 'BlackScholes', 'Market Price': '0.21010422'},
+        ]
+        try:
+            for data in trades:
+                results = {}
+                for solver in tc.SOLVERS:
+                    tc.TradeData.solver = solver
+                    trade = tc.BlackScholes(data)
+                    trade.calc_implied_volatility()
+                    results[solver] = trade.imp_vol
+                self.assertTrue(
+                    isclose(results['direct'], results['brent-dekker'], rel_tol=1e-8))
+        finally:
+            tc.TradeData.solver = 'direct'
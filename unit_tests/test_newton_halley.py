@@ -0,0 +1,68 @@
+import unittest
+from scripts import newton_halley as nh
+from scripts import trade_classes as tc
+from math import isclose, sqrt, isnan, atan
+
+
+class TestNewtonHalleyRootFinder(unittest.TestCase):
+
+    def test_halley_step(self):
+        self.assertEqual(nh.halley_step(-2.0, 1.0, 0.0), 2.0)  # newton's step when f'' = 0
+        self.assertTrue(isclose(nh.halley_step(-1.0, 2.0, 1.0), 0.5 / 1.125))
+        self.assertTrue(isnan(nh.halley_step(-1.0, 0.0, 1.0)))
+
+    def test_newton_halley(self):
+        def func1(x): return x**2 - 20, 2*x, 2.0  # roots known as +- sqrt(20) ~ +-4.47
+        self.assertTrue(isclose(nh.newton_halley(func1, [4, 5]), sqrt(20), rel_tol=1e-15))
+        self.assertTrue(isnan(nh.newton_halley(func1, [2, 3])))  # no root between bounds
+        self.assertTrue(isnan(nh.newton_halley(func1, [5, 6])))  # lowest bound lies above the root
+        self.assertTrue(isclose(nh.newton_halley(func1, [1, 2, 3, 4, 5]), sqrt(20), rel_tol=1e-15))
+
+        def func2(x): return x**2 - 16, 2*x, 2.0
+        self.assertEqual(nh.newton_halley(func2, [4, 5]), 4)  # root on a bound
+
+    def test_solve_stats_termination(self):
+        def func1(x): return x**2 - 20, 2*x, 2.0
+        _, stats = nh.newton_halley_solve(func1, [1, 2, 5, 10])
+        self.assertEqual((stats.rung, stats.termination), (1, nh.CONVERGED))
+        self.assertTrue(abs(stats.residual) < 1e-6)
+        _, stats = nh.newton_halley_solve(lambda x: (x - 4, 1.0, 0.0), [1, 4, 5])
+        self.assertEqual((stats.residual, stats.termination), (0.0, nh.EXACT_ROOT))
+        _, stats = nh.newton_halley_solve(func1, [2, 3])
+        self.assertEqual(stats.termination, 'above highest bound')
+        _, stats = nh.newton_halley_solve(func1, [5, 6], initial_guess=5.5)
+        self.assertEqual(stats.termination, 'below lowest bound')
+
+    def test_falls_back_to_bisection(self):
+        # newton's method overshoots arctan from anywhere far enough from the root, and would diverge without the bracket
+        def func1(x): return atan(x - 1.0), 1.0 / (1.0 + (x - 1.0)**2), 0.0
+        root, stats = nh.newton_halley_solve(func1, [-20, 20], initial_guess=15.0)
+        self.assertTrue(isclose(root, 1.0, rel_tol=1e-12))
+        self.assertTrue(stats.iterations < 50)
+
+    def test_matches_brent_dekker(self):
+        trades = [
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '0.5434', 'Risk-Free Rate': '-0.0045', 'Days To Expiry': '305.1700',
+             'Strike': '0.7103', 'Option Type': 'Call', 'Model Type': 'BlackScholes', 'Market Price': '0.09794149'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '0.1855', 'Risk-Free Rate': '-0.0000', 'Days To Expiry': '279.5115',
+             'Strike': '0.2021', 'Option Type': 'Put', 'Model Type': 'BlackScholes', 'Market Price': '0.050103566'},
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '1.5853', 'Risk-Free Rate': '-0.0003', 'Days To Expiry': '336.6476',
+             'Strike': '1.8868', 'Option Type': 'Put', 'Model Type': 'Bachelier', 'Market Price': '0.6068661'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '1.4597', 'Risk-Free Rate': '-0.0002', 'Days To Expiry': '65.8745',
+             'Strike': '1.4992', 'Option Type': 'Call', 'Model Type': 'Bachelier', 'Market Price': '0.049442439'},
+        ]
+        try:
+            for data in trades:
+                model = tc.BlackScholes if data['Model Type'] == 'BlackScholes' else tc.Bachelier
+                results, evaluations = {}, {}
+                for solver in tc.SOLVERS:
+                    tc.TradeData.solver = solver
+                    trade = model(data)
+                    trade.calc_implied_volatility()
+                    results[solver] = trade.imp_vol
+                    if trade.solve_stats is not None:
+                        evaluations[solver] = trade.solve_stats.evaluations
+                self.assertTrue(isclose(results['newton-halley'], results['direct'], rel_tol=1e-10))
+                self.assertTrue(evaluations['newton-halley'] < evaluations['brent-dekker'])
+        finally:
+            tc.TradeData.solver = 'direct'
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from scripts import normal_dist as nd
+from scripts import trade_classes as tc
+from math import isclose
+
+# every backend must agree with the scipy reference to within these tolerances,
+# i.e. |N(x) - N_ref(x)| <= ABSOLUTE_TOLERANCE + RELATIVE_TOLERANCE * N_ref(x)
+# the relative tolerance is what matters in the lower tail (where N(x) falls as low as ~1e-300)
+ABSOLUTE_TOLERANCE = 1e-15
+RELATIVE_TOLERANCE = 1e-10
+
+# covers both tails, down to where N(x) underflows
+PARITY_POINTS = np.linspace(-38.0, 38.0, 7601)
+
+
+class TestNormalDistributionBackends(unittest.TestCase):
+
+    def tearDown(self):
+        nd.set_backend('erf')
+
+    def assert_parity(self, values, reference):
+        self.assertTrue(np.all(np.abs(np.asarray(values) - reference) <=
+                               ABSOLUTE_TOLERANCE + RELATIVE_TOLERANCE * reference))
+
+    def test_scalar_backends_match_scipy(self):
+        reference_cdf = nd.scipy_cdf(PARITY_POINTS)
+        reference_pdf = nd.scipy_pdf(PARITY_POINTS)
+        for name in nd.BACKENDS:
+            cdf, pdf = nd.BACKENDS[name]
+            self.assert_parity([cdf(float(x)) for x in PARITY_POINTS], reference_cdf)
+            self.assert_parity([pdf(float(x)) for x in PARITY_POINTS], reference_pdf)
+
+    def test_numpy_backend_on_arrays(self):
+        self.assert_parity(nd.numpy_cdf(PARITY_POINTS), nd.scipy_cdf(PARITY_POINTS))
+        self.assert_parity(nd.numpy_pdf(PARITY_POINTS), nd.scipy_pdf(PARITY_POINTS))
+
+    def test_set_backend(self):
+        nd.set_backend('scipy')
+        self.assertIs(nd.cdf, nd.scipy_cdf)
+        self.assertIs(nd.pdf, nd.scipy_pdf)
+        with self.assertRaises(ValueError):
+            nd.set_backend('fortran')
+
+    def test_pricing_is_backend_independent(self):
+        bs_data = {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '0.8714', 'Risk-Free Rate': '-0.0049', 'Days To Expiry': '211.8715',
+                   'Strike': '0.9426', 'Option Type': 'Put', 'Model Type': 'BlackScholes', 'Market Price': '0.14370158'}
+        bac_data = {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '1.5853', 'Risk-Free Rate': '-0.0003', 'Days To Expiry': '336.6476',
+                    'Strike': '1.8868', 'Option Type': 'Put', 'Model Type': 'Bachelier', 'Market Price': '0.6068661'}
+        results = {}
+        for name in nd.BACKENDS:
+            nd.set_backend(name)
+            results[name] = (tc.BlackScholes(bs_data).implied_volatility_stock(),
+                             tc.Bachelier(bac_data).implied_volatility_stock())
+        for name in nd.BACKENDS:
+            for value, reference in zip(results[name], results['scipy']):
+                self.assertTrue(isclose(value, reference, rel_tol=1e-9))
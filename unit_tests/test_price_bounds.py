@@ -0,0 +1,58 @@
+import unittest
+from scripts import price_bounds as pb
+from scripts import trade_classes as tc
+from scripts.trade_store import TradeColumns
+from math import isnan
+
+
+def trade_data(underlying_type, underlying, rate, days, strike, option_type, model_type, price):
+    return {'ID': '0', 'Underlying Type': underlying_type, 'Underlying': underlying, 'Risk-Free Rate': rate, 'Days To Expiry': days,
+            'Strike': strike, 'Option Type': option_type, 'Model Type': model_type, 'Market Price': price}
+
+
+def as_csv_columns(trades):
+    return {key: [trade[key] for trade in trades] for key in trades[0]}
+
+
+class TestPriceBounds(unittest.TestCase):
+
+    def test_reason_codes(self):
+        trades = {
+            pb.ACCEPTED: trade_data('Stock', '0.5434', '-0.0045', '305.1700', '0.7103', 'Call', 'BlackScholes', '0.09794149'),
+            pb.INVALID_INPUTS: trade_data('Stock', '0.5434', '-0.0045', '0.0', '0.7103', 'Call', 'BlackScholes', '0.09794149'),
+            pb.UNSUPPORTED_TYPE: trade_data('Stock', '1.1975', '-0.0023', '190.1082', '1.4481', 'Straddle', 'Bachelier', '0.3641165'),
+            pb.NON_POSITIVE_PRICE: trade_data('Stock', '0.5434', '-0.0045', '305.1700', '0.7103', 'Call', 'BlackScholes', '-0.01'),
+            pb.BELOW_INTRINSIC_VALUE: trade_data('Future', '1.8360', '-0.0031', '242.7474', '2.2491', 'Put', 'Bachelier', '0.3'),
+            pb.ABOVE_UPPER_BOUND: trade_data('Stock', '0.8714', '-0.0049', '211.8715', '0.9426', 'Put', 'BlackScholes', '0.95'),
+        }
+        columns = TradeColumns.from_csv_columns(as_csv_columns(list(trades.values())))
+        self.assertEqual(pb.arbitrage_rejections(columns).tolist(), list(trades.keys()))
+
+    def test_rejected_rows_have_no_solution(self):
+        # for every model, underlying and option type, rows either side of each bound
+        trades = []
+        for model_type in ['BlackScholes', 'Bachelier']:
+            for underlying_type in ['Stock', 'Future']:
+                for option_type in ['Call', 'Put']:
+                    for strike in ['0.8', '1.25']:
+                        for price in ['0.0', '0.001', '0.1', '0.2', '0.21', '0.3', '0.79', '0.8', '1.25', '1.3']:
+                            trades.append(trade_data(underlying_type, '1.0', '0.05', '100.0',
+                                                     strike, option_type, model_type, price))
+        columns = TradeColumns.from_csv_columns(as_csv_columns(trades))
+        rejections = pb.arbitrage_rejections(columns).tolist()
+        self.assertTrue(pb.ACCEPTED in rejections)
+        self.assertTrue(pb.BELOW_INTRINSIC_VALUE in rejections)
+        self.assertTrue(pb.ABOVE_UPPER_BOUND in rejections)
+        try:
+            for solver in tc.SOLVERS:
+                tc.TradeData.solver = solver
+                for data, rejection in zip(trades, rejections):
+                    if rejection != pb.ACCEPTED:
+                        model = tc.BlackScholes if data['Model Type'] == 'BlackScholes' else tc.Bachelier
+                        trade = model(data)
+                        trade.calc_implied_volatility()
+                        # at a zero price the bracketed solvers stop on the flat (zero) trade value instead
+                        if solver == 'direct' or rejection != pb.NON_POSITIVE_PRICE:
+                            self.assertTrue(isnan(trade.imp_vol))
+        finally:
+            tc.TradeData.solver = 'direct'
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from scripts import pricing_kernels as pk
+from scripts.batch_engine import price
+from scripts.trade_store import TradeColumns, MODEL_CODES, UNDERLYING_CODES, OPTION_CODES
+from math import isclose
+
+
+def single_trade(model_type, underlying_type, option_type, S, K, r, t):
+    return TradeColumns(['0'], np.array([S]), np.array([K]), np.array([r]), np.array([t]), np.array([0.0]),
+                        np.array([UNDERLYING_CODES[underlying_type]], dtype=np.int8),
+                        np.array([OPTION_CODES[option_type]], dtype=np.int8),
+                        np.array([MODEL_CODES[model_type]], dtype=np.int8))
+
+
+class TestPricingKernels(unittest.TestCase):
+
+    def test_matches_batch_price(self):
+        for (model_type, underlying_type, option_type) in pk.KERNELS:
+            for S, K, r, t, sigma in [(0.5434, 0.7103, -0.0045, 0.836, 0.4), (1.8360, 2.2491, 0.03, 0.665, 1.5)]:
+                kernel_price, _, _ = pk.pricing_kernel(model_type, underlying_type, option_type, S, K, r, t)
+                batch_price = price(single_trade(model_type, underlying_type, option_type, S, K, r, t), np.array([sigma]))
+                self.assertTrue(isclose(kernel_price(sigma), batch_price.item(0), rel_tol=1e-12))
+
+    def test_greeks_match_finite_differences(self):
+        h = 1e-5
+        for (model_type, underlying_type, option_type) in pk.KERNELS:
+            price_of, price_and_greeks, _ = pk.pricing_kernel(model_type, underlying_type, option_type, 1.1975, 1.4481, 0.02, 0.52)
+            value, vega, volga = price_and_greeks(0.3)
+            self.assertEqual(value, price_of(0.3))
+            self.assertTrue(isclose(vega, (price_of(0.3 + h) - price_of(0.3 - h)) / (2 * h), rel_tol=1e-6))
+            self.assertTrue(isclose(volga, (price_and_greeks(0.3 + h)[1] - price_and_greeks(0.3 - h)[1]) / (2 * h), rel_tol=1e-5))
+
+    def test_reported_greeks_match_finite_differences(self):
+        h, S, K, r, t, sigma = 1e-5, 1.1975, 1.4481, 0.02, 0.52, 0.3
+
+        def value(S=S, t=t):
+            return pk.pricing_kernel(model_type, underlying_type, option_type, S, K, r, t)[0](sigma)
+
+        for (model_type, underlying_type, option_type) in pk.KERNELS:
+            delta, gamma, vega, theta = pk.pricing_kernel(model_type, underlying_type, option_type, S, K, r, t)[2](sigma)
+            self.assertTrue(isclose(delta, (value(S + h) - value(S - h)) / (2 * h), rel_tol=1e-6))
+            self.assertTrue(isclose(gamma, (value(S + h) - 2 * value() + value(S - h)) / h ** 2, rel_tol=1e-4))
+            self.assertEqual(vega, pk.pricing_kernel(model_type, underlying_type, option_type, S, K, r, t)[1](sigma)[1])
+            self.assertTrue(isclose(theta, -(value(t=t + h) - value(t=t - h)) / (2 * h), rel_tol=1e-6))
+
+    def test_unknown_types(self):
+        self.assertIsNone(pk.pricing_kernel('BlackScholes', 'Stock', 'Straddle', 1.0, 1.0, 0.0, 1.0))
+        self.assertIsNone(pk.pricing_kernel('Heston', 'Stock', 'Call', 1.0, 1.0, 0.0, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,305 @@
+import unittest
+import csv
+import json
+import os
+import tempfile
+from scripts import runner_methods as rm
+from math import isclose, isnan
+
+HEADER = ['ID', 'Underlying Type', 'Underlying', 'Risk-Free Rate', 'Days To Expiry',
+          'Strike', 'Option Type', 'Model Type', 'Market Price']
+ROWS = [
+    ['0', 'Stock', '0.5434', '-0.0045', '305.1700', '0.7103', 'Call', 'BlackScholes', '0.09794149'],
+    ['1', 'Future', '0.1855', '-0.0000', '279.5115', '0.2021', 'Put', 'BlackScholes', '0.050103566'],
+    ['2', 'Stock', '1.1975', '-0.0023', '190.1082', '1.4481', 'Call', 'Bachelier', '0.3641165'],
+    ['3', 'Future', '1.8360', '-0.0031', '242.7474', '2.2491', 'Put', 'Bachelier', '0.74574876'],
+    ['4', 'Stock', '1.0000', '0.0100', '100.0000', '1.0000', 'Call', 'BlackScholes', '5.0'],
+]
+
+
+class TestRunnerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.directory.name, 'input.csv')
+        with open(self.input_file, 'w') as input:
+            writer = csv.writer(input)
+            writer.writerow(HEADER)
+            writer.writerows(ROWS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+        # the solver is a module level setting, set by each run
+        rm.TradeData.solver = 'direct'
+
+    def run_calculator(self, *options):
+        output_file = os.path.join(self.directory.name, 'output_%s.csv' % len(os.listdir(self.directory.name)))
+        rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, output_file] + list(options)).run_application()
+        with open(output_file, 'r') as output:
+            return output.read()
+
+    def test_read_in_chunks(self):
+        chunks = list(rm.read_in_chunks(iter(ROWS), 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        chunks = list(rm.read_in_chunks(iter(ROWS), 2, 3))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+
+    def test_streaming_matches_whole_file(self):
+        for engine in rm.ENGINES:
+            expected = self.run_calculator('--engine=%s' % engine)
+            self.assertEqual(self.run_calculator('--engine=%s' % engine, '--stream', '--chunk-size=2'), expected)
+            # a line limit applies across chunks
+            self.assertEqual(self.run_calculator('--engine=%s' % engine, '--stream', '--chunk-size=2', '3'),
+                             self.run_calculator('--engine=%s' % engine, '3'))
+
+    def test_workers_match_single_process(self):
+        for engine in rm.ENGINES:
+            expected = self.run_calculator('--engine=%s' % engine)
+            self.assertEqual(self.run_calculator('--engine=%s' % engine, '--workers=2', '--chunk-size=2'), expected)
+
+    def test_nan_reasons(self):
+        for engine in rm.ENGINES:
+            output = list(csv.reader(self.run_calculator('--engine=%s' % engine, '--nan-reasons').splitlines()))
+            self.assertEqual(output[0], rm.OUTPUT_HEADER + ['NaN Reason'])
+            self.assertEqual([row[-1] for row in output[1:]], ['', '', '', '', 'above upper bound'])
+
+    def test_cache_matches_uncached(self):
+        # a repeated quote (under a different ID, and written differently) is solved once
+        with open(self.input_file, 'a') as input:
+            csv.writer(input).writerow(['5', 'Stock', '0.54340', '-0.0045', '305.17', '0.7103', 'Call', 'BlackScholes', '0.09794149'])
+        cache_file = os.path.join(self.directory.name, 'cache.csv')
+        for solvers_run, solver in enumerate(['direct', 'brent-dekker'], 1):
+            expected = self.run_calculator('--solver=%s' % solver)
+            self.assertEqual(self.run_calculator('--solver=%s' % solver, '--cache'), expected)
+            self.assertEqual(self.run_calculator('--solver=%s' % solver, '--stream', '--chunk-size=2', '--cache-size=1'), expected)
+            self.assertEqual(self.run_calculator('--solver=%s' % solver, '--cache-file=%s' % cache_file), expected)
+            calculator = rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, os.path.join(self.directory.name, 'cached.csv'),
+                                                         '--solver=%s' % solver, '--cache-file=%s' % cache_file])
+            # four distinct accepted quotes per solver, the cache file holding the solves of both
+            self.assertEqual(len(calculator.cache), 4 * solvers_run)
+
+    def test_chain_matches_unchained(self):
+        # a chain of calls on one underlying, written out of strike order
+        with open(self.input_file, 'a') as input:
+            writer = csv.writer(input)
+            for i, (strike, price) in enumerate([('0.60', '0.2'), ('0.50', '0.28'), ('0.55', '0.24'), ('0.65', '0.165')]):
+                writer.writerow([str(5 + i), 'Stock', '0.75', '0.01', '182', strike, 'Call', 'BlackScholes', price])
+        for solver in ['brent-dekker', 'newton-halley']:
+            expected = list(csv.reader(self.run_calculator('--solver=%s' % solver).splitlines()))
+            for options in [['--chain'], ['--chain', '--stream', '--chunk-size=4']]:
+                output = list(csv.reader(self.run_calculator('--solver=%s' % solver, *options).splitlines()))
+                # written in input order
+                self.assertEqual([row[0] for row in output], [row[0] for row in expected])
+                for row, expected_row in zip(output[1:], expected[1:]):
+                    self.assertTrue(isclose(float(row[7]), float(expected_row[7]), rel_tol=1e-7) or
+                                    isnan(float(row[7])) and isnan(float(expected_row[7])))
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--chain', '--engine=batch'])
+
+    def test_diagnostics(self):
+        # brent-dekker steps exactly onto the root of the second row
+        for options, terminations in [(['--solver=brent-dekker'], ['converged', 'exact root', 'converged', 'converged', '']),
+                                      (['--solver=newton-halley', '--stream', '--chunk-size=2'], ['converged'] * 4 + [''])]:
+            output = list(csv.reader(self.run_calculator(*options, '--diagnostics', '--nan-reasons').splitlines()))
+            self.assertEqual(output[0], rm.OUTPUT_HEADER + rm.DIAGNOSTICS_HEADER + ['NaN Reason'])
+            self.assertEqual([row[-2] for row in output[1:]], terminations)
+            self.assertEqual([row[-5] for row in output[1:]], ['guess'] * 4 + [''])
+            # written to a separate file, the output is unchanged
+            diagnostics_file = os.path.join(self.directory.name, 'diagnostics.csv')
+            self.assertEqual(self.run_calculator(*options, '--diagnostics=%s' % diagnostics_file), self.run_calculator(*options))
+            with open(diagnostics_file, 'r') as diagnostics:
+                sidecar = list(csv.reader(diagnostics))
+            self.assertEqual(sidecar, [['ID'] + rm.DIAGNOSTICS_HEADER] + [[row[0]] + row[9:15] for row in output[1:]])
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--diagnostics', '--engine=batch'])
+
+    def test_diagnostics_at_exact_root(self):
+        # the second row is priced at exactly its market price by a brent-dekker step, so the solve stops there
+        direct = list(csv.reader(self.run_calculator().splitlines()))[2]
+        output = list(csv.reader(self.run_calculator('--solver=brent-dekker', '--diagnostics').splitlines()))[2]
+        iterations, evaluations, bracket, bracket_width, residual, termination = output[9:15]
+        self.assertEqual((bracket, float(residual), termination), ('guess', 0.0, 'exact root'))
+        self.assertTrue(int(evaluations) > int(iterations) > 0)
+        self.assertTrue(isclose(float(output[7]), float(direct[7]), rel_tol=1e-12))
+
+    def test_greeks(self):
+        outputs = {}
+        for engine in rm.ENGINES:
+            output = list(csv.reader(self.run_calculator('--engine=%s' % engine, '--greeks').splitlines()))
+            self.assertEqual(output[0], rm.OUTPUT_HEADER + rm.GREEKS_HEADER)
+            outputs[engine] = [[float(value) for value in row[9:]] for row in output[1:]]
+        for scalar_row, batch_row in zip(outputs['scalar'], outputs['batch']):
+            for scalar_greek, batch_greek in zip(scalar_row, batch_row):
+                self.assertTrue(isclose(scalar_greek, batch_greek, rel_tol=1e-6) or isnan(scalar_greek) and isnan(batch_greek))
+        # the rejected row has no greeks
+        self.assertTrue(all(isnan(greek) for greek in outputs['scalar'][4]))
+        # greeks come before the diagnostics, which are unchanged written to a separate file
+        options = ['--solver=brent-dekker', '--greeks']
+        output = list(csv.reader(self.run_calculator(*options, '--diagnostics').splitlines()))
+        self.assertEqual(output[0], rm.OUTPUT_HEADER + rm.GREEKS_HEADER + rm.DIAGNOSTICS_HEADER)
+        diagnostics_file = os.path.join(self.directory.name, 'diagnostics.csv')
+        self.assertEqual(self.run_calculator(*options, '--diagnostics=%s' % diagnostics_file), self.run_calculator(*options))
+        with open(diagnostics_file, 'r') as diagnostics:
+            self.assertEqual(list(csv.reader(diagnostics))[1:], [[row[0]] + row[13:] for row in output[1:]])
+
+    def test_prices(self):
+        # bids and asks either side of the market price, the last row's market price being rejected but not its bid
+        with open(self.input_file, 'w') as input:
+            writer = csv.writer(input)
+            writer.writerow(HEADER + ['Bid', 'Ask'])
+            writer.writerows(row + [repr(float(row[8]) * 0.98), repr(float(row[8]) * 1.02)] for row in ROWS[:4])
+            writer.writerow(ROWS[4] + ['0.02', '5.1'])
+        for options in [['--engine=batch'], ['--solver=direct'], ['--solver=brent-dekker'], ['--solver=newton-halley', '--chain']]:
+            output = list(csv.reader(self.run_calculator(*options, '--prices=Market Price,Bid,Ask').splitlines()))
+            self.assertEqual(output[0], rm.OUTPUT_HEADER + ['Implied Volatility (Bid)', 'Implied Volatility (Ask)'])
+            # the first price is solved as the market price, and each other price as if it were the first
+            self.assertEqual([row[:9] for row in output],
+                             list(csv.reader(self.run_calculator(*options).splitlines())))
+            for column, price in [(9, 'Bid'), (10, 'Ask')]:
+                expected = list(csv.reader(self.run_calculator(*options, '--prices=%s' % price).splitlines()))
+                for row, expected_row in zip(output[1:], expected[1:]):
+                    self.assertTrue(isclose(float(row[column]), float(expected_row[7]), rel_tol=1e-7) or
+                                    isnan(float(row[column])) and isnan(float(expected_row[7])))
+            self.assertFalse(isnan(float(output[5][9])))
+            self.assertTrue(isnan(float(output[5][10])))
+        with self.assertRaises(ValueError):
+            self.run_calculator('--prices=Mid')
+
+    def test_metrics(self):
+        metrics_file = os.path.join(self.directory.name, 'metrics.json')
+        for options in [[], ['--workers=2', '--chunk-size=2']]:
+            self.run_calculator('--solver=brent-dekker', '--metrics=%s' % metrics_file, *options)
+            with open(metrics_file, 'r') as metrics:
+                metrics = json.load(metrics)
+            self.assertEqual(metrics['rows'], 5)
+            self.assertEqual(metrics['nan results'], {'above upper bound': 1})
+            self.assertEqual(sorted(metrics['stage seconds']), sorted(['parse', 'build', 'solve', 'write']))
+            # the four accepted rows are timed, by model and option type
+            self.assertEqual(sum(histogram['count'] for histogram in metrics['solve seconds'].values()), 4)
+            # and each is solved by brent-dekker, counted across the workers
+            self.assertEqual(metrics['bracketed solves'], 4)
+            self.assertGreater(metrics['pricings per bracketed solve'], 2)
+
+    def test_resume_from_checkpoint(self):
+        output_file = os.path.join(self.directory.name, 'output.csv')
+        diagnostics_file = os.path.join(self.directory.name, 'diagnostics.csv')
+        arguments = ['runner.py', self.input_file, output_file, '--chunk-size=2', '--solver=brent-dekker', '--nan-reasons',
+                     '--diagnostics=%s' % diagnostics_file]
+
+        def run(*options):
+            rm.ImpliedVolatilityCalculator(arguments + list(options)).run_application()
+            with open(output_file, 'r') as output, open(diagnostics_file, 'r') as diagnostics:
+                return output.read(), diagnostics.read()
+
+        expected = run()
+        # interrupted while writing the second chunk, after its first row
+        write_rows = rm.write_rows
+
+        def interrupted_write_rows(output_writer, csv_file_data, *arguments):
+            if write_rows.calls == 1:
+                output_writer.writerow(csv_file_data.body[0][:len(rm.OUTPUT_HEADER)])
+                raise KeyboardInterrupt
+            write_rows.calls += 1
+            return write_rows(output_writer, csv_file_data, *arguments)
+
+        write_rows.calls = 0
+        rm.write_rows = interrupted_write_rows
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                run('--checkpoint')
+        finally:
+            rm.write_rows = write_rows
+        self.assertTrue(os.path.exists(output_file + '.checkpoint'))
+        self.assertEqual(run('--resume'), expected)
+        self.assertFalse(os.path.exists(output_file + '.checkpoint'))
+        # with nothing to resume from, the run starts from the beginning
+        self.assertEqual(run('--resume'), expected)
+
+    def test_rejects(self):
+        expected = {engine: self.run_calculator('--nan-reasons', '--engine=%s' % engine) for engine in rm.ENGINES}
+        with open(self.input_file, 'a') as input:
+            writer = csv.writer(input)
+            writer.writerow(['5', 'Stock', '1.0', '0.01', '100.0', '1.0', 'Call', 'Heston', '0.1'])
+            writer.writerow(['6', 'Stock', 'abc', '0.01', '100.0', '1.0', 'Call', 'BlackScholes', '0.1'])
+            writer.writerow(['7', 'Stock'])
+        for options in [['--engine=batch'], ['--stream', '--chunk-size=3'], ['--workers=2', '--chunk-size=2'], ['--checkpoint']]:
+            rejects_file = os.path.join(self.directory.name, 'rejects.csv')
+            # the bad rows are left out of the output, and the run carries on
+            self.assertEqual(self.run_calculator('--nan-reasons', '--rejects=%s' % rejects_file, *options),
+                             expected['batch' if '--engine=batch' in options else 'scalar'])
+            with open(rejects_file, 'r') as rejects:
+                self.assertEqual(list(csv.reader(rejects)), [
+                    HEADER + ['Reject Reason'],
+                    ['5', 'Stock', '1.0', '0.01', '100.0', '1.0', 'Call', 'Heston', '0.1', "unrecognised Model Type: 'Heston'"],
+                    ['6', 'Stock', 'abc', '0.01', '100.0', '1.0', 'Call', 'BlackScholes', '0.1', "invalid Underlying: 'abc'"],
+                    ['7', 'Stock', 'expected 9 fields, found 2']])
+
+    def test_checkpoint_settings_must_match(self):
+        output_file = os.path.join(self.directory.name, 'output.csv')
+        checkpoint = rm.Checkpoint(output_file + '.checkpoint', {'engine': 'batch'})
+        checkpoint.save(2, 100, None, {})
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, output_file, '--resume']).run_application()
+
+    def test_incremental_matches_full_run(self):
+        previous_output = os.path.join(self.directory.name, 'previous_output.csv')
+        previous_input = os.path.join(self.directory.name, 'previous_input.csv')
+        os.rename(self.input_file, previous_input)
+        rm.ImpliedVolatilityCalculator(['runner.py', previous_input, previous_output, '--nan-reasons']).run_application()
+        # one price has changed and a row has been added
+        rows = [row[:8] + ['0.1'] if row[0] == '0' else row for row in ROWS] + [['5'] + ROWS[2][1:]]
+        with open(self.input_file, 'w') as input:
+            csv.writer(input).writerows([HEADER] + rows)
+        for options in [[], ['--stream', '--chunk-size=2']]:
+            expected = self.run_calculator('--nan-reasons', *options)
+            calculator = rm.ImpliedVolatilityCalculator(
+                ['runner.py', self.input_file, os.path.join(self.directory.name, 'output.csv'), '--nan-reasons',
+                 '--previous-input=%s' % previous_input, '--previous-output=%s' % previous_output] + options)
+            calculator.run_application()
+            self.assertEqual(calculator.telemetry.rows_reused, 4)
+            with open(os.path.join(self.directory.name, 'output.csv'), 'r') as output:
+                self.assertEqual(output.read(), expected)
+        # the previous output must have the same columns
+        with self.assertRaises(ValueError):
+            self.run_calculator('--previous-input=%s' % previous_input, '--previous-output=%s' % previous_output)
+
+    def test_incremental_with_other_settings(self):
+        previous_output = os.path.join(self.directory.name, 'previous_output.csv')
+        previous_input = os.path.join(self.directory.name, 'previous_input.csv')
+        rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, previous_output, '--solver=brent-dekker']).run_application()
+        os.rename(self.input_file, previous_input)
+        with open(self.input_file, 'w') as input:
+            csv.writer(input).writerows([HEADER] + ROWS)
+        rm.TradeData.solver = 'direct'
+        expected = self.run_calculator()
+        output_file = os.path.join(self.directory.name, 'output.csv')
+        options = ['--previous-input=%s' % previous_input, '--previous-output=%s' % previous_output]
+        # the previous results were solved with another solver, so every row is solved again
+        calculator = rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, output_file] + options)
+        calculator.run_application()
+        self.assertEqual(calculator.telemetry.rows_reused, 0)
+        with open(output_file, 'r') as output:
+            self.assertEqual(output.read(), expected)
+        # as they are when the settings of the previous run are not known
+        rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, previous_output]).run_application()
+        os.remove(previous_output + '.settings')
+        calculator = rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, output_file] + options)
+        calculator.run_application()
+        self.assertEqual(calculator.telemetry.rows_reused, 0)
+        # and the results are reused once the settings are the same
+        rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, previous_output]).run_application()
+        calculator = rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, output_file] + options)
+        calculator.run_application()
+        self.assertEqual(calculator.telemetry.rows_reused, len(ROWS))
+
+    def test_invalid_cache(self):
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--cache', '--engine=batch'])
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--cache', '--workers=2'])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--chunk-size=0'])
+        with self.assertRaises(ValueError):
+            rm.ImpliedVolatilityCalculator(['runner.py', self.input_file, 'output.csv', '--workers=0'])
@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+from scripts import solve_cache as sc
+from math import isnan
+
+
+def key(S):
+    return ('brent-dekker', 'erf', 'BlackScholes', 'Stock', 'Call', S, 0.7103, -0.0045, 0.836, 0.09794149)
+
+
+class TestSolveCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = sc.SolveCache()
+        self.assertIsNone(cache.get(key(0.5434)))
+        cache.put(key(0.5434), 0.25)
+        cache.put(key(0.6), float('nan'))
+        self.assertEqual(cache.get(key(0.5434)), 0.25)
+        # nan results are cached too
+        self.assertTrue(isnan(cache.get(key(0.6))))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_least_recently_used_evicted(self):
+        cache = sc.SolveCache(2)
+        cache.put(key(1.0), 0.1)
+        cache.put(key(2.0), 0.2)
+        cache.get(key(1.0))
+        cache.put(key(3.0), 0.3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(key(2.0)))
+        self.assertEqual(cache.get(key(1.0)), 0.1)
+        with self.assertRaises(ValueError):
+            sc.SolveCache(0)
+
+    def test_save_and_load(self):
+        cache = sc.SolveCache()
+        cache.put(key(0.1 + 0.2), 1 / 3.0)
+        cache.put(key(0.5434), float('nan'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.csv')
+            cache.save(path)
+            loaded = sc.SolveCache()
+            loaded.load(path)
+            # a missing cache file is an empty cache
+            loaded.load(os.path.join(directory, 'missing.csv'))
+        self.assertEqual(loaded.get(key(0.1 + 0.2)), 1 / 3.0)
+        self.assertTrue(isnan(loaded.get(key(0.5434))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+from scripts import solve_chain as sch
+from scripts import trade_classes as tc
+from scripts.trade_store import TradeColumns
+from math import isclose
+
+
+def trade_data(ID, strike, price, underlying='1.0', days='91'):
+    return {'ID': ID, 'Underlying Type': 'Stock', 'Underlying': underlying, 'Risk-Free Rate': '0.01', 'Days To Expiry': days,
+            'Strike': strike, 'Option Type': 'Call', 'Model Type': 'BlackScholes', 'Market Price': price}
+
+
+class TestSolveChain(unittest.TestCase):
+
+    def test_chain_order(self):
+        trades = [trade_data('0', '1.1', '0.1'), trade_data('1', '0.9', '0.1', days='30'), trade_data('2', '0.9', '0.1'),
+                  trade_data('3', '1.0', '0.1'), trade_data('4', '1.0', '0.1', underlying='0.5')]
+        store = TradeColumns.from_csv_columns({key: [trade[key] for trade in trades] for key in trades[0]})
+        self.assertEqual(sch.chain_order(store, range(5)).tolist(), [4, 1, 2, 3, 0])
+        self.assertEqual(sch.chain_order(store, np.array([0, 2, 4])).tolist(), [4, 2, 0])
+
+    def test_warm_started(self):
+        # a chain priced at a volatility that rises linearly with strike
+        chain = []
+        for i, strike in enumerate([0.9, 0.95, 1.0, 1.05]):
+            price, _, _ = tc.pricing_kernel('BlackScholes', 'Stock', 'Call', 1.0, strike, 0.01, 91 / 365.0)
+            chain.append(tc.BlackScholes(trade_data(str(i), str(strike), repr(price(0.2 + strike / 10.0)))))
+        other_chain = tc.BlackScholes(trade_data('4', '1.0', '0.05', days='30'))
+        warm_starts = []
+        try:
+            tc.TradeData.solver = 'brent-dekker'
+            for trade in sch.warm_started(chain + [other_chain]):
+                warm_starts.append(trade.warm_start)
+                trade.calc_implied_volatility()
+        finally:
+            tc.TradeData.solver = 'direct'
+        self.assertEqual(warm_starts[:2], [None, chain[0].imp_vol])
+        # extrapolated from the two strikes before
+        self.assertTrue(isclose(warm_starts[2], 0.3, rel_tol=1e-6))
+        self.assertTrue(isclose(warm_starts[3], 0.305, rel_tol=1e-6))
+        self.assertIsNone(warm_starts[4])
+        for trade, strike in zip(chain, [0.9, 0.95, 1.0, 1.05]):
+            self.assertTrue(isclose(trade.imp_vol, 0.2 + strike / 10.0, rel_tol=1e-7))
+
+
+if __name__ == '__main__':
+    unittest.main()
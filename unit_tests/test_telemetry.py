@@ -0,0 +1,76 @@
+import unittest
+import json
+import os
+import tempfile
+from scripts import telemetry as tm
+from scripts.price_bounds import REASONS, NON_POSITIVE_PRICE
+from scripts.bd_var_bounds import SolveStats
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def test_stage(self):
+        telemetry = tm.Telemetry()
+        for _ in range(2):
+            with telemetry.stage('solve'):
+                sum(range(10000))
+        self.assertGreater(telemetry.stage_seconds['solve'], 0)
+        self.assertEqual(telemetry.stage_seconds['parse'], 0)
+
+    def test_observe_solve_and_merge(self):
+        telemetry, other = tm.Telemetry(True), tm.Telemetry(True)
+        telemetry.observe_solve('BlackScholes', 'Call', 1e-6)
+        telemetry.observe_solve('BlackScholes', 'Call', 3e-5)
+        other.observe_solve('BlackScholes', 'Call', 1.0)
+        other.observe_solve('Bachelier', 'Put', 1e-4)
+        other.stage_seconds['build'] = 2.0
+        for observed, evaluations in [(telemetry, 3), (other, 4)]:
+            solve_stats = SolveStats()
+            solve_stats.evaluations = evaluations
+            observed.observe_bracketed_solve(solve_stats)
+        telemetry.merge(other)
+        counts, seconds = telemetry.solve_seconds[('BlackScholes', 'Call')]
+        self.assertEqual(counts, [1, 0, 1, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(seconds, 1e-6 + 3e-5 + 1.0)
+        self.assertEqual(sum(telemetry.solve_seconds[('Bachelier', 'Put')][0]), 1)
+        self.assertEqual(telemetry.stage_seconds['build'], 2.0)
+        self.assertEqual((telemetry.bracketed_solves, telemetry.bracketed_evaluations), (2, 7))
+        self.assertEqual(telemetry.pricings_per_bracketed_solve(), 3.5)
+
+    def test_rows_finished(self):
+        telemetry = tm.Telemetry()
+        telemetry.rows_in_progress = 3
+        telemetry.rows_finished(5)
+        self.assertEqual((telemetry.rows_done, telemetry.rows_in_progress), (5, 0))
+        reporter = tm.ProgressReporter(telemetry, 0, total_rows=10)
+        self.assertIn('solved 5 of 10 rows', reporter.progress())
+        self.assertIn('solved 5 rows', tm.ProgressReporter(telemetry, 0).progress())
+
+    def test_write_metrics(self):
+        telemetry = tm.Telemetry(True)
+        telemetry.observe_solve('Bachelier', 'Call', 3e-5)
+        telemetry.rows_finished(2)
+        telemetry.nan_counts[NON_POSITIVE_PRICE] = 1
+        telemetry.bracketed_solves, telemetry.bracketed_evaluations = 2, 9
+        with tempfile.TemporaryDirectory() as directory:
+            json_file, prometheus_file = os.path.join(directory, 'metrics.json'), os.path.join(directory, 'metrics.prom')
+            telemetry.write_metrics(json_file, 2.0, REASONS, {'cache hits': 3})
+            telemetry.write_metrics(prometheus_file, 2.0, REASONS)
+            with open(json_file, 'r') as metrics_file:
+                metrics = json.load(metrics_file)
+            with open(prometheus_file, 'r') as metrics_file:
+                lines = metrics_file.read().splitlines()
+        self.assertEqual((metrics['rows'], metrics['rows per second'], metrics['cache hits']), (2, 1.0, 3))
+        self.assertEqual(metrics['nan results'], {'non-positive price': 1})
+        self.assertEqual(metrics['solve seconds']['Bachelier Call']['buckets']['inf'], 1)
+        self.assertEqual((metrics['bracketed solves'], metrics['pricings per bracketed solve']), (2, 4.5))
+        self.assertIn('implied_volatility_bracketed_solves 2', lines)
+        self.assertIn('implied_volatility_bracketed_solve_pricings 9', lines)
+        self.assertIn('implied_volatility_nan_results{reason="non-positive price"} 1', lines)
+        self.assertIn('implied_volatility_solve_seconds_bucket{model="Bachelier",option="Call",le="2e-05"} 0', lines)
+        self.assertIn('implied_volatility_solve_seconds_bucket{model="Bachelier",option="Call",le="5e-05"} 1', lines)
+        self.assertIn('implied_volatility_solve_seconds_bucket{model="Bachelier",option="Call",le="+Inf"} 1', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
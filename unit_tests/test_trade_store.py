@@ -0,0 +1,69 @@
+import unittest
+from scripts import trade_store as ts
+from scripts import runner_methods as rm
+from math import isnan, sqrt, exp
+
+
+def as_csv_columns(trades):
+    return {key: [trade[key] for trade in trades] for key in trades[0]}
+
+
+class TestTradeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = [
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '0.5434', 'Risk-Free Rate': '-0.0045', 'Days To Expiry': '305.1700',
+             'Strike': '0.7103', 'Option Type': 'Call', 'Model Type': 'BlackScholes', 'Market Price': '0.09794149'},
+            {'ID': '1', 'Underlying Type': 'Future', 'Underlying': '1.8360', 'Risk-Free Rate': '-0.0031', 'Days To Expiry': '242.7474',
+             'Strike': '2.2491', 'Option Type': 'Put', 'Model Type': 'Bachelier', 'Market Price': '0.74574876'},
+            {'ID': '2', 'Underlying Type': 'Swap', 'Underlying': '1.1975', 'Risk-Free Rate': '-0.0023', 'Days To Expiry': '190.1082',
+             'Strike': '1.4481', 'Option Type': 'Straddle', 'Model Type': 'Bachelier', 'Market Price': '0.3641165'},
+        ]
+        self.store = ts.TradeColumns.from_csv_columns(as_csv_columns(self.trades))
+
+    def test_trade_from_row_matches_trade_from_dictionary(self):
+        for data, row in zip(self.trades, self.store.rows()):
+            from_row = rm.create_instance_of_trade_object(row)
+            from_dictionary = rm.create_instance_of_trade_object(data)
+            self.assertEqual(type(from_row), type(from_dictionary))
+            from_row.calc_implied_volatility()
+            from_dictionary.calc_implied_volatility()
+            for row_value, dictionary_value in zip(from_row.format_solution(), from_dictionary.format_solution()):
+                if isinstance(row_value, float) and isnan(row_value):
+                    self.assertTrue(isnan(dictionary_value))
+                else:
+                    self.assertEqual(row_value, dictionary_value)
+
+    def test_expiry_factors_are_shared(self):
+        trades = [dict(trade, ID=str(i)) for i, trade in enumerate(self.trades[:2] * 3)]
+        trades[5]['Risk-Free Rate'] = '0.01'
+        store = ts.TradeColumns.from_csv_columns(as_csv_columns(trades))
+        factors, group = store.expiry_factors()
+        self.assertEqual(len(factors), 3)
+        self.assertEqual(group[:5].tolist(), [group[0], group[1]] * 2 + [group[0]])
+        self.assertNotIn(group[5], group[:5])
+        for row in store.rows():
+            self.assertEqual(row.factors, (sqrt(row.t), exp(-row.r * row.t), exp(row.r * row.t)))
+        # a subset keeps the factors of the whole store
+        subset = ts.columns_subset(store, store.option == ts.PUT)
+        self.assertIs(subset.expiry_factors()[0], factors)
+        self.assertEqual([row.factors for row in subset.rows()], [store.row(i).factors for i in [1, 3, 5]])
+        self.assertEqual(ts.ExpiryFactors(ts.np.array([1.0]), ts.np.array([1000.0])).growth.tolist(), [float('inf')])
+
+    def test_unrecognised_names_are_kept(self):
+        row = self.store.row(2)
+        self.assertEqual(self.store.option[2], ts.INVALID_CODE)
+        self.assertEqual((row.underlying_type, row.option_type), ('Swap', 'Straddle'))
+        self.assertEqual(self.store.format_solution(self.store.S)[2][5], 'Straddle')
+        subset = ts.columns_subset(self.store, self.store.model == ts.BACHELIER)
+        self.assertEqual(subset.row(1).option_type, 'Straddle')
+
+    def test_invalid_model_type(self):
+        data = dict(self.trades[0], **{'Model Type': 'Heston'})
+        store = ts.TradeColumns.from_csv_columns(as_csv_columns([data]))
+        with self.assertRaises(ValueError):
+            rm.create_instance_of_trade_object(store.row(0))
+
+    def test_compact_rows(self):
+        self.assertFalse(hasattr(self.store.row(0), '__dict__'))
+        self.assertFalse(hasattr(rm.create_instance_of_trade_object(self.store.row(0)), '__dict__'))
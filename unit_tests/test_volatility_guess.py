@@ -0,0 +1,54 @@
+import unittest
+from scripts import volatility_guess as vg
+from scripts import trade_classes as tc
+from math import isclose, isnan, log, sqrt
+from scripts.normal_dist import erf_cdf, erf_pdf
+
+
+class TestVolatilityGuess(unittest.TestCase):
+
+    def test_corrado_miller_volatility(self):
+        def call(S, X, t, sigma):
+            d1 = log(S / X) / (sigma * sqrt(t)) + sigma * sqrt(t) / 2.0
+            return S * erf_cdf(d1) - X * erf_cdf(d1 - sigma * sqrt(t))
+        # good to a few percent near the money
+        for X in [0.95, 1.0, 1.05]:
+            for sigma in [0.1, 0.3, 0.6]:
+                self.assertTrue(isclose(vg.corrado_miller_volatility(
+                    call(1.0, X, 0.5, sigma), 1.0, X, 0.5), sigma, rel_tol=0.05))
+        self.assertTrue(isnan(vg.corrado_miller_volatility(0.05, 1.2, 1.0, 0.5)))  # below intrinsic
+
+    def test_normal_volatility_guess(self):
+        def call(F, K, t, sigma_n):
+            d = (F - K) / (sigma_n * sqrt(t))
+            return (F - K) * erf_cdf(d) + sigma_n * sqrt(t) * erf_pdf(d)
+        # exact at the money
+        self.assertTrue(isclose(vg.normal_volatility_guess(call(1.0, 1.0, 0.5, 0.2), 1.0, 1.0, 0.5), 0.2))
+        for K in [0.9, 1.1]:
+            self.assertTrue(isclose(vg.normal_volatility_guess(
+                call(1.0, K, 0.5, 0.3), 1.0, K, 0.5), 0.3, rel_tol=0.05))
+
+    def test_guess_reduces_evaluations(self):
+        trades = [
+            {'ID': '0', 'Underlying Type': 'Stock', 'Underlying': '0.8714', 'Risk-Free Rate': '-0.0049', 'Days To Expiry': '211.8715',
+             'Strike': '0.9426', 'Option Type': 'Put', 'Model Type': 'BlackScholes', 'Market Price': '0.14370158'},
+            {'ID': '0', 'Underlying Type': 'Future', 'Underlying': '1.4597', 'Risk-Free Rate': '-0.0002', 'Days To Expiry': '65.8745',
+             'Strike': '1.4992', 'Option Type': 'Call', 'Model Type': 'Bachelier', 'Market Price': '0.049442439'},
+        ]
+        try:
+            tc.TradeData.solver = 'brent-dekker'
+            evaluations = {False: 0, True: 0}
+            for data in trades:
+                model = tc.BlackScholes if data['Model Type'] == 'BlackScholes' else tc.Bachelier
+                results = {}
+                for bracket_from_guess in [False, True]:
+                    tc.TradeData.bracket_from_guess = bracket_from_guess
+                    trade = model(data)
+                    trade.calc_implied_volatility()
+                    results[bracket_from_guess] = trade.imp_vol
+                    evaluations[bracket_from_guess] += trade.solve_stats.evaluations
+                self.assertTrue(isclose(results[True], results[False], rel_tol=1e-8))
+            self.assertTrue(evaluations[True] < evaluations[False])
+        finally:
+            tc.TradeData.solver = 'direct'
+            tc.TradeData.bracket_from_guess = True